@@ -0,0 +1,298 @@
+# api_server.py
+# Local read-only HTTP/JSON API over db_access for companion pages and scripts.
+#   python -m api_server [--db journal.db] [--port 8765] [--readers 4]
+# stdlib only, binds to localhost. Queries run on a bounded pool of read-only WAL connections,
+# so many requests proceed in parallel while the desktop app writes.
+import argparse, asyncio, collections, itertools, json, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import db_access
+from db_setup import migrate
+
+MAX_REQUEST_LINE = 8192
+MAX_BODY = 1 << 20   # request bodies up to this size are read and dropped; bigger ones close the connection
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class ReadPool:
+    """N read-only connections; a request borrows one for the length of its query."""
+    def __init__(self, path, size=4):
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="reader")
+        self.free = asyncio.Queue()
+        for _ in range(size):
+            self.free.put_nowait(db_access.open_readonly(path))
+
+    async def run(self, fn, *args):
+        conn = await self.free.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, conn, fn, args)
+        finally:
+            self.free.put_nowait(conn)
+
+    @staticmethod
+    def _call(conn, fn, args):
+        db_access.attach_archives(conn, readonly=True)   # picks up archives made since the last request
+        with db_access.bound_connection(conn):
+            return fn(*args)
+
+    def close(self):
+        while not self.free.empty():
+            self.free.get_nowait().close()
+        self.executor.shutdown(wait=False)
+
+# ---------- endpoints ----------
+def _one(q, key, cast=str):
+    v = q.get(key)
+    if not v or v[0] == "":
+        return None
+    try:
+        return cast(v[0])
+    except ValueError:
+        raise HttpError(400, f"bad value for {key}: {v[0]!r}")
+
+def _ints(q, key):
+    vals = [x for v in q.get(key, []) for x in v.split(",") if x]
+    try:
+        return [int(x) for x in vals] or None
+    except ValueError:
+        raise HttpError(400, f"{key} takes ids")
+
+def books(q):
+    filters = {
+        "text": _one(q, "text"), "dnf": _one(q, "dnf", int), "phys_copy": _one(q, "phys_copy", int),
+        "date_start_from": _one(q, "started_from"), "date_start_to": _one(q, "started_to"),
+        "date_finish_from": _one(q, "finished_from"), "date_finish_to": _one(q, "finished_to"),
+        "rating_min": _one(q, "rating_min", int), "rating_max": _one(q, "rating_max", int),
+        "vibe": _ints(q, "vibe"), "rereads": _one(q, "rereads") in ("1", "true"),
+    }
+    for field in ("size", "category", "genre", "subgenre", "source", "discovery", "months_later", "reread"):
+        filters[field] = _ints(q, field)
+    order = _one(q, "order") or "date_finish"
+    if order not in db_access.BOOK_ORDERS:
+        raise HttpError(400, f"order must be one of {', '.join(sorted(db_access.BOOK_ORDERS))}")
+    limit = min(_one(q, "limit", int) or 100, 1000)
+    return [dict(r) for r in db_access.query_books(filters, order, _one(q, "dir") or "desc", limit)]
+
+def books_page(q):
+    # keyset pages: pass the returned "next" back as after=<json>
+    order = _one(q, "order") or "date_finish"
+    after = _one(q, "after")
+    try:
+        after = tuple(json.loads(after)) if after else None
+    except (ValueError, TypeError):
+        raise HttpError(400, "after must be the JSON 'next' value of the previous page")
+    limit = min(_one(q, "limit", int) or 50, 500)
+    rows, nxt = db_access.list_books(order, _one(q, "dir") or "desc", after, limit)
+    return {"books": [dict(r) for r in rows], "next": list(nxt) if nxt else None}
+
+def pace(q):
+    rows = db_access.reading_pace(_one(q, "period") or "month", _one(q, "from"), _one(q, "to"))
+    return [dict(r) for r in rows]
+
+# search boxes pass session=<any token> with every keystroke and get ranked results narrowed from
+# the previous keystroke's (db_access.SearchSession); the least recently used sessions are dropped
+SEARCH_SESSIONS = 64
+_sessions = collections.OrderedDict()   # token -> SearchSession
+_sessions_lock = threading.Lock()
+
+def _search_session(token):
+    with _sessions_lock:
+        s = _sessions.pop(token, None) or db_access.SearchSession()
+        _sessions[token] = s
+        while len(_sessions) > SEARCH_SESSIONS:
+            _sessions.popitem(last=False)
+        return s
+
+def search(q):
+    text = _one(q, "q")
+    if not text:
+        raise HttpError(400, "q is required")
+    limit = min(_one(q, "limit", int) or 20, 200)
+    token = _one(q, "session")
+    if token:
+        return [dict(r) for r in itertools.islice(_search_session(token).search(text), limit)]
+    return [dict(r) for r in db_access.query_books({"text": text}, "name", "asc", limit)]
+
+def book(book_id):
+    b = db_access.get_book(book_id)
+    if b is None:
+        raise HttpError(404, f"no book {book_id}")
+    return b
+
+def books_like(book_id, q):
+    import similar   # numpy, only for the similarity routes
+    limit = min(_one(q, "limit", int) or 10, 100)
+    try:
+        rows = similar.engine(db_access.DB_PATH).like(book_id, limit)
+    except ValueError as e:
+        raise HttpError(404, str(e))
+    return [{"id": i, "name": n, "similarity": s} for i, n, s in rows]
+
+def rated_vibes(q):
+    import similar
+    limit = min(_one(q, "limit", int) or 5, 100)
+    return [{"vibe": v, "score": s, "books": n} for v, s, n in similar.engine(db_access.DB_PATH).top_vibes(limit)]
+
+LOOKUPS = {
+    "sizes": lambda q: db_access.list_sizes(),
+    "categories": lambda q: db_access.list_categories(),
+    "genres": lambda q: db_access.list_genres_by_category(_one(q, "category", int) or 1),
+    "subgenres": lambda q: db_access.list_subgenres_by_genre(_one(q, "genre", int) or 0),
+    "sources": lambda q: db_access.list_sources(),
+    "discoveries": lambda q: db_access.list_discoveries(),
+    "months_later": lambda q: db_access.list_months_later(),
+    "reread": lambda q: db_access.list_reread(),
+    "authors": lambda q: db_access.list_authors(),
+    "vibes": lambda q: db_access.list_vibes(),
+}
+
+def lookup(name, q):
+    if name not in LOOKUPS:
+        raise HttpError(404, f"unknown lookup {name!r}; try {', '.join(LOOKUPS)}")
+    return [{"id": i, "name": n} for i, n in LOOKUPS[name](q)]
+
+def route(path, q):
+    # -> (callable, args) to run on a pooled connection
+    parts = [unquote(p) for p in path.strip("/").split("/") if p]
+    if parts == ["books"]:
+        return books, (q,)
+    if parts == ["books", "page"]:
+        return books_page, (q,)
+    if len(parts) == 2 and parts[0] == "books" and parts[1].isdigit():
+        return book, (int(parts[1]),)
+    if len(parts) == 3 and parts[0] == "books" and parts[1].isdigit() and parts[2] == "similar":
+        return books_like, (int(parts[1]), q)
+    if parts == ["search"]:
+        return search, (q,)
+    if parts == ["stats"]:
+        return db_access.statistics, ()
+    if parts == ["stats", "pace"]:
+        return pace, (q,)
+    if parts == ["stats", "vibes"]:
+        return rated_vibes, (q,)
+    if parts == ["reminders"]:
+        return lambda: [dict(r) for r in db_access.due_reminders()], ()
+    if parts == ["rereads"]:
+        return lambda: [{"id": i, "name": n, "key": k} for i, n, k in db_access.find_rereads()], ()
+    if parts == ["cache"]:
+        return db_access.cache_stats, ()
+    if parts == ["lookups"]:
+        return lambda: sorted(LOOKUPS), ()
+    if len(parts) == 2 and parts[0] == "lookups":
+        return lookup, (parts[1], q)
+    raise HttpError(404, f"no route {path}")
+
+# ---------- HTTP plumbing ----------
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+class Server:
+    def __init__(self, pool, quiet=False):
+        self.pool = pool
+        self.quiet = quiet
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    # readline raises ValueError past the reader's limit (64 KiB) instead of returning
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    if len(line) > MAX_REQUEST_LINE:
+                        raise ValueError("request line too long")
+                    headers = {}
+                    while True:
+                        h = await reader.readline()
+                        if h in (b"\r\n", b"\n", b""):
+                            break
+                        k, _, v = h.decode("latin-1").partition(":")
+                        headers[k.strip().lower()] = v.strip()
+                except (ValueError, asyncio.LimitOverrunError) as e:
+                    msg = str(e) if "request line" in str(e) else "request line or header too long"
+                    await self.send(writer, 400, {"error": msg}, False)
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self.send(writer, 400, {"error": "bad request line"}, False)
+                    break
+                keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                # a body (POST/PUT, even GET) is read and dropped, or the next request would start inside it
+                if "transfer-encoding" in headers:
+                    keep = False
+                elif headers.get("content-length"):
+                    size = int(headers["content-length"]) if headers["content-length"].isdigit() else -1
+                    if 0 <= size <= MAX_BODY:
+                        await reader.readexactly(size)
+                    else:
+                        keep = False
+                t0 = time.perf_counter()
+                status, body = await self.dispatch(method, target)
+                await self.send(writer, status, body, keep, head=method == "HEAD")
+                if not self.quiet:
+                    print(f"{method} {target} {status} {(time.perf_counter() - t0) * 1000:.1f}ms", file=sys.stderr)
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target):
+        if method not in ("GET", "HEAD"):
+            return 405, {"error": "read-only API: GET only"}
+        url = urlsplit(target)
+        try:
+            fn, args = route(url.path, parse_qs(url.query))
+            return 200, await self.pool.run(fn, *args)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def send(self, writer, status, body, keep, head=False):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n".encode("latin-1"))
+        if not head:
+            writer.write(data)
+        await writer.drain()
+
+async def serve(path, host="127.0.0.1", port=8765, readers=4, quiet=False):
+    pool = ReadPool(path, readers)
+    srv = await asyncio.start_server(Server(pool, quiet).handle, host, port)
+    print(f"serving {path} on http://{host}:{port}/ with {readers} reader(s)", file=sys.stderr)
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        pool.close()
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m api_server", description="Local read-only JSON API for the journal")
+    p.add_argument("--db", default=db_access.DB_PATH)
+    p.add_argument("--host", default="127.0.0.1", help="keep it local (default: %(default)s)")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--readers", type=int, default=4, help="read-only connections in the pool")
+    p.add_argument("--quiet", action="store_true", help="no per-request log")
+    args = p.parse_args(argv)
+    # schema upgrades (and WAL) need a writable connection once, before the read-only pool opens
+    db_access.DB_PATH = args.db
+    with db_access.get_conn() as c:
+        migrate(c)
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.readers, args.quiet))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
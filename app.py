@@ -1,12 +1,22 @@
 # app.py
-import os, sys, sqlite3, datetime
-from PyQt6.QtCore import Qt, QDate, QTimer, QStringListModel
-from PyQt6.QtGui import QIcon, QIntValidator
+import os, sys, sqlite3, datetime, itertools, threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import (Qt, QDate, QTimer, QStringListModel, QSortFilterProxyModel, QItemSelectionModel, pyqtSignal,
+                          QEvent, QObject, QFileSystemWatcher)
+from PyQt6.QtGui import QIcon, QIntValidator, QPainter, QStandardItem, QStandardItemModel
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit, QComboBox, QPushButton, QVBoxLayout, QHBoxLayout,
-    QCheckBox, QListWidget, QListWidgetItem, QAbstractItemView, QTextEdit, QFormLayout,
-    QScrollArea, QDateEdit, QMessageBox, QSpinBox, QStatusBar, QCompleter, QFrame, QRadioButton, QButtonGroup
+    QCheckBox, QListWidget, QListWidgetItem, QListView, QAbstractItemView, QTextEdit, QFormLayout,
+    QScrollArea, QDateEdit, QMessageBox, QSpinBox, QStatusBar, QCompleter, QFrame, QRadioButton, QButtonGroup,
+    QGridLayout, QStackedWidget, QTableWidget, QTableWidgetItem, QHeaderView
 )
+from db_access import (smart_title, find_duplicates, get_book, insert_book, update_book, link_vibes, set_book_vibes,
+                       upsert_author, run_write, change_count, lock_path, list_books, SearchSession, PIE_CHARTS,
+                       QUERY_CACHE)
+from db_setup import migrate
+from suggest import Suggester
+from charts import ChartRenderer
+import maintenance
 
 DB_PATH = "journal.db"
 DELIMS = [',', ';']
@@ -33,6 +43,13 @@ def get_selected_radio_id(group):
     b = group.checkedButton()
     return b.property("opt_id") if b else None
 
+def set_radio(group, opt_id):
+    # check the button for opt_id; None (or an unknown id) leaves none checked
+    group.setExclusive(False)
+    for b in group.buttons():
+        b.setChecked(opt_id is not None and b.property("opt_id") == opt_id)
+    group.setExclusive(True)
+
 def fetchall(sql, params=()):
     with db() as conn:
         cur = conn.execute(sql, params)
@@ -53,10 +70,6 @@ def exec_many(sql, rows):
         conn.executemany(sql, rows)
         conn.commit()
 
-# Capitalize first letter of each word (basic Title Case, but keep small words as-is if user typed)
-def smart_title(s: str) -> str:
-    return " ".join(w[:1].upper() + w[1:] if w else "" for w in s.strip().split())
-
 # ---------- Widgets ----------
 class MultiSuggestLine(QLineEdit):
     """
@@ -69,13 +82,15 @@ class MultiSuggestLine(QLineEdit):
         self.column = column
         self.limit = limit
         self.capitalize = capitalize
+        self.suggester = Suggester(table, limit)
         self.model = QStringListModel([])
         self.completer = QCompleter(self.model, self)
         self.completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
         self.completer.activated[str].connect(self.accept_completion)
         self.setCompleter(self.completer)
         self.textChanged.connect(self.requery)
-        self.completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
+        # the suggester already ranked and filtered; don't let the completer prefix-filter again
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
 
     def _split_tokens(self, text:str):
         # Split on commas/semicolons, strip spaces, drop empties
@@ -116,16 +131,8 @@ class MultiSuggestLine(QLineEdit):
             self.model.setStringList([])
             return
 
-        # Fetch top-3 matching vibe names, excluding already chosen ones
-        like = f"%{current}%"
-        rows = fetchall(
-            f"SELECT {self.column} FROM {self.table} "
-            f"WHERE {self.column} LIKE ? "
-            f"ORDER BY {self.column} LIMIT {self.limit}",
-            (like,)
-        )
-        chosen = set(map(lambda x: x.lower(), [t for t in tokens[:-1] if t]))
-        suggestions = [r[0] for r in rows if r[0].lower() not in chosen]
+        # Top-3 best suited vibes (match quality + usage), excluding already chosen ones
+        suggestions = self.suggester.suggest(current, exclude=[t for t in tokens[:-1] if t])
         self.model.setStringList(suggestions)
         if suggestions:
             self.completer.complete()
@@ -228,36 +235,120 @@ class ChipsMultiSelect(QListWidget):
             if it.data(Qt.ItemDataRole.UserRole) in ids:
                 it.setSelected(True)
 
+# ---------- Genre / subgenre tree: models built once, pickers filter them ----------
+ID_ROLE = Qt.ItemDataRole.UserRole
+KEY_ROLE = Qt.ItemDataRole.UserRole + 1   # parent in the tree: category of a genre, genre of a subgenre
+
+_tree_models = {}   # DB_PATH -> [QUERY_CACHE marker, (genre model, subgenre model), rows they hold]
+TREE_SQL = ("SELECT id, category_id, genre_name FROM genre ORDER BY genre_name",
+            "SELECT id, genre_id, subgenre_name FROM subgenre ORDER BY subgenre_name")
+
+def _fill_tree_model(model, rows):
+    model.clear()
+    for id_, key, name in rows:
+        it = QStandardItem(name)
+        it.setData(id_, ID_ROLE)
+        it.setData(key, KEY_ROLE)
+        it.setEditable(False)
+        model.appendRow(it)
+
+def genre_tree_models():
+    # every picker shares these models; they are re-read only after the journal changed (the
+    # QUERY_CACHE marker moved) and refilled in place only if the genre tables themselves differ
+    marker = QUERY_CACHE.marker()
+    entry = _tree_models.get(DB_PATH)
+    if entry is None:
+        entry = _tree_models[DB_PATH] = [None, (QStandardItemModel(), QStandardItemModel()), [None, None]]
+    if entry[0] != marker:
+        for i, sql in enumerate(TREE_SQL):
+            rows = [tuple(r) for r in fetchall(sql)]
+            if rows != entry[2][i]:
+                _fill_tree_model(entry[1][i], rows)
+                entry[2][i] = rows
+        entry[0] = marker
+    return entry[1]
+
+class KeyFilterProxy(QSortFilterProxyModel):
+    """Shows the rows whose KEY_ROLE is one of `keys`."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.keys = frozenset()
+
+    def set_keys(self, keys):
+        keys = frozenset(keys)
+        if keys != self.keys:
+            self.keys = keys
+            self.invalidateFilter()
+
+    def filterAcceptsRow(self, row, parent):
+        return self.sourceModel().index(row, 0, parent).data(KEY_ROLE) in self.keys
+
+class TreeLevelSelect(QListView):
+    """Multi-select over one level of the genre tree; show_children_of() picks the visible branch."""
+    def __init__(self, model):
+        super().__init__()
+        self.proxy = KeyFilterProxy(self)
+        self.proxy.setSourceModel(model)
+        self.setModel(self.proxy)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setMinimumHeight(self.sizeHintForRow(0) * 4 + 2 * self.frameWidth())
+
+    def show_children_of(self, keys):
+        self.proxy.set_keys(keys)
+
+    def count(self):
+        return self.proxy.rowCount()
+
+    def selected_ids(self):
+        return [i.data(ID_ROLE) for i in self.selectionModel().selectedRows()]
+
+    def select_ids(self, ids):
+        for row in range(self.proxy.rowCount()):
+            idx = self.proxy.index(row, 0)
+            if idx.data(ID_ROLE) in ids:
+                self.selectionModel().select(idx, QItemSelectionModel.SelectionFlag.Select)
+
 class SuggestLine(QLineEdit):
     """Line edit with top-3 suggestions from DB table; commits new vibe rows when saving."""
     def __init__(self, table:str, column:str, pre_query=None, limit=3, capitalize=True):
         super().__init__()
         self.table, self.column, self.limit, self.capitalize = table, column, limit, capitalize
-        self.pre_query = pre_query  # optional SQL to join/filter
+        self.pre_query = pre_query  # optional SQL to join/filter; otherwise ranked by Suggester
+        self.suggester = None if pre_query else Suggester(table, limit)
         self.model = QStringListModel([])
         self.completer = QCompleter(self.model, self)
         self.completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
         self.setCompleter(self.completer)
         self.textChanged.connect(self.requery)
 
     def requery(self, text):
         text = text.strip()
-        rows = []
+        names = []
         if text:
-            like = f"%{text}%"
             if self.pre_query:
-                rows = fetchall(self.pre_query, (like,))
+                names = [r[0] for r in fetchall(self.pre_query, (f"%{text}%",))]
             else:
-                rows = fetchall(f"SELECT {self.column} FROM {self.table} WHERE {self.column} LIKE ? ORDER BY {self.column} LIMIT {self.limit}", (like,))
-        self.model.setStringList([r[0] for r in rows])
+                names = self.suggester.suggest(text)
+        self.model.setStringList(names)
+        # don't pop up a list that only repeats what was typed
+        if names and self.hasFocus() and names != [text]:
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
 
     def normalized_text(self):
         t = self.text().strip()
         return smart_title(t) if (t and self.capitalize) else t
 
 class AddBookPage(QWidget):
+    saved = pyqtSignal(int)   # an edited book was saved (SPEC: go back to "My books")
+
     def __init__(self):
         super().__init__()
+        self.book_id = None   # set while editing an existing book
+        self.loaded = None    # form_values() right after load_book(), to find dirty fields
 
         # ----- top Save button and status -----
         self.status = QStatusBar()
@@ -287,12 +378,7 @@ class AddBookPage(QWidget):
         self.form.addRow("Name *", self.edName)
 
         # Author (suggest top-3)
-        self.edAuthor = SuggestLine(
-            table="author",
-            column="author_name",
-            pre_query="SELECT author_name FROM author WHERE author_name LIKE ? ORDER BY author_name LIMIT 3",
-            capitalize=True
-        )
+        self.edAuthor = SuggestLine(table="author", column="author_name", limit=3, capitalize=True)
         self.edAuthor.editingFinished.connect(lambda: self.edAuthor.setText(self.edAuthor.normalized_text()))
         self.form.addRow("Author", self.edAuthor)
 
@@ -312,21 +398,21 @@ class AddBookPage(QWidget):
         for b in self.grpCategory.buttons():
             if b.text() == "Fiction":
                 b.setChecked(True)
-        # react when user switches
-        for b in self.grpCategory.buttons():
-            b.toggled.connect(self.on_category_change)
+        # react when user switches (a toggle unchecks one button and checks another: act on the check)
+        self.grpCategory.buttonToggled.connect(lambda _, on: on and self.on_category_change())
 
         self.form.addRow("Category", self.wCategory)
 
 
-        # Genre (multi)
-        self.lstGenre = ChipsMultiSelect()
+        # Genre (multi): filtered to the category; Subgenre (multi, only for Fiction): to the selected genres
+        genre_model, subgenre_model = genre_tree_models()
+        self.lstGenre = TreeLevelSelect(genre_model)
+        self.lstGenre.selectionModel().selectionChanged.connect(self.on_genre_change)
         self.form.addRow("Genre (multi)", self.lstGenre)
 
-        # Subgenre (multi, only for Fiction)
         self.subgenreContainer = QWidget()
         sgLayout = QVBoxLayout(self.subgenreContainer); sgLayout.setContentsMargins(0,0,0,0)
-        self.lstSubgenre = ChipsMultiSelect()
+        self.lstSubgenre = TreeLevelSelect(subgenre_model)
         sgLayout.addWidget(self.lstSubgenre)
         self.form.addRow("Subgenre (multi)", self.subgenreContainer)
 
@@ -431,28 +517,24 @@ class AddBookPage(QWidget):
             self.iconCombo.addItem(name, iid)
 
     def on_category_change(self):
-        # find which radio is checked
+        # no queries: the genre picker just shows another branch of the tree
         b = self.grpCategory.checkedButton()
         if not b:
             return
-        cat_id = b.property("opt_id")
-        cat_name = b.text()
-        # reload genres for chosen category
-        genres = fetchall("SELECT id, genre_name FROM genre WHERE category_id=? ORDER BY genre_name", (cat_id,))
-        self.lstGenre.set_items([(g[1], g[0]) for g in genres])
+        self.lstGenre.show_children_of([b.property("opt_id")])
         # subgenre visibility only for Fiction
-        self.subgenreContainer.setVisible(cat_name == "Fiction")
-        self.lstSubgenre.clear()
-        # hook genre selection -> subgenres
-        self.lstGenre.itemSelectionChanged.connect(self.load_subgenres)
-
-    def load_subgenres(self):
-        ids = self.lstGenre.selected_ids()
-        if not ids:
-            self.lstSubgenre.clear(); return
-        placeholders = ",".join("?" for _ in ids)
-        rows = fetchall(f"SELECT id, subgenre_name FROM subgenre WHERE genre_id IN ({placeholders}) ORDER BY subgenre_name", ids)
-        self.lstSubgenre.set_items([(r[1], r[0]) for r in rows])
+        self.subgenreContainer.setVisible(b.text() == "Fiction")
+        self.on_genre_change()
+
+    def on_genre_change(self, *_):
+        self.lstSubgenre.show_children_of(self.lstGenre.selected_ids())
+
+    def refresh_trees(self):
+        # genres added by another process; a refill resets the shared models, so the picks are put back
+        genres, subgenres = self.lstGenre.selected_ids(), self.lstSubgenre.selected_ids()
+        genre_tree_models()
+        self.lstGenre.select_ids(genres)
+        self.lstSubgenre.select_ids(subgenres)
 
     def toast(self, text, ms=2000):
         self.status.showMessage(text, ms)
@@ -460,136 +542,182 @@ class AddBookPage(QWidget):
     def highlight(self, widget: QWidget, on=True):
         widget.setStyleSheet("border:1px solid #cc0000; border-radius:3px;" if on else "")
 
+    def form_values(self):
+        # everything the form holds, in books terms (author as text, vibes as a token list)
+        genre_ids = self.lstGenre.selected_ids()
+        subgenre_ids = self.lstSubgenre.selected_ids() if not self.subgenreContainer.isHidden() else []
+        # source / discovery are multi-select but books has single FKs: the first selected is stored
+        source_ids = self.lstSource.selected_ids()
+        discovery_ids = self.lstDiscovery.selected_ids()
+        return {
+            "icon": self.iconCombo.currentData(),
+            "dnf": 1 if self.chkDNF.isChecked() else 0,
+            "name": smart_title(self.edName.text()),
+            "author_name": self.edAuthor.normalized_text(),
+            "size": self.cbSize.currentData(),
+            "category": get_selected_radio_id(self.grpCategory),
+            "genre": genre_ids[0] if genre_ids else None,
+            "subgenre": subgenre_ids[0] if subgenre_ids else None,
+            "source": source_ids[0] if source_ids else None,
+            "discovery": discovery_ids[0] if discovery_ids else None,
+            "discovery_text": self.edDiscoveryText.text().strip() or None,
+            "expectations": self.txtExpect.toPlainText().strip() or None,
+            "expectations_failed": self.txtDiff.toPlainText().strip() or None,
+            "date_start": self.dtStart.get_or_none(),
+            "date_finish": self.dtFinish.get_or_none(),
+            "rating": self.dots.get_value(),
+            "vibes": self.edVibes.get_tokens(),
+            "crush_list": self.txtCrush.text().strip() or None,
+            "months_later": get_selected_radio_id(self.grpMonthsLater),
+            "reread": get_selected_radio_id(self.grpReread),
+            "line": self.edLine.text().strip() or None,
+            "reminded": self.edReminded.text().strip() or None,
+            "phys_copy": get_selected_radio_id(self.grpPhys) or 0,
+            "notes": self.txtNotes.toPlainText().strip() or None,
+        }
+
+    def dirty_fields(self, values):
+        # fields whose widgets differ from what load_book() put there
+        changed = {k: v for k, v in values.items() if k != "vibes" and v != self.loaded.get(k)}
+        if {v.casefold() for v in values["vibes"]} != {v.casefold() for v in self.loaded["vibes"]}:
+            changed["vibes"] = values["vibes"]
+        return changed
+
+    def load_book(self, book_id):
+        # "Edit book": one query for the row, its lookups' ids, long text and vibes
+        book = get_book(book_id)
+        if book is None:
+            self.toast(f"Book {book_id} not found", 3000)
+            return False
+        self.reset_form()
+        self.iconCombo.setCurrentIndex(max(self.iconCombo.findData(book["icon"]), 0))
+        self.chkDNF.setChecked(bool(book["dnf"]))
+        self.edName.setText(book["name"] or "")
+        for w, text in ((self.edAuthor, book["author_name"]), (self.edVibes, book["vibes"])):
+            w.blockSignals(True)   # no suggestion popups while filling in
+            w.setText(text or "")
+            w.blockSignals(False)
+        self.cbSize.setCurrentIndex(self.cbSize.findData(book["size"]))
+        set_radio(self.grpCategory, book["category"])
+        self.lstGenre.clearSelection()
+        self.lstGenre.select_ids([book["genre"]])
+        self.lstSubgenre.select_ids([book["subgenre"]])
+        self.lstSource.select_ids([book["source"]])
+        self.lstDiscovery.select_ids([book["discovery"]])
+        self.edDiscoveryText.setText(book["discovery_text"] or "")
+        self.txtExpect.setPlainText(book["expectations"] or "")
+        self.txtDiff.setPlainText(book["expectations_failed"] or "")
+        for w, d in ((self.dtStart, book["date_start"]), (self.dtFinish, book["date_finish"])):
+            if d:
+                w.setDate(QDate.fromString(d, "yyyy-MM-dd"))
+            else:
+                w.clear_to_null()
+        self.dots.set_value(book["rating"] or 0)
+        self.txtCrush.setText(book["crush_list"] or "")
+        set_radio(self.grpMonthsLater, book["months_later"])
+        set_radio(self.grpReread, book["reread"])
+        set_radio(self.grpPhys, book["phys_copy"])
+        self.edLine.setText(book["line"] or "")
+        self.edReminded.setText(book["reminded"] or "")
+        self.txtNotes.setPlainText(book["notes"] or "")
+        self.book_id = book_id
+        self.loaded = self.form_values()
+        for b in (self.btnSaveTop, self.btnSaveBottom):
+            b.setText("Save changes")
+        return True
+
     def save_book(self):
         # reset highlights
         for w in [self.edName, self.dtStart, self.dtFinish]:
             self.highlight(w, False)
+        error_ms = 3000 if self.book_id else 10000
+
+        values = self.form_values()
 
         # validations
-        name = smart_title(self.edName.text())
-        if not name:
-            self.toast('Enter the Name', 10000)
+        if not values["name"]:
+            self.toast('Enter the Name', error_ms)
             self.highlight(self.edName, True)
             self.scroll.ensureWidgetVisible(self.edName)
             return
 
-        start = self.dtStart.get_or_none()
-        finish = self.dtFinish.get_or_none()
+        start, finish = values["date_start"], values["date_finish"]
         if start and finish and finish < start:
-            self.toast("Date started can't be later than Date finished", 10000)
+            self.toast("Date started can't be later than Date finished", error_ms)
             self.highlight(self.dtStart, True)
             self.scroll.ensureWidgetVisible(self.dtStart)
             return
 
-        # author: find or create if non-empty
-        author_txt = self.edAuthor.normalized_text()
-        author_id = None
-        if author_txt:
-            row = fetchone("SELECT id FROM author WHERE author_name=?", (author_txt,))
-            if not row:
-                exec_sql("INSERT INTO author(author_name) VALUES (?)", (author_txt,))
-                row = fetchone("SELECT id FROM author WHERE author_name=?", (author_txt,))
-            author_id = row[0]
-
-        size_id = self.cbSize.currentData()
-        cat_id = get_selected_radio_id(self.grpCategory)
-        genre_ids = self.lstGenre.selected_ids()
-        subgenre_ids = self.lstSubgenre.selected_ids() if self.subgenreContainer.isVisible() else []
+        if self.book_id is not None:
+            self.save_changes(values)
+            return
 
-        # source (multi): store main in books.source; extras ignored for now OR choose first
-        source_ids = self.lstSource.selected_ids()
-        source_id = source_ids[0] if source_ids else None  # you asked multi-select; books has single FK — we take first
+        # same title already in the journal? (one probe on idx_books_title_key; rereads are fine, just warn)
+        dupes = find_duplicates(values["name"])
 
-        discovery_ids = self.lstDiscovery.selected_ids()
-        discovery_id = discovery_ids[0] if discovery_ids else None  # same logic; first selected
-        discovery_text = self.edDiscoveryText.text().strip() or None
-
-        icon_id = self.iconCombo.currentData()
-        dnf = 1 if self.chkDNF.isChecked() else 0
-        rating10 = self.dots.get_value()
-        crush = self.txtCrush.text().strip() or None
-        line = self.edLine.text().strip() or None
-        reminded = self.edReminded.text().strip() or None
-        notes = self.txtNotes.toPlainText().strip() or None
-        months_later_id = get_selected_radio_id(self.grpMonthsLater)
-        reread_id       = get_selected_radio_id(self.grpReread)
-        phys            = get_selected_radio_id(self.grpPhys) or 0
-
-        # choose one genre/subgenre to save into books (because schema has single FKs)
-        genre_id = genre_ids[0] if genre_ids else None
-        subgenre_id = subgenre_ids[0] if subgenre_ids else None
-
-        # insert
-        try:
-            conn = sqlite3.connect(DB_PATH, timeout=5)
-            conn.execute("PRAGMA foreign_keys = ON;")
-            cur = conn.cursor()
-
-            # ensure author exists (if any)
-            if author_txt:
-                cur.execute("SELECT id FROM author WHERE author_name=?", (author_txt,))
-                row = cur.fetchone()
-                if not row:
-                    cur.execute("INSERT INTO author(author_name) VALUES (?)", (author_txt,))
-                    author_id = cur.lastrowid
-                else:
-                    author_id = row[0]
-
-            # choose one genre/subgenre to save into books
-            genre_id = genre_ids[0] if genre_ids else None
-            subgenre_id = subgenre_ids[0] if subgenre_ids else None
-
-            # insert book
-            cur.execute("""
-                INSERT INTO books
-                (dnf, name, author, size, category, genre, subgenre, source, discovery, discovery_text,
-                 icon, expectations, expectations_failed, date_start, date_finish, rating, crush_list,
-                 months_later, reread, line, reminded, phys_copy, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                dnf, name, author_id, size_id, cat_id, genre_id, subgenre_id,
-                source_id, discovery_id, discovery_text,
-                icon_id, self.txtExpect.toPlainText().strip() or None,
-                self.txtDiff.toPlainText().strip() or None,
-                start or None, finish or None, rating10, crush,
-                months_later_id, reread_id, line, reminded, phys, notes
-            ))
-
-            book_id = cur.lastrowid
-
-            # vibes
-            for vibe_text in self.edVibes.get_tokens():
-                cur.execute("SELECT id FROM vibe WHERE lower(vibe_name)=lower(?)", (vibe_text,))
-                row = cur.fetchone()
-                if not row:
-                    cur.execute("INSERT INTO vibe(vibe_name, prefilled) VALUES (?, 0)", (vibe_text,))
-                    vibe_id = cur.lastrowid
-                else:
-                    vibe_id = row[0]
-                cur.execute("INSERT OR IGNORE INTO book_vibes(book_id, vibe_id) VALUES (?, ?)", (book_id, vibe_id))
-
-            conn.commit()
+        # insert, one transaction (run again if another process has the file busy)
+        def insert(conn):
+            # author: case-insensitive, so "j.r.r. tolkien" finds J.R.R. Tolkien
+            data = dict(values, author=upsert_author(values["author_name"], conn))
+
+            # insert book (long text goes to book_text), then its vibes
+            book_id = insert_book(data, conn)
+            link_vibes(book_id, values["vibes"], conn)
 
+        try:
+            run_write(insert, path=DB_PATH)
         except Exception as e:
-            if 'conn' in locals(): conn.rollback()
             self.toast(f"Save failed: {e}", 10000)
             return
-        finally:
-            if 'conn' in locals(): conn.close()
 
 
         # success feedback
-        self.toast("Book saved", 5000)
+        if dupes:
+            self.toast(f"Book saved — you already have {len(dupes)} book(s) called \"{dupes[0][1]}\" (reread?)", 5000)
+        else:
+            self.toast("Book saved", 5000)
         # clear form & scroll top
         self.reset_form()
 
+    def save_changes(self, values):
+        # "Edit book" save: only dirty columns are written and only added/removed vibe links,
+        # so e.g. a rating change doesn't re-fire the date_finish reminder trigger
+        changed = self.dirty_fields(values)
+        if not changed:
+            self.toast("No changes", 2000)
+            return
+        vibes = changed.pop("vibes", None)
+        def update(conn):
+            # the book may live in an archive file (attached by writing()); update_book restores it
+            data = dict(changed)   # left as it was, in case of a second try
+            if "author_name" in data:
+                data["author"] = upsert_author(data.pop("author_name"), conn)
+            update_book(self.book_id, data, conn)
+            if vibes is not None:
+                set_book_vibes(self.book_id, vibes, conn)
+
+        try:
+            run_write(update, path=DB_PATH)
+        except Exception as e:
+            self.toast(f"Save failed: {e}", 3000)
+            return
+
+        book_id = self.book_id
+        self.reset_form()
+        self.toast("Book saved", 2000)
+        self.saved.emit(book_id)
+
     def reset_form(self):
+        # back to "Add book"
+        self.book_id, self.loaded = None, None
+        for b in (self.btnSaveTop, self.btnSaveBottom):
+            b.setText("Save")
         self.chkDNF.setChecked(False)
         self.edName.clear()
         self.edAuthor.clear()
         # keep defaults for size/category
         self.lstGenre.clearSelection()
-        self.lstSubgenre.clear()
+        self.lstSubgenre.clearSelection()
         for w in (self.lstSource, self.lstDiscovery):
             for i in range(w.count()): w.item(i).setSelected(False)
         self.edDiscoveryText.clear()
@@ -614,48 +742,387 @@ class AddBookPage(QWidget):
         if self.grpPhys.buttons(): self.grpPhys.buttons()[0].setChecked(True)
         self.edVibes.clear()
 
+class ChartTile(QWidget):
+    """One pie of the Statistics page; shows the last image it was given, painted elsewhere."""
+    def __init__(self, chart):
+        super().__init__()
+        self.chart = chart
+        self.image = None
+        self.generation = 0   # renderer request the image answers; cached ones shown early keep the old one
+        self.setMinimumSize(260, 180)
+
+    def pixel_size(self):
+        return (self.width(), self.height(), self.devicePixelRatioF())
+
+    def set_image(self, image):
+        self.image = image
+        self.update()
+
+    def ready(self):
+        # the image matches the tile's current size
+        return self.image is not None and (self.image.deviceIndependentSize().toSize() == self.size())
+
+    def paintEvent(self, e):
+        p = QPainter(self)
+        if self.image is not None:
+            p.drawImage(0, 0, self.image)   # a stale size stays crisp until the new one arrives
+        else:
+            p.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, f"{PIE_CHARTS[self.chart][0]}…")
+
+class StatisticsPage(QWidget):
+    """SPEC "Statistics": nine pies and three top lists. Data and painting run on the renderer's
+    worker thread; cached images for the current size are shown as soon as the page opens."""
+    def __init__(self):
+        super().__init__()
+        self.renderer = ChartRenderer(parent=self)
+        self.renderer.stats_ready.connect(self.on_stats)
+        self.renderer.chart_ready.connect(self.on_chart)
+        self.renderer.failed.connect(lambda msg, gen: self.status.showMessage(f"Statistics failed: {msg}", 3000))
+        self.status = QStatusBar()
+
+        self.tiles = {k: ChartTile(k) for k in PIE_CHARTS}
+        grid = QGridLayout()
+        for i, tile in enumerate(self.tiles.values()):
+            grid.addWidget(tile, i // 3, i % 3)
+
+        tops = QHBoxLayout()
+        self.lblTop = {}
+        for key, title in (("top_genres", "Genre"), ("top_subgenres", "Subgenre"), ("top_vibes", "My vibe")):
+            box = QVBoxLayout()
+            head = QLabel(title); head.setStyleSheet("font-weight:bold;")
+            self.lblTop[key] = QLabel("…")
+            self.lblTop[key].setAlignment(Qt.AlignmentFlag.AlignTop)
+            box.addWidget(head); box.addWidget(self.lblTop[key]); box.addStretch(1)
+            tops.addLayout(box)
+
+        inner = QWidget()
+        lay = QVBoxLayout(inner)
+        lay.addLayout(grid)
+        lay.addLayout(tops)
+        self.scroll = QScrollArea()
+        self.scroll.setWidgetResizable(True)
+        self.scroll.setWidget(inner)
+
+        root = QVBoxLayout(self)
+        root.addWidget(self.scroll)
+        root.addWidget(self.status)
+
+        # resizes come in bursts; paint once the size settles
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(120)
+        self.resize_timer.timeout.connect(self.refresh)
+
+    def show_cached(self):
+        for tile in self.tiles.values():
+            img = self.renderer.cached(tile.chart, tile.pixel_size())
+            if img is not None:
+                tile.set_image(img)
+
+    def refresh(self):
+        if self.isVisible():
+            color = self.palette().color(self.foregroundRole()).name()
+            self.renderer.request({k: t.pixel_size() for k, t in self.tiles.items()}, color)
+
+    def pending(self):
+        # tiles still waiting for the latest request (a cached image may already be on screen)
+        gen = self.renderer.generation
+        return sum(not t.ready() or t.generation != gen for t in self.tiles.values())
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        self.show_cached()
+        self.refresh()   # picks up books saved since; unchanged data comes back from the cache
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        if self.isVisible():
+            self.show_cached()
+            self.resize_timer.start()
+
+    def on_stats(self, stats, gen):
+        if gen != self.renderer.generation:
+            return
+        for key, lbl in self.lblTop.items():
+            rows = stats[key]
+            lbl.setText("\n".join(f"{i}. {name} — {n}" for i, (name, n) in enumerate(rows, start=1)) or "—")
+
+    def on_chart(self, chart, image, gen):
+        if gen == self.renderer.generation:
+            self.tiles[chart].generation = gen
+            self.tiles[chart].set_image(image)
+
+class BooksPage(QWidget):
+    """SPEC "My books": the journal a page at a time in the chosen order (db_access.list_books), or
+    ranked matches while the search box has text (db_access.SearchSession). More rows load as the
+    list is scrolled to the end. Double-click or Enter on a book opens it in "Edit book".
+    The Filters panel is still a placeholder."""
+    open_book = pyqtSignal(int)
+    PAGE = 100
+    ORDERS = [("date_finish", "Date finished"), ("date_start", "Date started"), ("rating", "Rating"),
+              ("name", "Name"), ("author", "Author")]
+
+    def __init__(self):
+        super().__init__()
+        self.session = SearchSession()
+        self.next_key = None   # list_books cursor for the next page
+        self.matches = None    # the rest of the search results, while searching
+        self.status = QStatusBar()
+
+        self.edSearch = QLineEdit()
+        self.edSearch.setPlaceholderText("Search title or author")
+        self.edSearch.textChanged.connect(self.reload)
+        self.cbOrder = QComboBox()
+        for key, label in self.ORDERS:
+            self.cbOrder.addItem(label, key)
+        self.cbOrder.currentIndexChanged.connect(self.reload)
+        self.btnDir = QPushButton("Descending")
+        self.btnDir.setCheckable(True)   # checked = ascending
+        self.btnDir.toggled.connect(lambda on: (self.btnDir.setText("Ascending" if on else "Descending"), self.reload()))
+        bar = QHBoxLayout()
+        bar.addWidget(self.edSearch, 1)
+        bar.addWidget(QLabel("Order by"))
+        bar.addWidget(self.cbOrder)
+        bar.addWidget(self.btnDir)
+
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Name", "Author", "Finished"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        # Enter activates; whether a double-click also does depends on the style, so both are wired
+        self.table.activated.connect(self.on_activated)
+        self.table.doubleClicked.connect(self.on_activated)
+        self.table.verticalScrollBar().valueChanged.connect(self.more_at_end)
+
+        root = QVBoxLayout(self)
+        root.addLayout(bar)
+        root.addWidget(self.table)
+        root.addWidget(self.status)
+
+    def on_activated(self, index):
+        self.open_book.emit(self.table.item(index.row(), 0).data(Qt.ItemDataRole.UserRole))
+
+    def reload(self):
+        self.table.setRowCount(0)
+        self.next_key, self.matches = None, None
+        text = self.edSearch.text().strip()
+        if text:
+            self.matches = self.session.search(text)
+        self.load_more(first=True)
+
+    def load_more(self, first=False):
+        if self.matches is not None:
+            rows = list(itertools.islice(self.matches, self.PAGE))
+            if len(rows) < self.PAGE:
+                self.matches = iter(())
+        elif first or self.next_key is not None:
+            rows, self.next_key = list_books(self.cbOrder.currentData(), "asc" if self.btnDir.isChecked() else "desc",
+                                             self.next_key, self.PAGE)
+        else:
+            return
+        today = datetime.date.today().isoformat()
+        for book in rows:
+            n = self.table.rowCount()
+            self.table.insertRow(n)
+            name = QTableWidgetItem(book.name)
+            name.setData(Qt.ItemDataRole.UserRole, book.id)
+            if book.icon_path and os.path.exists(book.icon_path):
+                name.setIcon(QIcon(book.icon_path))
+            items = [name, QTableWidgetItem(book.author_name or ""), QTableWidgetItem(book.date_finish or "")]
+            due = book.remember_check_due_at and book.remember_check_due_at <= today
+            for col, item in enumerate(items):
+                if due:
+                    item.setForeground(Qt.GlobalColor.red)   # "Do I remember it?" check is due
+                self.table.setItem(n, col, item)
+
+    def more_at_end(self, value):
+        if value == self.table.verticalScrollBar().maximum():
+            self.load_more()
+
+    def refresh(self):
+        if self.isVisible():
+            self.reload()
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        self.reload()
+
+class IdleMaintenance(QObject):
+    """Runs maintenance.run() on a worker thread once the user has been idle for IDLE_MS and a run
+    is due; any key press, click or wheel cancels it at the next budget check. A short pass runs
+    at shutdown instead if the idle one never got its turn."""
+    IDLE_MS = 60_000
+    INPUT = (QEvent.Type.KeyPress, QEvent.Type.MouseButtonPress, QEvent.Type.Wheel)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="maintenance")
+        self.cancel = threading.Event()
+        self.future = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.IDLE_MS)
+        self.timer.timeout.connect(self.on_idle)
+        QApplication.instance().installEventFilter(self)
+        self.timer.start()
+
+    def eventFilter(self, obj, e):
+        if e.type() in self.INPUT:
+            self.cancel.set()
+            self.timer.start()
+        return False
+
+    def on_idle(self):
+        if self.future is None or self.future.done():
+            self.cancel.clear()
+            self.future = self.executor.submit(self.run, DB_PATH)
+
+    def run(self, path):
+        try:
+            reason = maintenance.due(path)
+            if reason:
+                maintenance.run(path, reason=f"idle: {reason}", cancel=self.cancel)
+        except Exception as e:   # nothing to show it in; the next idle period tries again
+            print(f"maintenance failed: {e}", file=sys.stderr)
+
+    def shutdown(self):
+        QApplication.instance().removeEventFilter(self)
+        self.timer.stop()
+        self.cancel.set()
+        self.executor.shutdown(wait=True)
+        try:
+            reason = maintenance.due(DB_PATH)
+            if reason:
+                maintenance.run(DB_PATH, maintenance.SHUTDOWN_STEPS, maintenance.SHUTDOWN_BUDGETS,
+                                reason=f"shutdown: {reason}")
+        except sqlite3.Error as e:
+            print(f"maintenance failed: {e}", file=sys.stderr)
+
+class JournalWatcher(QObject):
+    """Emits changed when another process writes the journal: at once through the change counter
+    in its lock file (db_access.write_lock), and every POLL_MS through PRAGMA data_version for
+    writers that don't take the lock."""
+    changed = pyqtSignal()
+    POLL_MS = 3000
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.conn = sqlite3.connect(path)   # only asked for data_version, which moves on others' commits
+        self.count, self.version = change_count(path), self._version()
+        lock = lock_path(path)
+        if not os.path.exists(lock):
+            open(lock, "ab").close()
+        self.files = QFileSystemWatcher([lock], self)
+        self.files.fileChanged.connect(self.check)
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.POLL_MS)
+        self.timer.timeout.connect(self.check)
+        self.timer.start()
+
+    def _version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def check(self):
+        if self.conn is None:   # closed; a queued fileChanged can still arrive
+            return
+        count, version = change_count(self.path), self._version()
+        if count != self.count:
+            others = count[1] != os.getpid()   # our own saves refresh what they touch themselves
+        else:
+            others = version != self.version   # a writer outside the lock (sqlite3 shell), or maintenance
+        self.count, self.version = count, version
+        if others:
+            self.changed.emit()
+
+    def close(self):
+        self.timer.stop()
+        self.files.fileChanged.disconnect(self.check)
+        self.files.removePaths(self.files.files())
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Reading Journal — Add a book")
         self.resize(900, 800)
 
-        # Top nav placeholders
+        self.page = AddBookPage()
+        self.page.saved.connect(self.on_saved)
+        self.books = BooksPage()
+        self.books.open_book.connect(self.open_book)
+        self.stats = StatisticsPage()
+        self.pages = QStackedWidget()
+        self.pages.addWidget(self.page)
+        self.pages.addWidget(self.books)
+        self.pages.addWidget(self.stats)
+
+        # Top nav; Settings is still a placeholder
         nav = QHBoxLayout()
         for label in ["My books","Add a book","Statistics","Settings"]:
             b = QPushButton(label)
-            if label != "Add a book":
+            if label == "My books":
+                b.clicked.connect(lambda: self.show_page(self.books, "My books"))
+            elif label == "Add a book":
+                b.clicked.connect(lambda: self.show_page(self.page, "Add a book"))
+            elif label == "Statistics":
+                b.clicked.connect(lambda: self.show_page(self.stats, "Statistics"))
+            else:
                 b.clicked.connect(lambda _, t=label: QMessageBox.information(self, t, f"{t} — coming soon"))
             nav.addWidget(b)
         nav.addStretch(1)
 
-        self.page = AddBookPage()
-
         root = QVBoxLayout(self)
         root.addLayout(nav)
         sep = QFrame(); sep.setFrameShape(QFrame.Shape.HLine); root.addWidget(sep)
-        root.addWidget(self.page)
+        root.addWidget(self.pages)
+
+        self.maintenance = IdleMaintenance(self)
+        self.watcher = JournalWatcher(DB_PATH, self)
+        self.watcher.changed.connect(self.stats.refresh)   # no-op unless the page is showing
+        self.watcher.changed.connect(self.books.refresh)
+        self.watcher.changed.connect(self.page.refresh_trees)
+
+    def show_page(self, page, title):
+        if page is self.page and self.page.book_id is not None:
+            title = "Edit book"
+        self.pages.setCurrentWidget(page)
+        self.setWindowTitle(f"Reading Journal — {title}")
+
+    def closeEvent(self, e):
+        self.stats.renderer.close()
+        self.watcher.close()
+        self.maintenance.shutdown()
+        super().closeEvent(e)
+
+    def open_book(self, book_id):
+        # "Edit book": the Add form, filled in from the journal
+        if self.pages.currentWidget() is self.page and self.page.book_id == book_id:
+            return   # the same double-click arriving as activated and doubleClicked
+        if self.page.load_book(book_id):
+            self.show_page(self.page, "Edit book")
+
+    def on_saved(self, book_id):
+        # SPEC "Edit book": back to "My books" with a notification
+        self.show_page(self.books, "My books")
+        self.books.status.showMessage("Book saved", 2000)
 
 def main():
+    app = QApplication(sys.argv)   # before any widget, the error box included
     if not os.path.exists(DB_PATH):
         QMessageBox.critical(None, "Error", f"Cannot find {DB_PATH}. Run db_setup.py first.")
         return
-    app = QApplication(sys.argv)
+    # older journal.db files get their schema upgrades before any page queries them
+    with db() as conn:
+        migrate(conn)
     win = MainWindow()
     win.show()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    import sys
-    # pick the one your code uses:
-    from PyQt6.QtWidgets import QApplication  # if you're on PyQt6
-    # from PySide6.QtWidgets import QApplication  # if you use PySide6
-
-    app = QApplication(sys.argv)
-
-    # make your main window only AFTER QApplication exists
-    win = MainWindow()        # or whatever your top-level widget class is called
-    win.show()
-
-    sys.exit(app.exec())
-
+    main()
@@ -0,0 +1,106 @@
+# bench/api_load.py
+# Load test for api_server: N concurrent keep-alive clients hammer a mix of endpoints
+# for a fixed time, optionally while a writer thread keeps adding books (like the GUI would).
+#   python bench/api_load.py [--url http://127.0.0.1:8765] [--clients 32] [--seconds 10] [--write-every 0.05]
+# Prints requests/s and latency percentiles per endpoint and overall.
+import argparse, asyncio, itertools, os, random, statistics, sys, threading, time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_access
+
+PATHS = [
+    "/books?limit=50",
+    "/books?order=rating&dir=desc&limit=50",
+    "/books?order=author&dir=asc&limit=50",
+    "/books/page?order=rating&limit=50",
+    "/search?q=the",
+    "/stats",
+    "/lookups/vibes",
+    "/reminders",
+]
+
+async def client(host, port, deadline, paths, lat, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            if time.perf_counter() >= deadline:
+                break
+            t0 = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b""):
+                    break
+                if h.lower().startswith(b"content-length:"):
+                    length = int(h.split(b":")[1])
+            await reader.readexactly(length)
+            key = path.split("?")[0] + ("?" + path.split("?")[1].split("&")[0] if "?" in path else "")
+            lat.setdefault(key, []).append(time.perf_counter() - t0)
+            if b" 200 " not in status:
+                errors.append(status.decode().strip())
+    finally:
+        writer.close()
+
+def writer_thread(db, every, stop, counter):
+    # a GUI-like writer: small transactions every `every` seconds
+    db_access.DB_PATH = db
+    n = 0
+    while not stop.is_set():
+        with db_access.get_conn() as c:
+            db_access.add_book({"name": f"Load test book {n}", "rating": n % 11, "date_finish": "2024-01-01",
+                                "vibes": "Cozy"}, c)
+        n += 1
+        counter[0] = n
+        stop.wait(every)
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8765")
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--write-every", type=float, default=0, help="seconds between writes; 0 = no writer")
+    ap.add_argument("--db", default=db_access.DB_PATH, help="database the writer thread uses")
+    args = ap.parse_args()
+    u = urlsplit(args.url)
+
+    stop, written = threading.Event(), [0]
+    wt = None
+    if args.write_every > 0:
+        wt = threading.Thread(target=writer_thread, args=(args.db, args.write_every, stop, written), daemon=True)
+        wt.start()
+
+    lat, errors = {}, []
+    async def run():
+        deadline = time.perf_counter() + args.seconds
+        rnd = random.Random(1)
+        def mix():
+            return (rnd.choice(PATHS) for _ in itertools.count())
+        await asyncio.gather(*(client(u.hostname, u.port, deadline, mix(), lat, errors) for _ in range(args.clients)))
+
+    t0 = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    if wt:
+        wt.join()
+
+    total = [x for v in lat.values() for x in v]
+    print(f"{len(total)} requests in {elapsed:.2f}s with {args.clients} clients: {len(total) / elapsed:.0f} req/s, "
+          f"{len(errors)} error(s), {written[0]} concurrent write(s)")
+    print(f"{'endpoint':40} {'n':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for key, v in sorted(lat.items()) + [("ALL", total)]:
+        print(f"{key:40} {len(v):7} {statistics.median(v) * 1000:8.2f} {pct(v, 95) * 1000:8.2f} "
+              f"{pct(v, 99) * 1000:8.2f} {max(v) * 1000:8.2f}")
+    if errors:
+        print("first errors:", errors[:3])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# bench/cold_text.py
+# Hot/cold split benchmark: the same notes-heavy journal before and after db_setup.m006_cold_text.
+#   python bench/cold_text.py [--books 20000] [--notes 2000] [--template journal.db]
+# Builds a schema-5 copy of the template with --books synthetic books carrying ~--notes bytes of
+# free text each, copies it, migrates the copy, then runs the list / filter / statistics queries
+# on both. Prints pages of the books b-tree (what a full scan reads) and median timings.
+# The plain "My books" orders are served by the covering idx_books_page_* indexes either way;
+# the split pays off on queries that still scan the table (unindexed filters, statistics).
+import argparse, os, random, shutil, sqlite3, statistics, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_access
+from db_setup import MIGRATIONS, migrate
+
+WORDS = ("the book was slow at first but the second half made up for it character plot ending "
+         "world building prose quiet cozy dark twist reread later library borrowed favourite line "
+         "dragon ship city winter letters memory sister war garden sea").split()
+
+QUERIES = {
+    "list (order by date)": db_access.BOOK_LIST_SQL + db_access.book_order_sql("date_finish", "desc"),
+    "list (order by author)": db_access.BOOK_LIST_SQL + db_access.book_order_sql("author", "asc"),
+    "filter (dnf, rating >= 8)": db_access.BOOK_LIST_SQL + " WHERE b.dnf = 0 AND b.rating >= 8"
+                                 + db_access.book_order_sql("name", "asc"),
+    "filter (physical copy)": db_access.BOOK_LIST_SQL + " WHERE b.phys_copy = 0 AND b.genre IS NULL"
+                                + db_access.book_order_sql("date_finish", "desc"),
+    "text filter": db_access.BOOK_LIST_SQL + " WHERE (b.name LIKE '%42%' OR b.author_sort LIKE '%42%')",
+    "stats (all pies)": ";".join(sql for _, sql in db_access.PIE_CHARTS.values()),
+}
+
+def text(rnd, size):
+    out, n = [], 0
+    while n < size:
+        w = rnd.choice(WORDS)
+        out.append(w); n += len(w) + 1
+    return " ".join(out)
+
+def build(path, template, books, notes):
+    shutil.copy(template, path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for n, step in enumerate(MIGRATIONS[version:5], start=version + 1):
+        with conn:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {n};")
+    rnd = random.Random(1)
+    authors = [r[0] for r in conn.execute("SELECT id FROM author")] or [None]
+    rows = []
+    for i in range(books):
+        name = f"Bench Book {i}"
+        rows.append((name, db_access.title_key(name), rnd.choice(authors), rnd.choice((0, 0, 0, 1)),
+                     rnd.randint(0, 10), f"20{rnd.randint(10, 25)}-{rnd.randint(1, 12):02}-{rnd.randint(1, 28):02}",
+                     text(rnd, notes), text(rnd, notes // 4), text(rnd, notes // 4), text(rnd, 60), text(rnd, 120)))
+    with conn:
+        conn.executemany("""
+            INSERT INTO books (name, title_key, author, dnf, rating, date_finish,
+                               notes, expectations, expectations_failed, line, reminded, phys_copy)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)""", rows)
+    conn.execute("VACUUM")
+    conn.close()
+
+def books_pages(conn):
+    # pages of the books table itself (leaf, interior and overflow), i.e. what a table scan reads
+    return conn.execute("SELECT count(*) FROM dbstat WHERE name = 'books'").fetchone()[0]
+
+def timed(conn, sql, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for stmt in sql.split(";"):
+            conn.execute(stmt).fetchall()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--books", type=int, default=20000)
+    ap.add_argument("--notes", type=int, default=2000, help="approximate bytes of notes per book")
+    ap.add_argument("--template", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                       "journal.db"))
+    ap.add_argument("--repeat", type=int, default=7)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="cold_text_")
+    before, after = os.path.join(tmp, "before.db"), os.path.join(tmp, "after.db")
+    t0 = time.perf_counter()
+    build(before, args.template, args.books, args.notes)
+    shutil.copy(before, after)
+    conn = sqlite3.connect(after)
+    t1 = time.perf_counter()
+    migrate(conn)
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"{args.books} books, ~{args.notes} B of notes each; built in {t1 - t0:.1f}s, "
+          f"migrated in {time.perf_counter() - t1:.1f}s")
+
+    results = {}
+    for label, path in (("before", before), ("after", after)):
+        conn = sqlite3.connect(path)
+        db_access.attach_archives(conn)   # the list/stats SQL reads the all_* views
+        results[label] = {"pages": books_pages(conn), "file": os.path.getsize(path),
+                          **{q: timed(conn, sql, args.repeat) for q, sql in QUERIES.items()}}
+        conn.close()
+    b, a = results["before"], results["after"]
+    print(f"{'':28} {'before':>12} {'after':>12} {'ratio':>7}")
+    print(f"{'books table pages':28} {b['pages']:12} {a['pages']:12} {b['pages'] / a['pages']:6.1f}x")
+    print(f"{'file size (MB)':28} {b['file'] / 1e6:12.1f} {a['file'] / 1e6:12.1f} {b['file'] / a['file']:6.1f}x")
+    for q in QUERIES:
+        print(f"{q:28} {b[q] * 1000:10.1f}ms {a[q] * 1000:10.1f}ms {b[q] / a[q]:6.1f}x")
+    shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
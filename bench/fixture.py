@@ -0,0 +1,32 @@
+# bench/fixture.py
+# Synthetic journals for the benchmarks: a migrated copy of the repo's journal.db with generated
+# rows added after its own. Each bench keeps only its generator:
+#   ids = fixture.journal_copy(path, fill)   # fill(conn, first) -> whatever the bench needs back
+# Importing this module puts the repo root on sys.path, so benches import db_access after it.
+import os, shutil, sys
+from typing import Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db_access
+from db_setup import migrate
+
+def journal_copy(path: str, fill, modules: Sequence = ()):
+    # copies journal.db to path and points db_access (and modules with their own DB_PATH, e.g. app)
+    # at it, migrates it, then runs fill(conn, first) in one transaction; first is the next free
+    # books.id. The connection is closed before returning. -> fill's result
+    shutil.copy(os.path.join(ROOT, "journal.db"), path)
+    for m in (db_access, *modules):
+        m.DB_PATH = path
+    conn = db_access.get_conn()
+    try:
+        with conn:
+            migrate(conn)
+            first = (conn.execute("SELECT max(id) FROM books").fetchone()[0] or 0) + 1
+            return fill(conn, first)
+    finally:
+        conn.close()
+
+def insert_rows(conn, table: str, columns: Sequence[str], rows):
+    conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows)
@@ -0,0 +1,131 @@
+# bench/multiprocess.py
+# Many processes on one journal: --readers processes run "My books" pages, text filters and the
+# statistics while --writers processes save books (add, or edit rating and vibes), for --seconds.
+#   python bench/multiprocess.py [--readers 6] [--writers 4] [--seconds 10] [--books 5000]
+#                                [--lock on|off] [--journal wal|delete]
+# --lock off writes the way the code did before db_access.write_lock: deferred transactions on
+# get_conn() with only SQLite's busy timeout. --journal delete puts the copy back in rollback-journal
+# mode, where a writer also blocks the readers. Prints throughput and latency per role, and for
+# writers the time queued for the write lock, retries and failed saves.
+import argparse, collections, multiprocessing, os, random, shutil, statistics, tempfile, time
+
+import fixture
+import db_access
+
+VIBES = [f"Stress vibe {i}" for i in range(50)]
+
+def build(path, books, journal, seed=1):
+    rnd = random.Random(seed)
+    def fill(c, first):
+        fixture.insert_rows(c, "books", ("id", "name", "title_key", "rating", "date_finish"),
+                            [(first + i, f"Stress Book {i}", f"stress book {i}", rnd.randint(1, 10),
+                              f"{rnd.randint(2015, 2025)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}")
+                             for i in range(books)])
+        for v in VIBES:
+            db_access.upsert_vibe(v, c)
+        return list(range(first, first + books))
+    ids = fixture.journal_copy(path, fill)
+    c = db_access.get_conn()
+    c.execute(f"PRAGMA journal_mode = {journal.upper()};")   # needs the file to itself
+    c.close()
+    return ids
+
+def save(conn, rnd, ids):
+    # what the app's Save does: an edit (read, then write) most of the time, sometimes a new book
+    if rnd.random() < 0.2:
+        db_access.add_book({"name": f"Stress New {rnd.random():.12f}", "author": f"Author {rnd.randrange(200)}",
+                            "rating": rnd.randint(1, 10), "vibes": rnd.sample(VIBES, 2)}, conn)
+    else:
+        book_id = rnd.choice(ids)
+        db_access.update_book(book_id, {"rating": rnd.randint(1, 10)}, conn)
+        db_access.set_book_vibes(book_id, rnd.sample(VIBES, rnd.randint(0, 3)), conn)
+
+def read(rnd):
+    pick = rnd.random()
+    if pick < 0.5:
+        db_access.list_books(rnd.choice(list(db_access.BOOK_ORDERS)), rnd.choice(("asc", "desc")), limit=50)
+    elif pick < 0.9:
+        db_access.query_books({"text": str(rnd.randrange(1000))}, "name", "asc", 50)
+    else:
+        db_access.statistics()
+
+def worker(role, n, path, ids, seconds, lock, start, out):
+    db_access.DB_PATH = path
+    db_access.QUERY_CACHE.enabled = False   # every read goes to the file
+    rnd = random.Random(n)
+    lat, errors = [], collections.Counter()
+    start.wait()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        t0 = time.perf_counter()
+        try:
+            if role == "reader":
+                read(rnd)
+            elif lock:
+                db_access.run_write(save, rnd, ids)
+            else:
+                with db_access.get_conn() as c:
+                    save(c, rnd, ids)
+                c.close()
+        except Exception as e:
+            errors[f"{type(e).__name__}: {str(e)[:40]}"] += 1
+            continue
+        lat.append(time.perf_counter() - t0)
+    out.put((role, lat, dict(errors), dict(db_access.LOCK_STATS)))
+
+def summary(lat):
+    if not lat:
+        return "no operation finished"
+    q = statistics.quantiles(lat, n=100) if len(lat) > 1 else lat * 99
+    return f"median {statistics.median(lat) * 1000:7.2f} ms, p99 {q[98] * 1000:8.2f} ms, max {max(lat) * 1000:8.2f} ms"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--readers", type=int, default=6)
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--books", type=int, default=5000)
+    ap.add_argument("--lock", choices=("on", "off"), default="on")
+    ap.add_argument("--journal", choices=("wal", "delete"), default="wal")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="multiprocess_")
+    path = os.path.join(tmp, "journal.db")
+    ids = build(path, args.books, args.journal)
+    ctx = multiprocessing.get_context("spawn")
+    start, out = ctx.Event(), ctx.Queue()
+    roles = ["reader"] * args.readers + ["writer"] * args.writers
+    procs = [ctx.Process(target=worker, args=(role, n, path, ids, args.seconds, args.lock == "on", start, out))
+             for n, role in enumerate(roles)]
+    for p in procs:
+        p.start()
+    time.sleep(1.0)   # let every process import before the clock starts
+    start.set()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s, {args.books} books, "
+          f"journal_mode={args.journal}, write lock {args.lock}")
+    for role in ("reader", "writer"):
+        mine = [r for r in results if r[0] == role]
+        if not mine:
+            continue
+        lat = [x for r in mine for x in r[1]]
+        errors = collections.Counter()
+        for r in mine:
+            errors.update(r[2])
+        print(f"{role}s: {len(lat) / args.seconds:8.1f} ops/s  {summary(lat)}")
+        if role == "writer" and args.lock == "on":
+            stats = [r[3] for r in mine]
+            waited = sum(s["wait_s"] for s in stats)
+            print(f"  lock: {sum(s['waited'] for s in stats)} of {sum(s['acquired'] for s in stats)} acquisitions "
+                  f"waited, {waited:.2f}s in all ({waited / max(1, len(lat)) * 1000:.2f} ms per save), "
+                  f"longest {max(s['max_wait_s'] for s in stats) * 1000:.1f} ms; "
+                  f"{sum(s['retries'] for s in stats)} retries")
+        for msg, n in errors.most_common():
+            print(f"  failed {n}x: {msg}")
+    shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench/search_typing.py
+# "My books" text box on a large synthetic journal: a query per keystroke against SearchSession.
+#   python bench/search_typing.py [--books 50000] [--words 20]
+# Types --words titles a letter at a time, with a backspace and a retyped letter in each, and
+# times the first screen (SearchSession.FIRST rows) after every keystroke both ways: a fresh
+# uncached query_books() call, and one SearchSession that narrows its last result in memory.
+import argparse, itertools, os, random, shutil, statistics, tempfile, time
+
+import fixture
+import db_access
+
+WORDS = ("dragon ship city winter letters memory sister war garden sea night house river crown "
+         "glass shadow storm orchard silver island stranger kingdom fire salt bone library").split()
+NAMES = ("Ada Bell Cole Dunn Ellis Finch Grey Hale Ives Joyce Kerr Lowe Marsh Noel Orr Pike "
+         "Quinn Rowe Shaw Tate").split()
+
+def build(path, books, seed=1):
+    rnd = random.Random(seed)
+    def fill(c, first):
+        rows = []
+        for i in range(books):
+            name = "The " * (rnd.random() < 0.3) + " ".join(rnd.choice(WORDS).title() for _ in range(rnd.randint(1, 4)))
+            rows.append((first + i, name, f"{rnd.choice(NAMES)}, {rnd.choice(NAMES)}", db_access.title_key(name)))
+        fixture.insert_rows(c, "books", ("id", "name", "author_sort", "title_key"), rows)
+        return [r[1] for r in rows]
+    return fixture.journal_copy(path, fill)
+
+def keystrokes(title, rnd):
+    # what the box holds after each key: the title typed out, one wrong letter taken back on the way
+    typed = []
+    slip = rnd.randrange(1, max(2, len(title)))
+    for i in range(1, len(title) + 1):
+        if i == slip:
+            typed += [title[:i - 1] + "x", title[:i - 1]]
+        typed.append(title[:i])
+    return typed
+
+def ms(samples):
+    return f"median {statistics.median(samples) * 1000:7.2f} ms, p90 {statistics.quantiles(samples, n=10)[-1] * 1000:7.2f} ms, " \
+           f"max {max(samples) * 1000:7.2f} ms"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--books", type=int, default=50000)
+    ap.add_argument("--words", type=int, default=20, help="titles typed")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="search_")
+    path = os.path.join(tmp, "journal.db")
+    titles = build(path, args.books)
+    rnd = random.Random(2)
+    typed = [keystrokes(t, rnd) for t in rnd.sample(titles, args.words)]
+    n = db_access.SearchSession.FIRST
+    db_access.QUERY_CACHE.enabled = False
+
+    plain, session = [], []
+    for box in typed:
+        for text in box:
+            t0 = time.perf_counter()
+            db_access.query_books({"text": text}, "name", "asc", n)
+            plain.append(time.perf_counter() - t0)
+    s = db_access.SearchSession()
+    for box in typed:
+        for text in box:
+            t0 = time.perf_counter()
+            list(itertools.islice(s.search(text), n))
+            session.append(time.perf_counter() - t0)
+    print(f"{args.books} books, {sum(map(len, typed))} keystrokes, first {n} rows per keystroke")
+    print(f"query_books:   {ms(plain)}")
+    print(f"SearchSession: {ms(session)}  ({s.fresh} from the database, {s.narrowed} narrowed in memory)")
+    shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# bench/similar.py
+# "Read next" engine on a large synthetic journal, NumPy and pure-Python side by side.
+#   python bench/similar.py [--books 100000] [--vibes 400] [--queries 200]
+# Prints the full load, books-like-this and vibes-I-rate-highest latencies, and the cost of
+# catching up after a handful of saves (the incremental path through book_change).
+import argparse, os, random, shutil, statistics, tempfile, time
+
+import fixture
+import db_access, similar
+
+def build(path, books, vibes, seed=1):
+    rnd = random.Random(seed)
+    def fill(c, first):
+        vibe_ids = [db_access.upsert_vibe(f"Bench vibe {i}", c) for i in range(vibes)]
+        genres = c.execute("SELECT g.id, g.category_id, s.id FROM genre g LEFT JOIN subgenre s ON s.genre_id = g.id").fetchall()
+        reread = [r[0] for r in c.execute("SELECT id FROM reread")] + [None]
+        months = [r[0] for r in c.execute("SELECT id FROM months_later")] + [None]
+        rows, links = [], []
+        for i in range(books):
+            gid, cat, sid = rnd.choice(genres)
+            rows.append((first + i, f"Bench Book {i}", cat, gid, sid if rnd.random() < 0.6 else None,
+                         rnd.randint(0, 10), rnd.choice(reread), rnd.choice(months), int(rnd.random() < 0.1)))
+            # a few popular vibes and a long tail, like a real journal
+            links += {(first + i, vibe_ids[min(int(rnd.paretovariate(1.2)) - 1, vibes - 1)])
+                      for _ in range(rnd.randint(0, 4))}
+        fixture.insert_rows(c, "books", ("id", "name", "category", "genre", "subgenre", "rating", "reread",
+                                         "months_later", "dnf"), rows)
+        fixture.insert_rows(c, "book_vibes", ("book_id", "vibe_id"), links)
+        return [r[0] for r in rows]
+    return fixture.journal_copy(path, fill)
+
+def ms(samples):
+    return f"median {statistics.median(samples) * 1000:7.2f} ms, max {max(samples) * 1000:7.2f} ms"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--books", type=int, default=100000)
+    ap.add_argument("--vibes", type=int, default=400)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--saves", type=int, default=10, help="books edited between the catch-up measurements")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="similar_")
+    path = os.path.join(tmp, "journal.db")
+    t0 = time.perf_counter()
+    ids = build(path, args.books, args.vibes)
+    print(f"{args.books} books, {args.vibes} vibes built in {time.perf_counter() - t0:.1f}s "
+          f"(numpy: {'yes' if similar.np else 'not installed'})")
+    rnd = random.Random(2)
+    picks = rnd.sample(ids, min(args.queries, len(ids)))
+    backends = [("numpy", True)] * bool(similar.np) + [("python", False)]
+    for label, use_numpy in backends:
+        eng = similar.Similarity(path, use_numpy=use_numpy)
+        t0 = time.perf_counter()
+        eng.sync()
+        print(f"[{label}] full load {time.perf_counter() - t0:.2f}s")
+        like = []
+        for book_id in picks:
+            t0 = time.perf_counter()
+            eng.like(book_id, 10)
+            like.append(time.perf_counter() - t0)
+        vibes = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            eng.top_vibes(5)
+            vibes.append(time.perf_counter() - t0)
+        catch_up = []
+        for r in range(5):
+            with db_access.get_conn() as c:
+                for book_id in rnd.sample(ids, args.saves):
+                    db_access.update_book(book_id, {"rating": rnd.randint(1, 10)}, c)
+                    db_access.set_book_vibes(book_id, [f"Bench vibe {rnd.randrange(args.vibes)}"], c)
+            t0 = time.perf_counter()
+            eng.sync()
+            catch_up.append(time.perf_counter() - t0)
+        print(f"[{label}] books like this: {ms(like)}")
+        print(f"[{label}] vibes I rate highest: {ms(vibes)}")
+        print(f"[{label}] catch up after {args.saves} saves: {ms(catch_up)}")
+        eng.close()
+    shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# bench/ui_latency.py
+# What the user feels on the Add-a-book page, measured headless (QT_QPA_PLATFORM=offscreen)
+# against a large synthetic journal:
+#   - keystroke in Author / Vibes -> suggestion popup updated
+#   - Category toggle -> Genre list repopulated
+#   - Save click -> save_book + reset_form done
+#   - main window construction -> first paint
+#   - Statistics tab: click -> all nine pies shown (painted, or from the image cache)
+#   python bench/ui_latency.py [--books 20000] [--authors 3000] [--rounds 20] [--out ui_latency.json]
+#   python bench/ui_latency.py --compare old.json     # ratios against an earlier run
+# Each sample is the time from the simulated event to the end of the event processing it caused.
+import argparse, datetime, json, os, platform, random, shutil, statistics, subprocess, sys, tempfile, time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+import fixture
+from fixture import ROOT
+
+from PyQt6.QtCore import Qt, QT_VERSION_STR
+from PyQt6.QtTest import QTest
+from PyQt6.QtWidgets import QApplication
+
+import app, db_access
+
+SYLLABLES = "ka lo mi ra ne so ur su la gu in be an ta vo ri el da mo fe".split()
+
+def name(rnd, words):
+    return " ".join("".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 3))).title() for _ in range(words))
+
+def build_journal(path, books, authors, vibes, seed=1):
+    rnd = random.Random(seed)
+    def fill(c, first):
+        author_ids = [db_access.upsert_author(name(rnd, 2), c) for _ in range(authors)]
+        vibe_ids = [db_access.upsert_vibe(name(rnd, 1), c) for _ in range(vibes)]
+        sizes = [r[0] for r in c.execute("SELECT id FROM size")]
+        genres = c.execute("SELECT id, category_id FROM genre").fetchall()
+        links = []
+        for i in range(books):
+            gid, cat = rnd.choice(genres)
+            book_id = db_access.insert_book({
+                "name": name(rnd, rnd.randint(1, 4)), "author": rnd.choice(author_ids), "size": rnd.choice(sizes),
+                "category": cat, "genre": gid, "rating": rnd.randint(0, 10),
+                "date_finish": f"20{rnd.randint(10, 25)}-{rnd.randint(1, 12):02}-{rnd.randint(1, 28):02}",
+            }, c)
+            links += [(book_id, v) for v in rnd.sample(vibe_ids, rnd.randint(0, 3))]
+        c.executemany("INSERT OR IGNORE INTO book_vibes(book_id, vibe_id) VALUES (?, ?)", links)
+    fixture.journal_copy(path, fill, (app,))
+
+def settle():
+    QApplication.processEvents()
+
+def timed(action):
+    t0 = time.perf_counter()
+    action()
+    settle()
+    return time.perf_counter() - t0
+
+def bench_typing(page, widget, words, rounds):
+    samples, shown = [], 0
+    widget.setFocus()
+    settle()
+    for r in range(rounds):
+        widget.clear()
+        settle()
+        for ch in words[r % len(words)]:
+            samples.append(timed(lambda: QTest.keyClick(widget, ch)))
+            shown += widget.completer.popup().isVisible()
+        widget.completer.popup().hide()
+    return samples, {"popup_shown": shown}
+
+def bench_category(page, rounds):
+    buttons = page.grpCategory.buttons()
+    samples = []
+    for r in range(rounds):
+        b = buttons[(r + 1) % len(buttons)]
+        samples.append(timed(lambda: QTest.mouseClick(b, Qt.MouseButton.LeftButton)))
+        assert page.lstGenre.count() > 0
+    return samples, {}
+
+def bench_save(page, rounds):
+    samples, reset = [], []
+    for r in range(rounds):
+        page.edName.setText(f"Benchmark book {r}")
+        page.edAuthor.setText("Benchmark Author")
+        page.edVibes.setText("Cozy, Dark")
+        page.dots.set_value(r % 10 + 1)
+        page.txtNotes.setPlainText("notes " * 50)
+        settle()
+        samples.append(timed(lambda: QTest.mouseClick(page.btnSaveTop, Qt.MouseButton.LeftButton)))
+        assert page.status.currentMessage().startswith("Book saved"), page.status.currentMessage()
+        reset.append(timed(page.reset_form))
+    return samples, {"reset_form_ms": summarize(reset)}
+
+def wait_charts(page, limit=30):
+    t0 = time.perf_counter()
+    while page.pending() and time.perf_counter() - t0 < limit:
+        settle()
+        time.sleep(0.001)
+    assert not page.pending(), "charts did not arrive"
+
+def bench_statistics(win, rounds):
+    # "cold": the data changed since the last visit, so every pie is painted on the worker thread;
+    # "cached": same data and size, the images come straight from the cache
+    stats_btn, add_btn = (next(b for b in win.findChildren(app.QPushButton) if b.text() == t)
+                          for t in ("Statistics", "Add a book"))
+    cold, cached, gui = [], [], []
+    for r in range(rounds):
+        with db_access.get_conn() as c:
+            db_access.add_book({"name": f"Stats round {r}", "rating": r % 11, "date_finish": "2024-06-01"}, c)
+        db_access.note_write()
+        for samples in (cold, cached):
+            QTest.mouseClick(add_btn, Qt.MouseButton.LeftButton)
+            settle()
+            t0 = time.perf_counter()
+            QTest.mouseClick(stats_btn, Qt.MouseButton.LeftButton)
+            settle()
+            gui.append(time.perf_counter() - t0)
+            wait_charts(win.stats)
+            samples.append(time.perf_counter() - t0)
+    QTest.mouseClick(add_btn, Qt.MouseButton.LeftButton)
+    settle()
+    return cold, cached, {"click_to_event_loop_ms": summarize(gui),
+                          "cache": {"hits": win.stats.renderer.hits, "misses": win.stats.renderer.misses}}
+
+def bench_window(rounds):
+    samples, windows = [], []
+    for _ in range(rounds):
+        def build():
+            w = app.MainWindow()
+            w.show()
+            windows.append(w)
+        samples.append(timed(build))
+        windows.pop().close()
+    return samples, {}
+
+def summarize(samples):
+    ms = sorted(x * 1000 for x in samples)
+    return {"n": len(ms), "median": round(statistics.median(ms), 3),
+            "p95": round(ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))], 3),
+            "max": round(ms[-1], 3), "mean": round(statistics.fmean(ms), 3)}
+
+def git_rev():
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--books", type=int, default=20000)
+    ap.add_argument("--authors", type=int, default=3000)
+    ap.add_argument("--vibes", type=int, default=400)
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--out", default="ui_latency.json", help="results file (JSON)")
+    ap.add_argument("--compare", help="earlier results file to print ratios against")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="ui_latency_")
+    path = os.path.join(tmp, "journal.db")
+    t0 = time.perf_counter()
+    build_journal(path, args.books, args.authors, args.vibes)
+    print(f"synthetic journal: {args.books} books, {args.authors} authors, {args.vibes} vibes "
+          f"({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+
+    qapp = QApplication.instance() or QApplication([])
+    results = {}
+    samples, extra = bench_window(max(3, args.rounds // 4))
+    results["window_construct"] = {**summarize(samples), **extra}
+
+    win = app.MainWindow()
+    win.show()
+    settle()
+    page = win.page
+    for key, widget, words in (("author_keystroke", page.edAuthor, ["kalo", "ursu", "mira", "lagu"]),
+                               ("vibe_keystroke", page.edVibes, ["co", "da", "sora", "fe"])):
+        samples, extra = bench_typing(page, widget, words, args.rounds)
+        results[key] = {**summarize(samples), **extra}
+    samples, extra = bench_category(page, args.rounds)
+    results["category_toggle"] = {**summarize(samples), **extra}
+    samples, extra = bench_save(page, args.rounds)
+    results["save_and_reset"] = {**summarize(samples), **extra}
+    cold, cached, extra = bench_statistics(win, max(3, args.rounds // 2))
+    results["statistics_cold"] = {**summarize(cold), **extra}
+    results["statistics_cached"] = summarize(cached)
+    win.close()
+    for s in (page.edAuthor.suggester, page.edVibes.suggester):
+        s.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {
+        "when": datetime.datetime.now().isoformat(timespec="seconds"), "git": git_rev(),
+        "python": platform.python_version(), "qt": QT_VERSION_STR, "platform": os.environ["QT_QPA_PLATFORM"],
+        "journal": {"books": args.books, "authors": args.authors, "vibes": args.vibes}, "rounds": args.rounds,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+
+    old = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)["results"]
+    print(f"{'interaction':20} {'n':>5} {'median ms':>10} {'p95 ms':>9} {'max ms':>9}" + ("  vs old median" if old else ""))
+    for key, r in results.items():
+        line = f"{key:20} {r['n']:5} {r['median']:10.2f} {r['p95']:9.2f} {r['max']:9.2f}"
+        if old and key in old:
+            line += f"  {r['median'] / old[key]['median']:.2f}x"
+        print(line)
+    print(f"results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# charts.py
+# Statistics page pies, painted into QImages on a worker thread.
+# A QImage (unlike a widget or QPixmap) can be painted on any thread, so the GUI thread only
+# blits finished images. Images are cached by (chart, dataset fingerprint, pixel size): reopening
+# the page, or resizing back to a size already seen, shows them without painting again.
+import collections, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import QObject, QRectF, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QImage, QPainter, QPen
+
+import db_access
+
+PALETTE = ("#4e79a7", "#f28e2b", "#e15759", "#76b7b2", "#59a14f",
+           "#edc948", "#b07aa1", "#ff9da7", "#9c755f", "#bab0ac")
+
+Size = Tuple[int, int, float]   # width, height (logical px), device pixel ratio
+
+def fingerprint(title: str, data: List[Tuple[str,int]]) -> int:
+    return hash((title, tuple(data)))
+
+def paint_pie(title: str, data: List[Tuple[str,int]], size: Size, text_color: str = "#000000") -> QImage:
+    width, height, ratio = size
+    img = QImage(max(1, round(width * ratio)), max(1, round(height * ratio)), QImage.Format.Format_ARGB32_Premultiplied)
+    img.setDevicePixelRatio(ratio)
+    img.fill(Qt.GlobalColor.transparent)
+    p = QPainter(img)
+    p.setRenderHint(QPainter.RenderHint.Antialiasing)
+    p.setPen(QColor(text_color))
+    font = QFont()
+    font.setBold(True)
+    p.setFont(font)
+    top = p.fontMetrics().height() + 6
+    p.drawText(QRectF(0, 0, width, top), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, title)
+    font.setBold(False)
+    p.setFont(font)
+    total = sum(n for _, n in data)
+    if not total:
+        p.drawText(QRectF(0, top, width, height - top), Qt.AlignmentFlag.AlignCenter, "No books yet")
+        p.end()
+        return img
+
+    # pie on the left; slices start at 12 o'clock and go clockwise (Qt angles are 1/16 degree)
+    d = max(10.0, min(width * 0.45, height - top - 8))
+    pie = QRectF(4, top + 4, d, d)
+    p.setPen(QPen(QColor("white"), 1))
+    done = 0
+    for i, (_, n) in enumerate(data):
+        start = 1440 - round(done * 5760 / total)
+        done += n
+        p.setBrush(QColor(PALETTE[i % len(PALETTE)]))
+        p.drawPie(pie, start, 1440 - round(done * 5760 / total) - start)
+
+    # legend on the right, as many rows as fit; the rest folds into "+N more"
+    fm = p.fontMetrics()
+    row = fm.height() + 2
+    x = pie.right() + 12
+    text_w = int(width - x - row)
+    fit = max(1, int((height - top - 4) // row))
+    shown = data if len(data) <= fit else data[:fit - 1]
+    p.setPen(QColor(text_color))
+    for i, (label, n) in enumerate(shown):
+        y = top + 4 + i * row
+        p.fillRect(QRectF(x, y + 3, row - 6, row - 6), QColor(PALETTE[i % len(PALETTE)]))
+        text = fm.elidedText(f"{label} — {n} ({100 * n / total:.0f}%)", Qt.TextElideMode.ElideRight, text_w)
+        p.drawText(QRectF(x + row, y, text_w, row), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, text)
+    if len(shown) < len(data):
+        p.drawText(QRectF(x + row, top + 4 + len(shown) * row, text_w, row),
+                   Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, f"+{len(data) - len(shown)} more")
+    p.end()
+    return img
+
+class ChartRenderer(QObject):
+    """Fetches statistics() and paints the pies on one worker thread; results arrive as signals."""
+    stats_ready = pyqtSignal(object, int)         # statistics() dict, generation
+    chart_ready = pyqtSignal(str, QImage, int)    # chart key, image, generation
+    failed = pyqtSignal(str, int)
+
+    def __init__(self, cache_size: int = 64, parent=None):
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="charts")
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()   # (chart, fingerprint, w, h, ratio) -> QImage
+        self.fingerprints = {}                    # chart -> fingerprint of the data last rendered
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.hits = self.misses = 0
+
+    def cached(self, chart: str, size: Size) -> Optional[QImage]:
+        # GUI thread: the image for the data seen last time, if one was painted at this size
+        with self.lock:
+            fp = self.fingerprints.get(chart)
+            img = self.cache.get((chart, fp, *size))
+            if img is not None:
+                self.cache.move_to_end((chart, fp, *size))
+            return img
+
+    def request(self, sizes: Dict[str, Size], text_color: str = "#000000") -> int:
+        # the newest request wins: older ones still queued or running stop at their next chart
+        self.generation += 1
+        self.executor.submit(self._run, self.generation, dict(sizes), text_color)
+        return self.generation
+
+    def _run(self, gen, sizes, text_color):
+        try:
+            stats = db_access.statistics()
+            if gen != self.generation:
+                return
+            self.stats_ready.emit(stats, gen)
+            for chart, size in sizes.items():
+                if gen != self.generation:
+                    return
+                title = db_access.PIE_CHARTS[chart][0]
+                data = stats["pies"][chart]
+                key = (chart, fingerprint(title, data), *size)
+                with self.lock:
+                    self.fingerprints[chart] = key[1]
+                    img = self.cache.get(key)
+                    if img is not None:
+                        self.hits += 1
+                        self.cache.move_to_end(key)
+                if img is None:
+                    img = paint_pie(title, data, size, text_color)
+                    with self.lock:
+                        self.misses += 1
+                        self.cache[key] = img
+                        while len(self.cache) > self.cache_size:
+                            self.cache.popitem(last=False)
+                self.chart_ready.emit(chart, img, gen)
+        except Exception as e:   # a future would swallow it
+            self.failed.emit(f"{type(e).__name__}: {e}", gen)
+
+    def close(self):
+        self.generation += 1
+        self.executor.shutdown(wait=True)
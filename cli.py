@@ -0,0 +1,270 @@
+# cli.py
+# Headless entry point: python -m cli <command> ...
+# Built on db_access only - never imports Qt, so it starts fast enough for cron jobs and pipelines.
+import argparse, json, os, sys
+
+import db_access, maintenance
+from db_setup import migrate
+
+BOOK_FIELDS = ("name", "author_name", "date_start", "date_finish", "rating", "dnf")
+
+def _connect(path):
+    # sqlite3 would create an empty file for a mistyped path, and migrate would then fail on it
+    if not os.path.isfile(path):
+        raise SystemExit(f"no journal at {path} (create one with python db_setup.py)")
+    db_access.DB_PATH = path
+    with db_access.get_conn() as c:
+        migrate(c)
+
+def _print_rows(rows, as_json, fields=BOOK_FIELDS):
+    for r in rows:
+        d = dict(r)
+        if as_json:
+            print(json.dumps(d, ensure_ascii=False))
+        else:
+            print("\t".join("" if d.get(k) is None else str(d.get(k)) for k in ("id",) + fields))
+
+# ---------- commands ----------
+def cmd_add(args):
+    if args.batch:
+        # one JSON object per line; everything in one transaction, all or nothing
+        records = [json.loads(line) for line in sys.stdin if line.strip()]
+    else:
+        if not args.name:
+            raise SystemExit("add: NAME is required (or use --batch)")
+        records = [{k: v for k, v in vars(args).items()
+                    if k in db_access.BOOK_COLUMNS + ("vibes",) and v is not None}]
+    def add(c):
+        ids = []
+        for n, rec in enumerate(records, start=1):
+            try:
+                ids.append(db_access.add_book(rec, c))
+            except (ValueError, KeyError) as e:
+                raise SystemExit(f"add: record {n}: {e}")
+        return ids
+    ids = db_access.run_write(add)
+    if args.batch:
+        print(f"added {len(records)} book(s)", file=sys.stderr)
+    else:
+        print(ids[0])
+
+def cmd_import(args):
+    with open(args.file, encoding="utf-8") as f:
+        payload = json.load(f)
+    n = db_access.import_data(payload)
+    print(f"imported {n} book(s)", file=sys.stderr)
+
+def cmd_import_csv(args):
+    import csv_import   # process pool machinery only when needed
+    mapping = csv_import.parse_mapping(args.map, {} if args.no_default_map else None)
+    csv_import.import_csv(args.file, mapping, rating_scale=args.rating_scale, reject_path=args.reject,
+                          workers=args.workers, dry_run=args.dry_run)
+
+def cmd_export(args):
+    # streamed row by row, memory stays flat however big the journal is
+    if args.file in (None, "-"):
+        db_access.write_export(sys.stdout)
+    else:
+        with open(args.file, "w", encoding="utf-8") as f:
+            db_access.write_export(f)
+        print(f"exported to {args.file}", file=sys.stderr)
+
+def _ids(field, values):
+    if not values:
+        return None
+    with db_access.get_conn() as c:
+        return [db_access.lookup_id(c, field, v) for v in values]
+
+def _vibe_ids(values):
+    if not values:
+        return None
+    rows = [db_access.fetch_all("SELECT id FROM vibe WHERE vibe_name = ? COLLATE NOCASE", (v,)) for v in values]
+    return [r[0]["id"] for r in rows if r] or [-1]
+
+def cmd_query(args):
+    filters = {
+        "text": args.text,
+        "dnf": args.dnf,
+        "phys_copy": args.phys_copy,
+        "date_start_from": args.started_from, "date_start_to": args.started_to,
+        "date_finish_from": args.finished_from, "date_finish_to": args.finished_to,
+        "rating_min": args.rating_min, "rating_max": args.rating_max,
+        "vibe": _vibe_ids(args.vibe),
+        "rereads": args.rereads,
+    }
+    for field in ("size", "category", "genre", "subgenre", "source", "discovery", "months_later", "reread"):
+        filters[field] = _ids(field, getattr(args, field))
+    direction = "asc" if args.asc else "desc"
+    if args.limit:
+        rows = db_access.query_books(filters, args.order, direction, args.limit)
+    else:
+        rows = db_access.iter_books(filters, args.order, direction)
+    _print_rows(rows, args.json)
+
+def cmd_stats(args):
+    if args.pace:
+        rows = db_access.reading_pace(args.pace, args.date_from, args.date_to)
+        if args.json:
+            print(json.dumps([dict(r) for r in rows], ensure_ascii=False, indent=1))
+            return
+        print("period\tfinished\tdnf\tdnf_rate\tpages\tavg_rating")
+        for r in rows:
+            print("\t".join("" if v is None else str(v) for v in (r.period, r.finished, r.dnf, r.dnf_rate,
+                                                                  r.pages, r.avg_rating)))
+        return
+    stats = db_access.statistics()
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=1))
+        return
+    for key, counts in stats["pies"].items():
+        print(f"{db_access.PIE_CHARTS[key][0]}:")
+        for label, n in counts:
+            print(f"  {label}\t{n}")
+    for key, title in (("top_genres", "Genre"), ("top_subgenres", "Subgenre"), ("top_vibes", "My vibe")):
+        print(f"{title}:")
+        for label, n in stats[key]:
+            print(f"  {label}\t{n}")
+    print("Per year (finished / DNF / est. pages):")
+    for r in stats["per_year"]:
+        print(f"  {r['period']}\t{r['finished']}\t{r['dnf']}\t{r['pages']}")
+
+def cmd_reminders(args):
+    _print_rows(db_access.due_reminders(args.today), args.json, ("name", "author_name", "date_finish", "remember_check_due_at"))
+
+def cmd_similar(args):
+    import similar   # numpy, only for this command
+    if args.vibes:
+        rows = [{"vibe": v, "score": score, "books": n} for v, score, n in similar.top_rated_vibes(args.limit or 5)]
+        fields = ("vibe", "score", "books")
+    elif args.book_id is not None:
+        rows = [{"id": i, "name": name, "similarity": s} for i, name, s in similar.books_like(args.book_id, args.limit or 10)]
+        fields = ("id", "name", "similarity")
+    else:
+        raise SystemExit("similar: BOOK_ID is required (or use --vibes)")
+    for r in rows:
+        print(json.dumps(r, ensure_ascii=False) if args.json else "\t".join(str(r[k]) for k in fields))
+
+def cmd_maintain(args):
+    reason = maintenance.due()
+    if args.if_due and not reason:
+        print("maintenance not due", file=sys.stderr)
+        return
+    budgets = {k: args.budget for k in maintenance.STEPS} if args.budget else None
+    report = maintenance.run(steps=args.steps or maintenance.STEPS, budgets=budgets, reason=reason or "manual")
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    if not report["steps"].get("quick_check", {}).get("ok", True):
+        raise SystemExit("maintain: quick_check found problems")
+
+def cmd_archive(args):
+    if args.list:
+        for a in db_access.list_archives():
+            size = "missing" if a["bytes"] is None else f"{a['bytes'] / 1e6:.1f} MB"
+            print(f"{a['path']}\t{a['first_year']}-{a['last_year']}\t{a['books']} book(s)\t{size}\t{a['archived_at']}")
+        return
+    if not args.before:
+        raise SystemExit("archive: --before is required (or use --list)")
+    n, path = db_access.archive_books(args.before, args.file)
+    print(f"archived {n} book(s) to {path}" if n else "nothing to archive", file=sys.stderr)
+
+# ---------- argument parsing ----------
+def build_parser():
+    p = argparse.ArgumentParser(prog="python -m cli", description="Reading journal without the GUI")
+    p.add_argument("--db", default=db_access.DB_PATH, help="journal database (default: %(default)s)")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    a = sub.add_parser("add", help="add a book (or many with --batch)")
+    a.add_argument("name", nargs="?")
+    a.add_argument("--batch", action="store_true", help="read JSON lines from stdin, one transaction")
+    for opt in ("author", "size", "category", "genre", "subgenre", "source", "discovery", "icon",
+                "months_later", "reread", "date_start", "date_finish", "discovery_text", "expectations",
+                "expectations_failed", "crush_list", "line", "reminded", "notes", "vibes"):
+        a.add_argument("--" + opt.replace("_", "-"), dest=opt)
+    a.add_argument("--rating", type=int, help="0..10")
+    a.add_argument("--dnf", action="store_const", const=1)
+    a.add_argument("--phys-copy", dest="phys_copy", action="store_const", const=1)
+    a.set_defaults(func=cmd_add)
+
+    i = sub.add_parser("import", help="replace the journal with a JSON export")
+    i.add_argument("file")
+    i.set_defaults(func=cmd_import)
+
+    ic = sub.add_parser("import-csv", help="add reading history from a CSV export (Goodreads columns by default)")
+    ic.add_argument("file")
+    ic.add_argument("--map", action="append", metavar="COLUMN=FIELD",
+                    help="map a CSV column onto a books field, 'shelves' or 'pages'; repeatable; 'COLUMN=' drops it")
+    ic.add_argument("--no-default-map", action="store_true", help="start from an empty mapping instead of Goodreads")
+    ic.add_argument("--rating-scale", type=int, default=5, help="scale of the CSV ratings (default: 5 stars)")
+    ic.add_argument("--reject", metavar="FILE", help="write rows that could not be imported here, with the reason")
+    ic.add_argument("--workers", type=int, help="parser processes (default: one per CPU)")
+    ic.add_argument("--dry-run", action="store_true", help="parse and count, write nothing")
+    ic.set_defaults(func=cmd_import_csv)
+
+    e = sub.add_parser("export", help="export the journal as JSON (stdout by default)")
+    e.add_argument("file", nargs="?")
+    e.set_defaults(func=cmd_export)
+
+    q = sub.add_parser("query", help='list books with the "My books" filters')
+    q.add_argument("--text")
+    q.add_argument("--dnf", type=int, choices=(0, 1))
+    q.add_argument("--phys-copy", dest="phys_copy", type=int, choices=(0, 1))
+    for field in ("size", "category", "genre", "subgenre", "source", "discovery", "months_later", "reread", "vibe"):
+        q.add_argument("--" + field.replace("_", "-"), dest=field, action="append", help="name or id, repeatable")
+    q.add_argument("--started-from"); q.add_argument("--started-to")
+    q.add_argument("--finished-from"); q.add_argument("--finished-to")
+    q.add_argument("--rating-min", type=int); q.add_argument("--rating-max", type=int)
+    q.add_argument("--rereads", action="store_true", help="only books read more than once")
+    q.add_argument("--order", choices=sorted(db_access.BOOK_ORDERS), default="date_finish")
+    q.add_argument("--asc", action="store_true", help="ascending (default: descending)")
+    q.add_argument("--limit", type=int)
+    q.add_argument("--json", action="store_true")
+    q.set_defaults(func=cmd_query)
+
+    s = sub.add_parser("stats", help="statistics page numbers")
+    s.add_argument("--json", action="store_true")
+    s.add_argument("--pace", choices=sorted(db_access.PACE_PERIODS), help="reading pace per month/quarter/year instead")
+    s.add_argument("--from", dest="date_from", metavar="YYYY[-MM]")
+    s.add_argument("--to", dest="date_to", metavar="YYYY[-MM]")
+    s.set_defaults(func=cmd_stats)
+
+    r = sub.add_parser("reminders", help='books due for "do I remember it?"')
+    r.add_argument("--today", help="YYYY-MM-DD (default: today)")
+    r.add_argument("--json", action="store_true")
+    r.set_defaults(func=cmd_reminders)
+
+    sm = sub.add_parser("similar", help='"read next": books like this one, or the vibes I rate highest')
+    sm.add_argument("book_id", nargs="?", type=int)
+    sm.add_argument("--vibes", action="store_true", help="vibes ranked by the ratings of their books")
+    sm.add_argument("--limit", type=int)
+    sm.add_argument("--json", action="store_true")
+    sm.set_defaults(func=cmd_similar)
+
+    mt = sub.add_parser("maintain", help="analyze, incremental vacuum, WAL checkpoint and quick_check, time-boxed")
+    mt.add_argument("--if-due", action="store_true", help="only when a run is due (for cron)")
+    mt.add_argument("--steps", nargs="+", choices=maintenance.STEPS)
+    mt.add_argument("--budget", type=float, metavar="SECONDS", help="per-step time budget (default: per-step presets)")
+    mt.add_argument("--json", action="store_true", help="print the report")
+    mt.set_defaults(func=cmd_maintain)
+
+    ar = sub.add_parser("archive", help="move books finished before a date into an attached archive file")
+    ar.add_argument("--before", metavar="YYYY[-MM-DD]", help="cutoff; a year means January 1st of it")
+    ar.add_argument("--file", help="archive file, relative to the journal (default: <journal>-archive-<year>.db)")
+    ar.add_argument("--list", action="store_true", help="show the archive files instead")
+    ar.set_defaults(func=cmd_archive)
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    _connect(args.db)
+    try:
+        args.func(args)
+        sys.stdout.flush()
+    except ValueError as e:
+        raise SystemExit(f"{args.command}: {e}")
+    except BrokenPipeError:
+        # the reader went away (| head); point stdout at devnull so the exit flush stays quiet
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
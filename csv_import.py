@@ -0,0 +1,277 @@
+# csv_import.py
+# Bulk import of reading history from CSV exports of other trackers (Goodreads-style by default).
+# Rows are parsed and normalized in a process pool, then written in one deduplicated transaction.
+# Used by: python -m cli import-csv FILE [--map "CSV column=field"] ...
+import csv, datetime, re, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import db_access
+from db_access import get_conn, smart_title, title_key, upsert_author
+
+# CSV column -> field. Fields: the books columns plus "shelves" (genre/subgenre/dnf) and "pages" (size)
+GOODREADS_MAPPING = {
+    "Title": "name",
+    "Author": "author",
+    "My Rating": "rating",
+    "Date Read": "date_finish",
+    "Date Started": "date_start",
+    "Bookshelves": "shelves",
+    "Exclusive Shelf": "shelves",
+    "Number of Pages": "pages",
+    "My Review": "notes",
+    "Private Notes": "notes",
+}
+
+_YMD = re.compile(r"(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})$")   # fast path, most exports use it
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%m/%d/%Y", "%d.%m.%Y", "%d/%m/%Y", "%b %d, %Y", "%Y-%m", "%Y")
+
+# shelf spellings that don't match a genre/subgenre name on their own
+SHELF_ALIASES = {
+    "sci fi": "science fiction", "scifi": "science fiction", "sf": "science fiction",
+    "ya": "young adult", "historical fiction": "historical", "literary fiction": "literary",
+    "thrillers": "thriller", "mysteries": "mystery", "romances": "romance", "biographies": "biography",
+    "memoirs": "memoir", "essay": "essays", "self help": "self-help",
+}
+DNF_SHELVES = {"dnf", "did not finish", "abandoned", "gave up"}
+SKIP_SHELVES = {"to read", "currently reading", "wishlist"}
+
+# pages -> size bucket (upper bound exclusive), names as in db_setup
+SIZE_BUCKETS = ((30, "Short story — 4-30 pages"), (80, "Novelette — 30-80 pages"),
+                (200, "Novella — 80-200 pages"), (450, "Novel — 200-450 pages"), (None, "Epic — 450+ pages"))
+
+CHUNK = 2000
+
+TRUE_FLAGS = {"1", "true", "yes", "y", "x"}
+
+# ---------- worker side (must stay picklable / module level) ----------
+_ctx = {}
+
+def _init_worker(ctx):
+    _ctx.clear(); _ctx.update(ctx)
+
+def parse_date(s: str) -> Optional[str]:
+    s = (s or "").strip()
+    if not s:
+        return None
+    m = _YMD.match(s)
+    if m:
+        try:
+            return datetime.date(*map(int, m.groups())).isoformat()
+        except ValueError:
+            raise ValueError(f"bad date {s!r}")
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"bad date {s!r}")
+
+def _rating10(s: str, scale: int) -> Optional[int]:
+    s = (s or "").strip()
+    if not s:
+        return None
+    r = float(s)
+    if r < 0 or r > scale:
+        raise ValueError(f"rating {s!r} outside 0..{scale}")
+    if r == 0:
+        return None   # Goodreads writes 0 for "not rated"
+    return max(0, min(10, round(r * 10 / scale)))
+
+def normalize_row(row: Dict[str, str]) -> Tuple[Optional[dict], Optional[str]]:
+    # -> (record ready for the write step, None) | (None, reason) | (None, "") for skipped rows
+    mapping, scale = _ctx["mapping"], _ctx["rating_scale"]
+    rec, shelves, picked = {}, [], []
+    try:
+        for col, field in mapping.items():
+            val = (row.get(col) or "").strip()
+            if not val:
+                continue
+            if field == "shelves":
+                shelves += [title_key(s) for s in val.split(",") if s.strip()]
+            elif field in ("genre", "subgenre"):
+                picked.append(_shelf_for(field, val))
+            elif field in _ctx["lookups"]:
+                rec[field] = _lookup(field, val)
+            elif field in ("dnf", "phys_copy"):
+                rec[field] = 1 if val.casefold() in TRUE_FLAGS else 0
+            elif field == "notes" and rec.get("notes"):
+                rec["notes"] += "\n\n" + val
+            else:
+                rec[field] = val
+        if not rec.get("name"):
+            return None, "missing title"
+        if SKIP_SHELVES & set(shelves):
+            return None, ""
+        rec["name"] = smart_title(rec["name"])
+        if rec.get("author"):
+            rec["author"] = smart_title(" ".join(rec["author"].split()))
+        for col in ("date_start", "date_finish"):
+            if col in rec:
+                rec[col] = parse_date(rec[col])
+        if rec.get("date_start") and rec.get("date_finish") and rec["date_finish"] < rec["date_start"]:
+            return None, "Date started can't be later than Date finished"
+        if "rating" in rec:
+            rec["rating"] = _rating10(rec["rating"], scale)
+        if "pages" in rec:
+            pages = int(float(rec.pop("pages")))
+            rec["size"] = next(_ctx["sizes"].get(name) for top, name in SIZE_BUCKETS if top is None or pages < top)
+        _apply_shelves(rec, picked + shelves)   # a mapped genre/subgenre column wins over the shelves
+    except ValueError as e:
+        return None, str(e)
+    return rec, None
+
+def _lookup(field: str, val: str) -> int:
+    # names -> ids like db_access.lookup_id, from the tables loaded in build_context
+    ids = _ctx["lookups"][field]
+    if val.isdigit() and int(val) in ids.values():
+        return int(val)
+    try:
+        return ids[val.casefold()]
+    except KeyError:
+        raise ValueError(f"unknown {field}: {val!r}") from None
+
+def _shelf_for(field: str, val: str) -> str:
+    s = title_key(val)
+    s = SHELF_ALIASES.get(s, s)
+    if not any(kind == field for kind, *_ in _ctx["shelves"].get(s, ())):
+        raise ValueError(f"unknown {field}: {val!r}")
+    return s
+
+def _apply_shelves(rec: dict, shelves: List[str]):
+    index = _ctx["shelves"]
+    genre = sub = None
+    for s in shelves:
+        s = SHELF_ALIASES.get(s, s)
+        if s in DNF_SHELVES:
+            rec["dnf"] = 1
+        for kind, cat_id, genre_id, sub_id in index.get(s, ()):
+            if kind == "genre" and genre is None:
+                genre = (cat_id, genre_id)
+            elif kind == "subgenre" and sub is None and (genre is None or genre[1] == genre_id):
+                sub = (cat_id, genre_id, sub_id)
+    if sub and (genre is None or genre[1] == sub[1]):
+        genre = sub[:2]
+    else:
+        sub = None
+    if genre:
+        rec["category"], rec["genre"] = genre
+    if sub:
+        rec["subgenre"] = sub[2]
+
+def _normalize_chunk(rows: List[Dict[str, str]]):
+    return [normalize_row(r) for r in rows]
+
+# ---------- parent side ----------
+def build_context(conn, mapping: Dict[str, str], rating_scale: int) -> dict:
+    shelves = {}
+    for gid, cat_id, name in conn.execute("SELECT id, category_id, genre_name FROM genre"):
+        shelves.setdefault(title_key(name), []).append(("genre", cat_id, gid, None))
+    for sid, gid, cat_id, name in conn.execute(
+            "SELECT s.id, s.genre_id, g.category_id, s.subgenre_name FROM subgenre s JOIN genre g ON g.id = s.genre_id"):
+        shelves.setdefault(title_key(name), []).append(("subgenre", cat_id, gid, sid))
+    sizes = {name: sid for sid, name in conn.execute("SELECT id, size_name FROM size")}
+    lookups = {field: {name.casefold(): lid for lid, name in conn.execute(f"SELECT id, {column} FROM {table} ORDER BY id DESC")}
+               for field, (table, column) in db_access.LOOKUPS.items() if field in mapping.values()}
+    return {"mapping": mapping, "rating_scale": rating_scale, "shelves": shelves, "sizes": sizes, "lookups": lookups}
+
+def _dedup_key(name, author, date_finish):
+    return (title_key(name), (author or "").casefold(), date_finish or "")
+
+def import_csv(path: str, mapping: Optional[Dict[str, str]] = None, rating_scale: int = 5,
+               reject_path: Optional[str] = None, workers: Optional[int] = None,
+               dry_run: bool = False, log=sys.stderr) -> dict:
+    mapping = mapping or GOODREADS_MAPPING
+    t0 = time.perf_counter()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        header = reader.fieldnames or []
+        rows = list(reader)
+    missing = [c for c, field in mapping.items() if field == "name" and c not in header]
+    if missing:
+        raise ValueError(f"CSV has no {missing[0]!r} column (columns: {', '.join(header)})")
+
+    with get_conn() as c:
+        ctx = build_context(c, mapping, rating_scale)
+
+    # parse + normalize: process pool for big files, inline for small ones
+    t1 = time.perf_counter()
+    chunks = [rows[i:i + CHUNK] for i in range(0, len(rows), CHUNK)]
+    if len(chunks) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ctx,)) as pool:
+            results = [r for part in pool.map(_normalize_chunk, chunks) for r in part]
+    else:
+        _init_worker(ctx)
+        results = _normalize_chunk(rows)
+    t2 = time.perf_counter()
+
+    # one transaction: dedupe against the file itself and the journal, then batch insert
+    rejects, skipped, records = [], 0, []
+    for row, (rec, err) in zip(rows, results):
+        if rec is not None:
+            records.append(rec)
+        elif err:
+            rejects.append((row, err))
+        else:
+            skipped += 1
+    inserted = dupes = 0
+    # under the write lock, so no other process adds the same book between the dedupe and the insert
+    with db_access.write_lock(notify=not dry_run), get_conn() as c:
+        seen = {_dedup_key(n, a, d) for n, a, d in c.execute(
+            "SELECT b.name, a.author_name, b.date_finish FROM all_books b LEFT JOIN author a ON a.id = b.author")}
+        authors, batch = {}, []
+        for rec in records:
+            key = _dedup_key(rec["name"], rec.get("author"), rec.get("date_finish"))
+            if key in seen:
+                dupes += 1
+                continue
+            seen.add(key)
+            a = rec.get("author")
+            if a and a.casefold() not in authors:
+                authors[a.casefold()] = upsert_author(a, c)
+            rec["author"] = authors.get((a or "").casefold())
+            batch.append(rec)
+        db_access.insert_books(batch, c)   # notes go to book_text
+        inserted = len(batch)
+        if dry_run:
+            c.rollback()
+        else:
+            db_access.note_write()
+    t3 = time.perf_counter()
+
+    if reject_path and rejects:
+        with open(reject_path, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=header + ["error"], extrasaction="ignore")
+            w.writeheader()
+            for row, err in rejects:
+                w.writerow({**row, "error": err})
+
+    report = {
+        "rows": len(rows), "inserted": 0 if dry_run else inserted, "duplicates": dupes,
+        "rejected": len(rejects), "skipped": skipped,
+        "parse_s": round(t2 - t1, 3), "write_s": round(t3 - t2, 3), "total_s": round(t3 - t0, 3),
+        "rows_per_s": round(len(rows) / (t3 - t0), 1) if t3 > t0 else None,
+    }
+    if log:
+        print(f"{report['rows']} rows: {inserted} new{' (dry run)' if dry_run else ''}, {dupes} duplicate(s), "
+              f"{len(rejects)} rejected, {skipped} skipped (to-read etc.) - "
+              f"parse {report['parse_s']}s, write {report['write_s']}s, {report['rows_per_s']} rows/s", file=log)
+        if rejects:
+            print(f"rejects: {reject_path or '(use --reject FILE to keep them)'}", file=log)
+    return report
+
+def parse_mapping(pairs: List[str], base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    # ["Title=name", "Finished=date_finish"] on top of base; "Column=" drops a column
+    mapping = dict(base if base is not None else GOODREADS_MAPPING)
+    allowed = set(db_access.BOOK_COLUMNS) | {"shelves", "pages"}
+    for p in pairs or ():
+        col, sep, field = p.partition("=")
+        if not sep:
+            raise ValueError(f"bad mapping {p!r}, expected 'CSV column=field'")
+        if not field:
+            mapping.pop(col, None)
+        elif field not in allowed:
+            raise ValueError(f"unknown field {field!r} in mapping {p!r}")
+        else:
+            mapping[col] = field
+    return mapping
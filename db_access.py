@@ -1,95 +1,1318 @@
 # db_access.py
-import sqlite3
-from typing import List, Tuple, Optional
+import collections, contextlib, datetime, heapq, json, os, random, re, sqlite3, string, threading, time, unicodedata, zlib
+from dataclasses import dataclass, fields
+from typing import IO, Iterator, List, NamedTuple, Tuple, Optional
 
 DB_PATH = "journal.db"
 
+# A thread can bind one connection (e.g. a pooled read-only one in api_server);
+# every helper below then runs on it instead of opening a fresh connection.
+_bound = threading.local()
+
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+    conn = getattr(_bound, "conn", None)
+    if conn is not None:
+        return conn
+    return connect()
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or DB_PATH, timeout=BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
+    attach_archives(conn)
+    return conn
+
+def open_readonly(path: Optional[str] = None) -> sqlite3.Connection:
+    # query-only connection; in WAL mode it reads a snapshot while the app writes
+    conn = sqlite3.connect(f"file:{path or DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    attach_archives(conn, readonly=True)
+    conn.execute("PRAGMA query_only = ON;")
     return conn
 
-def fetch_all(sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+# -----------------------------
+# Several processes on one journal
+# -----------------------------
+# The app, the cli, api_server, a cron "maintain" and scripts may all have the journal open.
+# WAL (db_setup.m004_wal) lets them read while one of them writes. Writers take turns on an
+# advisory lock on <journal>.lock, so they queue outside SQLite instead of sleeping in its busy
+# handler until "database is locked". Leaving the lock, a writer bumps the change counter kept in
+# the lock file; other processes watch it (change_count, app.JournalWatcher) to refresh what they
+# show. WAL needs every process on one machine: a synced folder works, a network share doesn't.
+BUSY_TIMEOUT = 5.0      # seconds SQLite itself waits on a busy file (writers that skip the lock)
+WRITE_WAIT = 30.0       # seconds a writer queues for the lock before JournalBusy
+WRITE_ATTEMPTS = 5      # run_write: tries of a transaction that still hits a busy file
+BACKOFF = (0.05, 1.0)   # run_write: first and longest sleep between tries, jittered
+LOCK_POLL = (0.001, 0.005)   # first and longest sleep between looks at the lock while queueing
+_LOCK_BYTE = 1024       # Windows locks a byte range; keep it clear of the counter so it stays readable
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+class JournalBusy(sqlite3.OperationalError):
+    """Another writer kept the journal's write lock for longer than WRITE_WAIT."""
+
+# this process's share: acquisitions, how many had to wait, total and longest wait, run_write retries
+LOCK_STATS = {"acquired": 0, "waited": 0, "wait_s": 0.0, "max_wait_s": 0.0, "retries": 0}
+_held = threading.local()   # locks this thread holds, so nested writers don't queue on themselves
+
+def lock_path(path: Optional[str] = None) -> str:
+    return (path or DB_PATH) + ".lock"
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, _LOCK_BYTE, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def _unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, _LOCK_BYTE, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+def _read_count(fd: int) -> Tuple[int, int]:
+    os.lseek(fd, 0, os.SEEK_SET)
+    parts = os.read(fd, 64).split()
+    try:
+        return int(parts[0]), int(parts[1])
+    except (IndexError, ValueError):
+        return 0, 0
+
+def change_count(path: Optional[str] = None) -> Tuple[int, int]:
+    # -> (commits made under the write lock so far, pid of the last writer); (0, 0) before the first
+    try:
+        fd = os.open(lock_path(path), os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    except FileNotFoundError:
+        return 0, 0
+    try:
+        return _read_count(fd)
+    finally:
+        os.close(fd)
+
+def _acquire(fd: int, t0: float, wait: float) -> None:
+    sleep = LOCK_POLL[0]
+    while not _try_lock(fd):
+        waited = time.perf_counter() - t0
+        if waited >= wait:
+            raise JournalBusy(f"database is locked: another process has been writing for {waited:.1f}s")
+        time.sleep(min(sleep, wait - waited))
+        sleep = min(sleep * 2, LOCK_POLL[1])
+
+def _open_lock(path: str) -> int:
+    return os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+
+@contextlib.contextmanager
+def write_lock(path: Optional[str] = None, wait: float = WRITE_WAIT, notify: bool = True):
+    # the journal's write lock, for whole write operations (several transactions, PRAGMAs between
+    # them); re-entrant per thread. Leaving it without an exception bumps the change counter
+    # unless notify is off (housekeeping that leaves the books as they were).
+    # Writers line up on <journal>.lock-next first and keep it until they hold the lock itself:
+    # a writer that just let go has to get back in line behind one already waiting, or a process
+    # saving in a loop would take the lock again before the others' next poll, every time.
+    key = os.path.realpath(lock_path(path))
+    held = getattr(_held, "locks", None)
+    if held is None:
+        held = _held.locks = set()
+    if key in held:
+        yield
+        return
+    fd, gate = _open_lock(key), _open_lock(key + "-next")
+    try:
+        t0 = time.perf_counter()
+        _acquire(gate, t0, wait)
+        try:
+            _acquire(fd, t0, wait)
+        finally:
+            _unlock(gate)
+        waited = time.perf_counter() - t0
+        LOCK_STATS["acquired"] += 1
+        if waited > LOCK_POLL[0]:
+            LOCK_STATS["waited"] += 1
+            LOCK_STATS["wait_s"] += waited
+            LOCK_STATS["max_wait_s"] = max(LOCK_STATS["max_wait_s"], waited)
+        held.add(key)
+        try:
+            yield
+            if notify:
+                count = _read_count(fd)[0] + 1
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, f"{count} {os.getpid()}\n".encode().ljust(32))
+        finally:
+            held.discard(key)
+            _unlock(fd)
+    finally:
+        os.close(gate)
+        os.close(fd)
+
+@contextlib.contextmanager
+def writing(path: Optional[str] = None, wait: float = WRITE_WAIT) -> Iterator[sqlite3.Connection]:
+    # one write transaction: the write lock, then BEGIN IMMEDIATE so SQLite's own write lock is
+    # taken up front - a deferred transaction that read first can't always upgrade in WAL
+    # (SQLITE_BUSY_SNAPSHOT) and fails at once instead of waiting. Commits on success. The
+    # connection is opened before queueing, so the lock is held for the transaction alone.
+    conn = connect(path)
+    try:
+        with write_lock(path, wait):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    finally:
+        conn.close()
+    note_write()
+
+def _busy(e: sqlite3.OperationalError) -> bool:
+    return not isinstance(e, JournalBusy) and (
+        getattr(e, "sqlite_errorcode", None) in (5, 6) or "locked" in str(e) or "busy" in str(e))
+
+def run_write(fn, *args, path: Optional[str] = None, attempts: int = WRITE_ATTEMPTS):
+    # fn(conn, *args) in a writing() transaction. When SQLite still reports the file busy (a writer
+    # that skips the lock, a checkpoint) it rolls back, sleeps a jittered, doubling delay and runs
+    # fn again, so fn must not have side effects outside the connection. -> fn's result
+    delay = BACKOFF[0]
+    for attempt in range(1, attempts + 1):
+        try:
+            with writing(path) as conn:
+                return fn(conn, *args)
+        except sqlite3.OperationalError as e:
+            if attempt == attempts or not _busy(e):
+                raise
+            LOCK_STATS["retries"] += 1
+            time.sleep(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, BACKOFF[1])
+
+# Archive files (see archive_books) are ATTACHed to every connection as archive_1..n, and
+# TEMP views all_books / all_book_vibes / all_book_text put them together with the live tables.
+# With no archive the main.all_* views (db_setup.m011_all_views) stand in and nothing is attached.
+# Read paths use the all_* views; writes always go to the live (main) tables.
+ARCHIVED_TABLES = ("books", "book_vibes", "book_text")
+MAX_ARCHIVES = 9    # SQLite attaches at most 10 databases by default
+
+def _archive_paths(conn: sqlite3.Connection) -> List[str]:
+    try:
+        rel = [r[0] for r in conn.execute("SELECT path FROM main.archive_file ORDER BY last_year, path")]
+    except sqlite3.OperationalError:
+        return []   # before db_setup.m008_archive_registry
+    if not rel:
+        return []
+    main = conn.execute("PRAGMA database_list").fetchone()[2]
+    paths = [os.path.join(os.path.dirname(main), p) for p in rel]
+    return [p for p in paths if os.path.exists(p)]
+
+def archive_schemas(conn: sqlite3.Connection) -> List[str]:
+    return [r[1] for r in conn.execute("PRAGMA database_list") if r[1].startswith("archive_")]
+
+def _union_sql(conn: sqlite3.Connection, table: str, schemas: List[str]) -> str:
+    if not schemas:
+        return f"SELECT * FROM main.{table}"
+    cols = [r[1] for r in conn.execute(f"PRAGMA main.table_info({table})")]
+    arms = [f"SELECT {', '.join(cols)} FROM main.{table}"]
+    for s in schemas:
+        have = {r[1] for r in conn.execute(f"PRAGMA {s}.table_info({table})")}
+        arms.append(f"SELECT {', '.join(c if c in have else 'NULL AS ' + c for c in cols)} FROM {s}.{table}")
+    return " UNION ALL ".join(arms)
+
+def attach_archives(conn: sqlite3.Connection, readonly: bool = False) -> List[str]:
+    # Brings the connection's archives and all_* views up to date with archive_file; cheap when
+    # nothing changed, so long-lived connections can call it before each use. -> archive schemas
+    wanted = _archive_paths(conn)
+    has_views, main_views = conn.execute(
+        "SELECT (SELECT count(*) FROM temp.sqlite_master WHERE name = 'all_books'),"
+        "       (SELECT count(*) FROM main.sqlite_master WHERE name = 'all_books')").fetchone()
+    if not wanted and not has_views and main_views:
+        return []   # the common case: no archives, main.all_* read the live tables
+    attached = {r[1]: r[2] for r in conn.execute("PRAGMA database_list")}
+    current = [attached[s] for s in sorted(archive_schemas(conn), key=lambda s: int(s.split("_")[1]))]
+    if has_views and [os.path.realpath(p) for p in current] == [os.path.realpath(p) for p in wanted]:
+        return archive_schemas(conn)
+    if conn.in_transaction:
+        return archive_schemas(conn)   # DETACH/ATTACH can't run inside a transaction; next time
+    query_only = conn.execute("PRAGMA query_only").fetchone()[0]
+    conn.execute("PRAGMA query_only = OFF;")
+    try:
+        for s in archive_schemas(conn):
+            conn.execute(f"DETACH DATABASE {s}")
+        for n, path in enumerate(wanted, start=1):
+            conn.execute(f"ATTACH DATABASE ? AS archive_{n}", (f"file:{path}?mode=ro" if readonly else path,))
+        schemas = archive_schemas(conn)
+        for table in ARCHIVED_TABLES:
+            conn.execute(f"DROP VIEW IF EXISTS temp.all_{table}")
+            if schemas or not main_views:   # the TEMP view shadows main.all_*
+                conn.execute(f"CREATE TEMP VIEW all_{table} AS {_union_sql(conn, table, schemas)}")
+    finally:
+        if query_only:
+            conn.execute("PRAGMA query_only = ON;")
+    return schemas
+
+@contextlib.contextmanager
+def bound_connection(conn: sqlite3.Connection):
+    prev = getattr(_bound, "conn", None)
+    _bound.conn = conn
+    try:
+        yield conn
+    finally:
+        _bound.conn = prev
+
+def fetch_all(sql: str, params: tuple = (), factory=None) -> list:
+    # factory: a row factory (cursor, row) -> record, so rows are built once in their final shape
     with get_conn() as c:
         cur = c.execute(sql, params)
+        if factory is not None:
+            cur.row_factory = factory
         return cur.fetchall()
 
-def upsert_author(name: str) -> int:
-    if not name:
-        return None
-    with get_conn() as c:
-        cur = c.execute("SELECT id FROM author WHERE author_name = ?", (name.strip(),))
-        row = cur.fetchone()
-        if row:
-            return row["id"]
-        cur = c.execute("INSERT INTO author(author_name) VALUES (?)", (name.strip(),))
-        return cur.lastrowid
-
-def list_sizes() -> List[Tuple[int,str]]:
-    rows = fetch_all("SELECT id, size_name FROM size ORDER BY id")
-    return [(r["id"], r["size_name"]) for r in rows]
-
-def list_categories() -> List[Tuple[int,str]]:
-    rows = fetch_all("SELECT id, category_name FROM category ORDER BY id")
-    return [(r["id"], r["category_name"]) for r in rows]
-
-def list_genres_by_category(cat_id: int) -> List[Tuple[int,str]]:
-    rows = fetch_all("SELECT id, genre_name FROM genre WHERE category_id = ? ORDER BY genre_name", (cat_id,))
-    return [(r["id"], r["genre_name"]) for r in rows]
-
-def list_subgenres_by_genre(genre_id: int) -> List[Tuple[int,str]]:
-    rows = fetch_all("SELECT id, subgenre_name FROM subgenre WHERE genre_id = ? ORDER BY subgenre_name", (genre_id,))
-    return [(r["id"], r["subgenre_name"]) for r in rows]
-
-def list_sources() -> List[Tuple[int,str]]:
-    rows = fetch_all("SELECT id, source FROM source ORDER BY id")
-    return [(r["id"], r["source"]) for r in rows]
-
-def list_discoveries() -> List[Tuple[int,str]]:
-    rows = fetch_all("SELECT id, discovery_name FROM discovery ORDER BY id")
-    return [(r["id"], r["discovery_name"]) for r in rows]
-
-def list_months_later() -> List[Tuple[int,str]]:
-    rows = fetch_all("SELECT id, name FROM months_later ORDER BY id")
-    return [(r["id"], r["name"]) for r in rows]
+# -----------------------------
+# Record types
+# -----------------------------
+# Row factories build these straight from the cursor: no per-row dict, no second list.
+def plain(cursor, row):
+    return row
+
+class Lookup(NamedTuple):
+    # an (id, name) pair from one of the lookup tables; unpacks like the old tuples
+    id: int
+    name: str
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        return cls(*row)
+
+class _Record:
+    # slotted records that still read like sqlite3.Row: r["name"], r.keys(), dict(r)
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        return cls(*row)
+
+    def keys(self):
+        return [f.name for f in fields(self)]
+
+    def __getitem__(self, key):
+        return getattr(self, self.__slots__[key] if isinstance(key, int) else key)
 
-def list_reread() -> List[Tuple[int,str]]:
-    rows = fetch_all("SELECT id, name FROM reread ORDER BY id")
+@dataclass(slots=True, frozen=True)   # frozen: QueryCache hands the same records to every caller
+class BookRow(_Record):
+    # a "My books" line, the columns of BOOK_LIST_SQL
+    id: int
+    name: str
+    author_name: Optional[str]
+    date_start: Optional[str]
+    date_finish: Optional[str]
+    rating: Optional[int]
+    dnf: int
+    remember_check_due_at: Optional[str]
+    icon_path: Optional[str]
+
+# -----------------------------
+# Result cache for list / statistics reads
+# -----------------------------
+# Keyed by normalized SQL + params, LRU with an entry and a row cap. Everything is dropped when
+# PRAGMA data_version moves (any other connection or process committed) or when our own write
+# helpers bump the generation counter.
+class QueryCache:
+    def __init__(self, max_entries: int = 256, max_rows: int = 100_000):
+        self.max_entries, self.max_rows = max_entries, max_rows
+        self.entries = collections.OrderedDict()   # key -> rows
+        self.rows = 0
+        self.generation = 0
+        self.enabled = True
+        self.hits = self.misses = self.invalidations = 0
+        self._lock = threading.Lock()
+        self._watch = None          # (path, connection) used only for PRAGMA data_version
+        self._marker = None
+
+    def bump(self):
+        with self._lock:
+            self.generation += 1
+
+    def _current_marker(self):
+        if self._watch is None or self._watch[0] != DB_PATH:
+            if self._watch is not None:
+                self._watch[1].close()
+            # read-only, so asking for data_version never creates a missing file
+            self._watch = (DB_PATH, sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False))
+        return (self._watch[0], self._watch[1].execute("PRAGMA data_version").fetchone()[0], self.generation)
+
+    def marker(self):
+        # moves whenever cached reads would be dropped: another connection committed, or note_write()
+        with self._lock:
+            return self._current_marker()
+
+    def _clear(self):
+        self.entries.clear()
+        self.rows = 0
+
+    def fetch(self, sql: str, params: tuple = (), factory=None) -> list:
+        if not self.enabled:
+            return fetch_all(sql, params, factory)
+        key = (" ".join(sql.split()), tuple(params), factory)
+        with self._lock:
+            marker = self._current_marker()
+            if marker != self._marker:
+                if self.entries:
+                    self.invalidations += 1
+                self._clear()
+                self._marker = marker
+            rows = self.entries.get(key)
+            if rows is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return list(rows)
+            self.misses += 1
+        rows = fetch_all(sql, params, factory)
+        with self._lock:
+            if self._marker == marker and len(rows) <= self.max_rows:
+                if key not in self.entries:
+                    self.rows += len(rows)
+                self.entries[key] = rows
+                while len(self.entries) > self.max_entries or self.rows > self.max_rows:
+                    _, old = self.entries.popitem(last=False)
+                    self.rows -= len(old)
+        return list(rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 3) if total else None,
+                    "entries": len(self.entries), "rows": self.rows,
+                    "invalidations": self.invalidations, "generation": self.generation}
+
+QUERY_CACHE = QueryCache()
+
+def cached_fetch_all(sql: str, params: tuple = (), factory=None) -> list:
+    return QUERY_CACHE.fetch(sql, params, factory)
+
+def note_write() -> None:
+    # our own write path: cached reads are stale from now on
+    QUERY_CACHE.bump()
+
+def cache_stats() -> dict:
+    return QUERY_CACHE.stats()
+
+# Capitalize first letter of each word (basic Title Case, but keep small words as-is if user typed)
+def smart_title(s: str) -> str:
+    return " ".join(w[:1].upper() + w[1:] if w else "" for w in s.strip().split())
+
+# Normalized title: case-folded, punctuation and whitespace collapsed.
+# "the hobbit", "The  Hobbit " and "The Hobbit!" all become "the hobbit".
+_KEY_JUNK = re.compile(r"[\W_]+")
+
+def title_key(name: str) -> str:
+    s = unicodedata.normalize("NFKC", name or "").casefold()
+    return " ".join(_KEY_JUNK.sub(" ", s).split())
+
+def find_duplicates(name: str, exclude_id: Optional[int] = None) -> List[Tuple[int,str]]:
+    # one probe on idx_books_title_key
+    rows = fetch_all("SELECT id, name FROM all_books WHERE title_key = ? AND id IS NOT ? ORDER BY id",
+                     (title_key(name), exclude_id))
     return [(r["id"], r["name"]) for r in rows]
 
-def insert_book(data: dict) -> int:
-    sql = """
-    INSERT INTO books (
-        dnf, name, author, size, category, genre, subgenre, source, discovery, discovery_text,
-        date_start, date_finish, rating, months_later, reread, phys_copy, notes, expectations,
-        expectations_failed, crush_list, line, reminded
-    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+def find_rereads() -> List[Tuple[int,str,str]]:
+    # books sharing a title key, grouped together; the GROUP BY walks the index
+    return cached_fetch_all("""
+        SELECT id, name, title_key FROM all_books
+        WHERE title_key IN (SELECT title_key FROM all_books WHERE title_key IS NOT NULL
+                            GROUP BY title_key HAVING count(*) > 1)
+        ORDER BY title_key, date_finish, id
+    """, (), plain)
+
+# Name lookups are case-insensitive: one seek on the NOCASE unique index,
+# an INSERT only when the name is new. Pass conn to join a caller's transaction.
+def _upsert_name(c, table: str, column: str, name: str, extra: str = "") -> int:
+    row = c.execute(f"SELECT id FROM {table} WHERE {column} = ? COLLATE NOCASE", (name,)).fetchone()
+    if row:
+        return row[0]
+    cols, vals = (f"{column}, {extra}", "?, 0") if extra else (column, "?")
+    note_write()
+    return c.execute(f"INSERT INTO {table}({cols}) VALUES ({vals})", (name,)).lastrowid
+
+def upsert_author(name: str, conn: Optional[sqlite3.Connection] = None) -> Optional[int]:
+    if not name or not name.strip():
+        return None
+    if conn is not None:
+        return _upsert_name(conn, "author", "author_name", name.strip())
+    return run_write(_upsert_name, "author", "author_name", name.strip())
+
+def upsert_vibe(name: str, conn: Optional[sqlite3.Connection] = None) -> Optional[int]:
+    # vibes typed by the user are never "prefilled"
+    if not name or not name.strip():
+        return None
+    if conn is not None:
+        return _upsert_name(conn, "vibe", "vibe_name", name.strip(), extra="prefilled")
+    return run_write(_upsert_name, "vibe", "vibe_name", name.strip(), "prefilled")
+
+def list_sizes() -> List[Lookup]:
+    return cached_fetch_all("SELECT id, size_name FROM size ORDER BY id", (), Lookup.from_row)
+
+def list_categories() -> List[Lookup]:
+    return cached_fetch_all("SELECT id, category_name FROM category ORDER BY id", (), Lookup.from_row)
+
+def list_genres_by_category(cat_id: int) -> List[Lookup]:
+    return cached_fetch_all("SELECT id, genre_name FROM genre WHERE category_id = ? ORDER BY genre_name",
+                            (cat_id,), Lookup.from_row)
+
+def list_subgenres_by_genre(genre_id: int) -> List[Lookup]:
+    return cached_fetch_all("SELECT id, subgenre_name FROM subgenre WHERE genre_id = ? ORDER BY subgenre_name",
+                            (genre_id,), Lookup.from_row)
+
+def list_sources() -> List[Lookup]:
+    return cached_fetch_all("SELECT id, source FROM source ORDER BY id", (), Lookup.from_row)
+
+def list_discoveries() -> List[Lookup]:
+    return cached_fetch_all("SELECT id, discovery_name FROM discovery ORDER BY id", (), Lookup.from_row)
+
+def list_months_later() -> List[Lookup]:
+    return cached_fetch_all("SELECT id, name FROM months_later ORDER BY id", (), Lookup.from_row)
+
+def list_reread() -> List[Lookup]:
+    return cached_fetch_all("SELECT id, name FROM reread ORDER BY id", (), Lookup.from_row)
+
+def list_authors() -> List[Lookup]:
+    return cached_fetch_all("SELECT id, author_name FROM author ORDER BY author_name", (), Lookup.from_row)
+
+def list_vibes() -> List[Lookup]:
+    return cached_fetch_all("SELECT id, vibe_name FROM vibe ORDER BY vibe_name", (), Lookup.from_row)
+
+# -----------------------------
+# Long free text lives in book_text, 1:1 with books (db_setup.m006_cold_text), so list views,
+# filters and stats scan small rows. Values from TEXT_COMPRESS_MIN bytes up are stored as
+# zlib BLOBs when that is smaller; pack_text/unpack_text hide it from callers.
+# -----------------------------
+TEXT_COLUMNS = (
+    "discovery_text", "expectations", "expectations_failed", "crush_list", "line", "reminded", "notes",
+)
+TEXT_COMPRESS_MIN = 512     # bytes; None turns compression off
+
+def pack_text(s):
+    if s is None or TEXT_COMPRESS_MIN is None:
+        return s
+    raw = s.encode("utf-8")
+    if len(raw) >= TEXT_COMPRESS_MIN:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return packed
+    return s
+
+def unpack_text(v):
+    return zlib.decompress(v).decode("utf-8") if isinstance(v, bytes) else v
+
+def save_book_text(conn: sqlite3.Connection, book_id: int, data: dict) -> None:
+    # writes the TEXT_COLUMNS keys present in data; a book without any text gets no row
+    cols = [k for k in TEXT_COLUMNS if k in data]
+    if not cols:
+        return
+    vals = [pack_text(data[k]) for k in cols]
+    if all(v is None for v in vals) and not conn.execute(
+            "SELECT 1 FROM book_text WHERE book_id = ?", (book_id,)).fetchone():
+        return
+    note_write()
+    conn.execute(f"INSERT INTO book_text (book_id, {', '.join(cols)}) VALUES (?{', ?' * len(cols)}) "
+                 f"ON CONFLICT(book_id) DO UPDATE SET {', '.join(f'{k} = excluded.{k}' for k in cols)}",
+                 (book_id, *vals))
+
+def get_book(book_id: int) -> Optional[dict]:
+    # whole book with lookup names, its vibes and its long text, one query
+    rows = fetch_all(f"""
+        SELECT b.*, {', '.join('t.' + k for k in TEXT_COLUMNS)}, a.author_name,
+               (SELECT group_concat(v.vibe_name, ', ') FROM all_book_vibes bv JOIN vibe v ON v.id = bv.vibe_id
+                WHERE bv.book_id = b.id) AS vibes
+        FROM all_books b LEFT JOIN author a ON a.id = b.author
+        LEFT JOIN all_book_text t ON t.book_id = b.id
+        WHERE b.id = ?
+    """, (book_id,))
+    if not rows:
+        return None
+    book = dict(rows[0])
+    for k in TEXT_COLUMNS:
+        book[k] = unpack_text(book[k])
+    return book
+
+# Columns insert_book()/update_book() may touch; title_key follows name automatically,
+# TEXT_COLUMNS go to book_text.
+BOOK_COLUMNS = (
+    "dnf", "name", "author", "size", "category", "genre", "subgenre", "source", "discovery",
+    "discovery_text", "icon", "expectations", "expectations_failed", "date_start", "date_finish",
+    "rating", "crush_list", "months_later", "reread", "line", "reminded", "phys_copy", "notes",
+)
+HOT_COLUMNS = tuple(k for k in BOOK_COLUMNS if k not in TEXT_COLUMNS)
+
+INSERT_COLUMNS = ("title_key",) + HOT_COLUMNS
+
+def _insert_values(data: dict) -> list:
+    vals = [title_key(data["name"])] + [data.get(k) for k in HOT_COLUMNS]
+    vals[INSERT_COLUMNS.index("dnf")] = data.get("dnf") or 0
+    vals[INSERT_COLUMNS.index("phys_copy")] = data.get("phys_copy") or 0
+    return vals
+
+def insert_book(data: dict, conn: Optional[sqlite3.Connection] = None) -> int:
+    if conn is None:
+        return run_write(lambda c: insert_book(data, c))
+    sql = f"INSERT INTO books ({', '.join(INSERT_COLUMNS)}) VALUES ({', '.join('?' for _ in INSERT_COLUMNS)})"
+    note_write()
+    book_id = conn.execute(sql, _insert_values(data)).lastrowid
+    save_book_text(conn, book_id, data)
+    return book_id
+
+def insert_books(records: List[dict], conn: sqlite3.Connection) -> List[int]:
+    # bulk insert_book for imports: two executemany calls instead of two statements per book.
+    # Ids are handed out as SQLite would (max(id) + 1 over main), so call it inside the write.
+    if not records:
+        return []
+    first = (conn.execute("SELECT max(id) FROM main.books").fetchone()[0] or 0) + 1
+    ids = list(range(first, first + len(records)))
+    note_write()
+    conn.executemany(f"INSERT INTO books (id, {', '.join(INSERT_COLUMNS)}) "
+                     f"VALUES (?{', ?' * len(INSERT_COLUMNS)})",
+                     ([i] + _insert_values(r) for i, r in zip(ids, records)))
+    # new ids have no book_text row yet; books without any text get none (as in save_book_text)
+    text = ([i] + [pack_text(r.get(k)) for k in TEXT_COLUMNS] for i, r in zip(ids, records))
+    conn.executemany(f"INSERT INTO book_text (book_id, {', '.join(TEXT_COLUMNS)}) "
+                     f"VALUES (?{', ?' * len(TEXT_COLUMNS)})",
+                     (v for v in text if any(x is not None for x in v[1:])))
+    return ids
+
+def update_book(book_id: int, data: dict, conn: Optional[sqlite3.Connection] = None) -> None:
+    # Writes only the keys in data. Leaving a column out of the SET list also keeps its
+    # "UPDATE OF" triggers (date_finish -> reminder, author -> usage/author_sort) from firing.
+    if conn is None:
+        return run_write(lambda c: update_book(book_id, data, c))
+    if conn.execute("SELECT 1 FROM main.books WHERE id = ?", (book_id,)).fetchone() is None:
+        restore_book(book_id, conn)   # editing an archived book brings it back to the live file
+    cols = [k for k in HOT_COLUMNS if k in data]
+    vals = [data[k] for k in cols]
+    if "name" in data:
+        cols.append("title_key"); vals.append(title_key(data["name"]))
+    note_write()
+    if cols:
+        sets = ", ".join(f"{k} = ?" for k in cols)
+        conn.execute(f"UPDATE books SET {sets} WHERE id = ?", (*vals, book_id))
+    save_book_text(conn, book_id, data)
+
+# -----------------------------
+# Records by name (CLI, imports): lookup names -> ids
+# -----------------------------
+# field -> (table, name column)
+LOOKUPS = {
+    "size": ("size", "size_name"),
+    "category": ("category", "category_name"),
+    "source": ("source", "source"),
+    "discovery": ("discovery", "discovery_name"),
+    "months_later": ("months_later", "name"),
+    "reread": ("reread", "name"),
+    "icon": ("icon", "name"),
+}
+
+def lookup_id(conn: sqlite3.Connection, field: str, value, scope: Optional[int] = None) -> Optional[int]:
+    # ints pass through; names match case-insensitively. genre is scoped by category, subgenre by genre.
+    if value is None or value == "":
+        return None
+    if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+        return int(value)
+    if field == "genre":
+        sql, params = "SELECT id FROM genre WHERE genre_name = ? COLLATE NOCASE", [value]
+        if scope is not None:
+            sql += " AND category_id = ?"; params.append(scope)
+    elif field == "subgenre":
+        sql, params = "SELECT id FROM subgenre WHERE subgenre_name = ? COLLATE NOCASE", [value]
+        if scope is not None:
+            sql += " AND genre_id = ?"; params.append(scope)
+    else:
+        table, column = LOOKUPS[field]
+        sql, params = f"SELECT id FROM {table} WHERE {column} = ? COLLATE NOCASE", [value]
+    row = conn.execute(sql + " ORDER BY id LIMIT 1", params).fetchone()
+    if not row:
+        raise ValueError(f"unknown {field}: {value!r}")
+    return row[0]
+
+def split_vibes(vibes) -> List[str]:
+    if not vibes:
+        return []
+    if isinstance(vibes, str):
+        vibes = re.split(r"[,;]", vibes)
+    return [smart_title(v) for v in vibes if v and v.strip()]
+
+def link_vibes(book_id: int, vibes, conn: sqlite3.Connection) -> None:
+    note_write()
+    for v in split_vibes(vibes):
+        conn.execute("INSERT OR IGNORE INTO book_vibes(book_id, vibe_id) VALUES (?, ?)",
+                     (book_id, upsert_vibe(v, conn)))
+
+def set_book_vibes(book_id: int, vibes, conn: sqlite3.Connection) -> None:
+    # makes the book's vibes exactly `vibes`, touching only the links that differ
+    wanted = {v.casefold(): v for v in split_vibes(vibes)}
+    current = {name.casefold(): vid for vid, name in conn.execute(
+        "SELECT v.id, v.vibe_name FROM book_vibes bv JOIN vibe v ON v.id = bv.vibe_id WHERE bv.book_id = ?",
+        (book_id,))}
+    gone = [vid for key, vid in current.items() if key not in wanted]
+    added = [v for key, v in wanted.items() if key not in current]
+    if not gone and not added:
+        return
+    note_write()
+    if gone:
+        conn.execute(f"DELETE FROM book_vibes WHERE book_id = ? AND vibe_id IN ({','.join('?' for _ in gone)})",
+                     (book_id, *gone))
+    link_vibes(book_id, added, conn)
+
+def book_from_record(record: dict, conn: sqlite3.Connection) -> dict:
+    # {"name": ..., "author": "Le Guin", "genre": "fantasy", ...} -> books columns with ids
+    if not (record.get("name") or "").strip():
+        raise ValueError("name is required")
+    data = {k: record[k] for k in BOOK_COLUMNS if k in record}
+    data["name"] = smart_title(record["name"])
+    author = record.get("author")
+    data["author"] = author if isinstance(author, int) else upsert_author(smart_title(author or ""), conn)
+    for field in LOOKUPS:
+        if field in record:
+            data[field] = lookup_id(conn, field, record[field])
+    if "genre" in record:
+        data["genre"] = lookup_id(conn, "genre", record["genre"], data.get("category"))
+    if "subgenre" in record:
+        data["subgenre"] = lookup_id(conn, "subgenre", record["subgenre"], data.get("genre"))
+    for flag in ("dnf", "phys_copy"):
+        if flag in record:
+            data[flag] = 1 if record[flag] in (1, True, "1", "true", "yes", "Yes") else 0
+    return data
+
+def add_book(record: dict, conn: sqlite3.Connection) -> int:
+    book_id = insert_book(book_from_record(record, conn), conn)
+    link_vibes(book_id, record.get("vibes"), conn)
+    return book_id
+
+# -----------------------------
+# "My books": filters and sort orders (SPEC.md)
+# -----------------------------
+# order name -> sort key; id breaks ties. NULLs are folded into the key ('' / -1) so keys compare,
+# and each expression matches an idx_books_page_* index (db_setup.m005_page_indexes) - keep them in sync.
+BOOK_ORDERS = {
+    "date_finish": "ifnull(b.date_finish, '')",
+    "date_start": "ifnull(b.date_start, '')",
+    "rating": "ifnull(b.rating, -1)",
+    "name": "b.name",
+    "author": "ifnull(b.author_sort, '')",
+}
+
+# filter key -> books column, value is an id or a list of ids
+_ID_FILTERS = ("size", "category", "genre", "subgenre", "source", "discovery", "months_later", "reread")
+
+BOOK_LIST_SQL = """
+    SELECT b.id, b.name, b.author_sort AS author_name, b.date_start, b.date_finish, b.rating, b.dnf,
+           b.remember_check_due_at, i.path AS icon_path
+    FROM all_books b
+    LEFT JOIN icon i ON i.id = b.icon
+"""
+
+# what a "My books" row shows; every idx_books_page_* index carries these, so pages never touch the table
+BOOK_PAGE_COLUMNS = ("b.id, b.name, b.author_sort AS author_name, b.date_start, b.date_finish, b.rating, b.dnf, "
+                     "b.icon, b.remember_check_due_at")
+
+def _as_list(v):
+    return list(v) if isinstance(v, (list, tuple, set)) else [v]
+
+def _like_escape(s: str) -> str:
+    # for LIKE ... ESCAPE '\': % and _ typed in a search box match themselves
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def book_filter_sql(filters: Optional[dict]) -> Tuple[str, list]:
+    # -> (" WHERE ...", params) for books aliased b
+    where, params = [], []
+    f = filters or {}
+    if f.get("text"):
+        like = f"%{_like_escape(f['text'].strip())}%"
+        where.append("(b.name LIKE ? ESCAPE '\\' OR b.author_sort LIKE ? ESCAPE '\\')"); params += [like, like]
+    for flag in ("dnf", "phys_copy"):
+        if f.get(flag) is not None:
+            where.append(f"b.{flag} = ?"); params.append(1 if f[flag] else 0)
+    for col in _ID_FILTERS:
+        if f.get(col) is not None:
+            ids = _as_list(f[col])
+            where.append(f"b.{col} IN ({','.join('?' for _ in ids)})"); params += ids
+    for col in ("date_start", "date_finish"):
+        if f.get(col + "_from"):
+            where.append(f"b.{col} >= ?"); params.append(f[col + "_from"])
+        if f.get(col + "_to"):
+            where.append(f"b.{col} <= ?"); params.append(f[col + "_to"])
+    if f.get("rating_min") is not None:
+        where.append("b.rating >= ?"); params.append(f["rating_min"])
+    if f.get("rating_max") is not None:
+        where.append("b.rating <= ?"); params.append(f["rating_max"])
+    if f.get("vibe") is not None:
+        ids = _as_list(f["vibe"])
+        where.append(f"b.id IN (SELECT book_id FROM all_book_vibes WHERE vibe_id IN ({','.join('?' for _ in ids)}))")
+        params += ids
+    if f.get("rereads"):
+        where.append("b.title_key IN (SELECT title_key FROM all_books GROUP BY title_key HAVING count(*) > 1)")
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+def book_order_sql(order: str = "date_finish", direction: str = "desc") -> str:
+    if order not in BOOK_ORDERS:
+        raise ValueError(f"unknown order: {order!r}")
+    d = "ASC" if str(direction).lower() == "asc" else "DESC"
+    return f" ORDER BY {BOOK_ORDERS[order]} {d}, b.id {d}"
+
+def query_books(filters: Optional[dict] = None, order: str = "date_finish", direction: str = "desc",
+                limit: Optional[int] = None) -> List[BookRow]:
+    where, params = book_filter_sql(filters)
+    sql = BOOK_LIST_SQL + where + book_order_sql(order, direction)
+    if limit:
+        sql += " LIMIT ?"; params.append(int(limit))
+    return cached_fetch_all(sql, tuple(params), BookRow.from_row)
+
+def iter_rows(sql: str, params: tuple = (), factory=None, batch: int = 500) -> Iterator:
+    # streams a query with fetchmany, so memory stays at one batch whatever the row count;
+    # bypasses the cache. The connection is closed at the end unless it is a bound one.
+    conn = getattr(_bound, "conn", None)
+    owned = conn is None
+    if owned:
+        conn = get_conn()
+    try:
+        cur = conn.execute(sql, params)
+        if factory is not None:
+            cur.row_factory = factory
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        if owned:
+            conn.close()
+
+def iter_books(filters: Optional[dict] = None, order: str = "date_finish", direction: str = "desc",
+               batch: int = 500) -> Iterator[BookRow]:
+    # the whole filtered "My books" list, one batch in memory at a time
+    where, params = book_filter_sql(filters)
+    return iter_rows(BOOK_LIST_SQL + where + book_order_sql(order, direction), tuple(params), BookRow.from_row, batch)
+
+def _page_row(cursor, row):
+    # -> (BookRow, sort key) for list_books
+    return BookRow(*row[:-1]), row[-1]
+
+def _check_cursor(order: str, after_key) -> tuple:
+    # a next key from list_books for this order: (sort key, id), the key an int for rating, else text
+    try:
+        sort_key, last_id = after_key
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid cursor {after_key!r}: expected the (sort key, id) list_books returned") from None
+    want = int if order == "rating" else str
+    if not (type(sort_key) is want and type(last_id) is int):
+        raise ValueError(f"invalid cursor {after_key!r} for order {order!r}")
+    return sort_key, last_id
+
+def list_books(order: str = "date_finish", direction: str = "desc", after_key: Optional[tuple] = None,
+               limit: int = 50, filters: Optional[dict] = None) -> Tuple[List[BookRow], Optional[tuple]]:
+    # Keyset pagination: after_key is the (sort_key, id) of the last row of the previous page and
+    # comes back as the second result (None on the last page). A page is two seeks on the order's
+    # covering index - rows with the same key after that id, then rows past the key - so page
+    # 1000 costs what page 1 does.
+    if order not in BOOK_ORDERS:
+        raise ValueError(f"unknown order: {order!r}")
+    key = BOOK_ORDERS[order]
+    cmp, d = (">", "ASC") if str(direction).lower() == "asc" else ("<", "DESC")
+    where, params = book_filter_sql(filters)
+    more = where.replace(" WHERE ", " AND ", 1)
+    base = f"SELECT {BOOK_PAGE_COLUMNS}, {key} AS sort_key FROM all_books b"
+    if after_key is None:
+        page = f"{base}{where} ORDER BY {key} {d}, b.id {d} LIMIT ?"
+        args = [*params, limit]
+    else:
+        sort_key, last_id = _check_cursor(order, after_key)
+        page = f"""
+            SELECT * FROM (
+              SELECT * FROM ({base} WHERE {key} = ? AND b.id {cmp} ?{more} ORDER BY b.id {d} LIMIT ?)
+              UNION ALL
+              SELECT * FROM ({base} WHERE {key} {cmp} ?{more} ORDER BY {key} {d}, b.id {d} LIMIT ?)
+            ) ORDER BY sort_key {d}, id {d} LIMIT ?
+        """
+        args = [sort_key, last_id, *params, limit, sort_key, *params, limit, limit]
+    # icon paths for the page's rows only, after the index-only seeks
+    sql = f"""
+        SELECT p.id, p.name, p.author_name, p.date_start, p.date_finish, p.rating, p.dnf,
+               p.remember_check_due_at, i.path AS icon_path, p.sort_key
+        FROM ({page}) p LEFT JOIN icon i ON i.id = p.icon ORDER BY p.sort_key {d}, p.id {d}
     """
-    vals = (
-        data.get("dnf", 0),
-        data["name"],
-        data.get("author"),
-        data.get("size"),
-        data.get("category"),
-        data.get("genre"),
-        data.get("subgenre"),
-        data.get("source"),
-        data.get("discovery"),
-        data.get("discovery_text"),
-        data.get("date_start"),
-        data.get("date_finish"),
-        data.get("rating"),
-        data.get("months_later"),
-        data.get("reread"),
-        data.get("phys_copy", 0),
-        data.get("notes"),
-        data.get("expectations"),
-        data.get("expectations_failed"),
-        data.get("crush_list"),
-        data.get("line"),
-        data.get("reminded"),
-    )
+    rows = cached_fetch_all(sql, tuple(args), _page_row)
+    next_key = (rows[-1][1], rows[-1][0].id) if len(rows) == limit else None
+    return [r for r, _ in rows], next_key
+
+def due_reminders(today: Optional[str] = None) -> List[BookRow]:
+    # "Do I remember it three months later?" - check is due
+    return cached_fetch_all(BOOK_LIST_SQL + " WHERE b.remember_check_due_at <= coalesce(?, date('now'))"
+                            " ORDER BY b.remember_check_due_at, b.id", (today,), BookRow.from_row)
+
+# -----------------------------
+# "My books" search as you type
+# -----------------------------
+# LIKE and lower() fold ASCII letters only; the in-memory narrowing folds the query the same way
+_LIKE_FOLD = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+class SearchSession:
+    """One text box. Keeps the books matching each query typed so far, so a keystroke that extends
+    the query narrows the last result in memory and a deletion goes back to an earlier one. Only an
+    edit no earlier query is part of, or a commit anywhere (QueryCache.marker), queries again."""
+    FIRST = 50      # a screen of rows, ranked and fetched before the rest is sorted
+    BATCH = 500     # rows fetched per query after the first screen
+    HISTORY = 16    # earlier queries kept for deletions
+
+    def __init__(self, filters: Optional[dict] = None):
+        self.filters = {k: v for k, v in (filters or {}).items() if k != "text"}
+        self.history = []    # [(folded query, candidates)], each query part of the next
+        self.books = {}      # id -> BookRow already fetched, kept until the marker moves
+        self.marker = None
+        self.fresh = self.narrowed = 0
+        self.lock = threading.Lock()
+
+    def _fetch(self, q: str) -> list:
+        # candidates: (folded name, folded author, id), only what matching and ranking need; the
+        # "My books" columns come later, a screen at a time
+        where, params = book_filter_sql(self.filters)
+        if q:
+            like = f"%{_like_escape(q)}%"
+            where += (" AND " if where else " WHERE ") + \
+                "(b.name LIKE ? ESCAPE '\\' OR b.author_sort LIKE ? ESCAPE '\\')"
+            params += [like, like]
+        with get_conn() as c:
+            cur = c.execute(f"SELECT lower(b.name), lower(ifnull(b.author_sort, '')), b.id FROM all_books b{where}",
+                            params)
+            cur.row_factory = None   # bare tuples: no per-row factory call on a broad first letter
+            return cur.fetchall()
+
+    def search(self, text: str) -> Iterator[BookRow]:
+        # -> matching books, best first: title starts with the text, a title word does, title contains
+        # it, an author word starts with it, author contains it; then by title
+        q = (text or "").strip().translate(_LIKE_FOLD)
+        with self.lock:
+            marker = QUERY_CACHE.marker()
+            if marker != self.marker:
+                self.history, self.books, self.marker = [], {}, marker
+            while self.history and self.history[-1][0] not in q:
+                self.history.pop()
+            if not self.history:
+                rows = self._fetch(q)
+                self.fresh += 1
+            else:
+                last, rows = self.history[-1]
+                if q != last:
+                    rows = [r for r in rows if q in r[0] or q in r[1]]
+                self.narrowed += 1
+            if not self.history or self.history[-1][0] != q:
+                self.history = self.history[1 - self.HISTORY:] + [(q, rows)]
+        return self._ranked(q, rows)   # lists are replaced, never changed, so this runs outside the lock
+
+    def _ranked(self, q: str, rows: list) -> Iterator[BookRow]:
+        word = re.compile(r"(?<!\w)" + re.escape(q)).search
+        keys = [(0 if name.startswith(q) else (1 if word(name) else 2) if q in name else 3 if word(author) else 4,
+                 name, book_id) for name, author, book_id in rows]
+        first = heapq.nsmallest(self.FIRST, keys)
+        yield from self._books([k[2] for k in first])
+        if len(keys) > len(first):
+            keys.sort()
+            rest = [k[2] for k in keys[len(first):]]
+            for i in range(0, len(rest), self.BATCH):
+                yield from self._books(rest[i:i + self.BATCH])
+
+    def _books(self, ids: list) -> List[BookRow]:
+        books = self.books
+        missing = [i for i in ids if i not in books]
+        if missing:
+            marks = ",".join("?" for _ in missing)
+            for r in fetch_all(f"{BOOK_LIST_SQL} WHERE b.id IN ({marks})", tuple(missing), BookRow.from_row):
+                books[r.id] = r
+        return [books[i] for i in ids if i in books]   # a book deleted meanwhile is left out
+
+    def stats(self) -> dict:
+        return {"text": self.history[-1][0] if self.history else None,
+                "rows": len(self.history[-1][1]) if self.history else 0, "fetched": len(self.books),
+                "fresh": self.fresh, "narrowed": self.narrowed}
+
+# -----------------------------
+# Statistics (SPEC.md): pie charts and top lists
+# -----------------------------
+# chart -> (title, SQL producing (label, count))
+PIE_CHARTS = {
+    "rating": ("Rating", "SELECT coalesce(rating, 0), count(*) FROM all_books GROUP BY 1 ORDER BY 1"),
+    "dnf": ("DNF", "SELECT CASE dnf WHEN 1 THEN 'DNF' ELSE 'Finished' END, count(*) FROM all_books GROUP BY 1 ORDER BY 1"),
+    "size": ("Size of books", "SELECT coalesce(s.size_name, '—'), count(*) FROM all_books b LEFT JOIN size s ON s.id = b.size GROUP BY b.size ORDER BY b.size"),
+    "category": ("Books category", "SELECT coalesce(c.category_name, '—'), count(*) FROM all_books b LEFT JOIN category c ON c.id = b.category GROUP BY b.category ORDER BY b.category"),
+    "source": ("How I read my books", "SELECT coalesce(s.source, '—'), count(*) FROM all_books b LEFT JOIN source s ON s.id = b.source GROUP BY b.source ORDER BY b.source"),
+    "discovery": ("How I find my books", "SELECT coalesce(d.discovery_name, '—'), count(*) FROM all_books b LEFT JOIN discovery d ON d.id = b.discovery GROUP BY b.discovery ORDER BY b.discovery"),
+    "months_later": ("How I remember my books", "SELECT coalesce(m.name, '—'), count(*) FROM all_books b LEFT JOIN months_later m ON m.id = b.months_later GROUP BY b.months_later ORDER BY b.months_later"),
+    "reread": ("Do I reread?", "SELECT coalesce(r.name, '—'), count(*) FROM all_books b LEFT JOIN reread r ON r.id = b.reread GROUP BY b.reread ORDER BY b.reread"),
+    "phys_copy": ("Do I need a physical copy?", "SELECT CASE phys_copy WHEN 1 THEN 'Yes' ELSE 'No' END, count(*) FROM all_books GROUP BY 1 ORDER BY 1"),
+}
+
+def _label_count(cursor, row):
+    return (str(row[0]), row[1])
+
+def pie_counts(chart: str) -> List[Tuple[str,int]]:
+    return cached_fetch_all(PIE_CHARTS[chart][1], (), _label_count)
+
+def top_genres(n: int = 5) -> List[Tuple[str,int]]:
+    return cached_fetch_all("SELECT g.genre_name, count(*) AS n FROM all_books b JOIN genre g ON g.id = b.genre "
+                            "GROUP BY b.genre ORDER BY n DESC, g.genre_name LIMIT ?", (n,), plain)
+
+def top_subgenres(n: int = 10) -> List[Tuple[str,int]]:
+    return cached_fetch_all("SELECT s.subgenre_name, count(*) AS n FROM all_books b JOIN subgenre s ON s.id = b.subgenre "
+                            "GROUP BY b.subgenre ORDER BY n DESC, s.subgenre_name LIMIT ?", (n,), plain)
+
+def top_vibes(n: int = 5) -> List[Tuple[str,int]]:
+    # use_count is maintained by triggers, no GROUP BY over book_vibes needed
+    return cached_fetch_all("SELECT vibe_name, use_count FROM vibe WHERE use_count > 0 "
+                            "ORDER BY use_count DESC, vibe_name LIMIT ?", (n,), plain)
+
+# -----------------------------
+# Reading pace over time, from the reading_month rollup (db_setup.m007_monthly_rollup)
+# -----------------------------
+@dataclass(slots=True, frozen=True)
+class PaceRow(_Record):
+    period: str                 # "2024", "2024-Q1" or "2024-01"
+    finished: int
+    dnf: int
+    dnf_rate: float             # dnf / (finished + dnf)
+    pages: int                  # estimated from the size buckets
+    avg_rating: Optional[float] # over rated books only
+
+# period -> (label, GROUP BY)
+PACE_PERIODS = {
+    "month": ("printf('%04d-%02d', year, month)", "year, month"),
+    "quarter": ("printf('%04d-Q%d', year, (month + 2) / 3)", "year, (month + 2) / 3"),
+    "year": ("printf('%04d', year)", "year"),
+}
+
+def _year_month(d: Optional[str], default: Tuple[int,int]) -> Tuple[int,int]:
+    # "2024", "2024-03" or "2024-03-15" -> (2024, 3)
+    if not d:
+        return default
+    parts = str(d).split("-")
+    try:
+        return int(parts[0]), int(parts[1]) if len(parts) > 1 else default[1]
+    except ValueError:
+        raise ValueError(f"bad date {d!r}, expected YYYY[-MM[-DD]]")
+
+def reading_pace(period: str = "month", date_from: Optional[str] = None,
+                 date_to: Optional[str] = None) -> List[PaceRow]:
+    # one range scan on reading_month's primary key; empty periods are left out
+    if period not in PACE_PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PACE_PERIODS)}")
+    label, group = PACE_PERIODS[period]
+    lo, hi = _year_month(date_from, (0, 1)), _year_month(date_to, (9999, 12))
+    return cached_fetch_all(f"""
+        SELECT {label}, sum(books) - sum(dnf), sum(dnf), round(1.0 * sum(dnf) / sum(books), 3),
+               sum(pages), round(1.0 * sum(rating_sum) / nullif(sum(rated), 0), 2)
+        FROM reading_month
+        WHERE (year, month) BETWEEN (?, ?) AND (?, ?)
+        GROUP BY {group} HAVING sum(books) > 0 ORDER BY {group}
+    """, (*lo, *hi), PaceRow.from_row)
+
+def rebuild_rollups(conn: sqlite3.Connection) -> None:
+    # reading_month from scratch (migration, after bulk loads); the triggers keep it current after that
+    conn.execute("DELETE FROM reading_month")
+    conn.execute("""
+        INSERT INTO reading_month (year, month, books, dnf, rated, rating_sum, pages)
+        SELECT CAST(substr(b.date_finish, 1, 4) AS INTEGER), CAST(substr(b.date_finish, 6, 2) AS INTEGER),
+               count(*), sum(b.dnf = 1), sum(ifnull(b.rating, 0) > 0), sum(ifnull(b.rating, 0)),
+               sum(CASE WHEN b.dnf = 1 THEN 0 ELSE ifnull(s.est_pages, 0) END)
+        FROM books b LEFT JOIN size s ON s.id = b.size
+        WHERE b.date_finish IS NOT NULL
+        GROUP BY 1, 2
+    """)
+
+def statistics() -> dict:
+    return {
+        "pies": {k: pie_counts(k) for k in PIE_CHARTS},
+        "top_genres": top_genres(),
+        "top_subgenres": top_subgenres(),
+        "top_vibes": top_vibes(),
+        "per_year": [dict(r) for r in reading_pace("year")],
+    }
+
+# -----------------------------
+# Archive: books finished before a cutoff move to files ATTACHed next to the journal
+# -----------------------------
+def _archive_cutoff(before: str) -> str:
+    before = before.strip()
+    if re.fullmatch(r"\d{4}", before):
+        return f"{before}-01-01"
+    return datetime.date.fromisoformat(before).isoformat()
+
+def _create_archive_tables(conn: sqlite3.Connection, schema: str) -> None:
+    # live columns, primary keys kept; no foreign keys (the lookups live in main) and no triggers
+    for table, pk in (("books", "id"), ("book_text", "book_id"), ("book_vibes", "book_id, vibe_id")):
+        cols = [(r[1], r[2]) for r in conn.execute(f"PRAGMA main.table_info({table})")]
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {schema}.{table} "
+                     f"({', '.join(f'{n} {t}'.strip() for n, t in cols)}, PRIMARY KEY ({pk}))")
+        have = {r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+        for n, t in cols:
+            if n not in have:   # archive written by an older schema
+                conn.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {n} {t}")
+    # the live indexes too, so the archive arm of an all_* query seeks the same way
+    for (sql,) in conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                               "AND tbl_name IN ('books', 'book_text', 'book_vibes')").fetchall():
+        conn.execute(re.sub(r"^CREATE INDEX (\w+)", rf"CREATE INDEX IF NOT EXISTS {schema}.\1", sql))
+
+def _set_moving(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> int:
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS moving (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.moving")
+    return conn.execute(f"INSERT INTO temp.moving (id) {sql}", params).rowcount
+
+def _common_columns(conn: sqlite3.Connection, src: str, dst: str, table: str) -> str:
+    have = {r[1] for r in conn.execute(f"PRAGMA {dst}.table_info({table})")}
+    return ", ".join(r[1] for r in conn.execute(f"PRAGMA {src}.table_info({table})") if r[1] in have)
+
+def _copy_books(conn: sqlite3.Connection, src: str, dst: str) -> None:
+    # books in temp.moving (with their text and vibe links) from schema src into dst
+    for table, key in (("books", "id"), ("book_text", "book_id"), ("book_vibes", "book_id")):
+        cols = _common_columns(conn, src, dst, table)
+        conn.execute(f"INSERT OR REPLACE INTO {dst}.{table} ({cols}) SELECT {cols} FROM {src}.{table} "
+                     f"WHERE {key} IN (SELECT id FROM temp.moving)")
+    # the live insert trigger re-derives the reminder date; keep the stored one
+    conn.execute(f"UPDATE {dst}.books SET remember_check_due_at = (SELECT s.remember_check_due_at "
+                 f"FROM {src}.books s WHERE s.id = books.id) WHERE id IN (SELECT id FROM temp.moving)")
+
+def _delete_books(conn: sqlite3.Connection, schema: str) -> None:
+    for table, key in (("book_vibes", "book_id"), ("book_text", "book_id"), ("books", "id")):
+        conn.execute(f"DELETE FROM {schema}.{table} WHERE {key} IN (SELECT id FROM temp.moving)")
+
+@contextlib.contextmanager
+def _keep_counters(conn: sqlite3.Connection, src: str):
+    # Archived books still count. The live triggers adjust author/vibe use_count and reading_month
+    # when books leave or enter main; the rows they touch are put back as they were.
+    moving = "(SELECT id FROM temp.moving)"
+    conn.execute("DROP TABLE IF EXISTS temp.keep_author")
+    conn.execute("DROP TABLE IF EXISTS temp.keep_vibe")
+    conn.execute("DROP TABLE IF EXISTS temp.keep_month")
+    conn.execute(f"CREATE TEMP TABLE keep_author AS SELECT id, use_count, last_used FROM author "
+                 f"WHERE id IN (SELECT author FROM {src}.books WHERE id IN {moving})")
+    conn.execute(f"CREATE TEMP TABLE keep_vibe AS SELECT id, use_count, last_used FROM vibe "
+                 f"WHERE id IN (SELECT vibe_id FROM {src}.book_vibes WHERE book_id IN {moving})")
+    conn.execute(f"CREATE TEMP TABLE keep_month AS SELECT * FROM reading_month WHERE (year, month) IN "
+                 f"(SELECT CAST(substr(date_finish, 1, 4) AS INTEGER), CAST(substr(date_finish, 6, 2) AS INTEGER) "
+                 f"FROM {src}.books WHERE id IN {moving} AND date_finish IS NOT NULL)")
+    yield
+    for t in ("author", "vibe"):
+        conn.execute(f"UPDATE {t} SET use_count = k.use_count, last_used = k.last_used "
+                     f"FROM temp.keep_{t} k WHERE k.id = {t}.id")
+    conn.execute("INSERT OR REPLACE INTO reading_month SELECT * FROM temp.keep_month")
+    for t in ("keep_author", "keep_vibe", "keep_month"):
+        conn.execute(f"DROP TABLE temp.{t}")
+
+def archive_books(before: str, path: Optional[str] = None) -> Tuple[int, str]:
+    # Moves books finished before `before` (YYYY or YYYY-MM-DD) with their text and vibe links
+    # into an archive file next to the journal (default <journal>-archive-<last year>.db),
+    # registered in archive_file. -> (books moved, archive path as registered)
+    cutoff = _archive_cutoff(before)
+    with write_lock():   # a copy and a delete transaction; no other writer in between
+        conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+        conn.execute("PRAGMA foreign_keys = ON;")
+        try:
+            attach_archives(conn)
+            # the newest book never moves: a new book's id is max(id) + 1 over main, so archived ids
+            # can't be handed out again
+            pick = ("SELECT id FROM main.books WHERE date_finish < ? "
+                    "AND id < (SELECT max(id) FROM main.books)")
+            last = conn.execute(f"SELECT max(substr(date_finish, 1, 4)) FROM main.books WHERE id IN ({pick})",
+                                (cutoff,)).fetchone()[0]
+            if last is None:
+                return 0, path or ""
+            folder = os.path.dirname(os.path.abspath(DB_PATH))
+            if path is None:
+                path = f"{os.path.splitext(os.path.basename(DB_PATH))[0]}-archive-{last}.db"
+            full = os.path.join(folder, path)
+            rel = os.path.relpath(full, folder)
+            attached = {os.path.realpath(r[2]): r[1] for r in conn.execute("PRAGMA database_list") if r[2]}
+            schema = attached.get(os.path.realpath(full))
+            if schema is None:
+                if len(archive_schemas(conn)) >= MAX_ARCHIVES:
+                    raise ValueError(f"already {MAX_ARCHIVES} archive files; archive into one of them with --file")
+                schema = f"archive_{len(archive_schemas(conn)) + 1}"
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (full,))
+            if schema == "main":
+                raise ValueError("the archive can't be the journal itself")
+            # In WAL mode a transaction over several files is atomic per file only, so the copy commits
+            # first; a crash before the delete leaves rows in both files, which the next run (and the
+            # cleanup below) resolves in favour of the live copy.
+            with conn:
+                _create_archive_tables(conn, schema)
+                _set_moving(conn, "SELECT id FROM main.books")
+                _delete_books(conn, schema)
+                n = _set_moving(conn, pick, (cutoff,))
+                _copy_books(conn, "main", schema)
+            with conn:
+                first = conn.execute("SELECT min(substr(date_finish, 1, 4)) FROM main.books "
+                                     "WHERE id IN (SELECT id FROM temp.moving)").fetchone()[0]
+                with _keep_counters(conn, "main"):
+                    _delete_books(conn, "main")
+                conn.execute("""
+                    INSERT INTO archive_file (path, first_year, last_year, archived_at) VALUES (?, ?, ?, datetime('now'))
+                    ON CONFLICT(path) DO UPDATE SET first_year = min(first_year, excluded.first_year),
+                      last_year = max(last_year, excluded.last_year), archived_at = excluded.archived_at
+                """, (rel, int(first), int(last)))
+            note_write()
+            return n, rel
+        finally:
+            conn.close()
+
+def restore_book(book_id: int, conn: sqlite3.Connection) -> bool:
+    # archived book -> live tables, in the caller's transaction. main commits before the attached
+    # files, so an interrupted restore leaves a duplicate rather than losing the book.
+    for schema in archive_schemas(conn):
+        if conn.execute(f"SELECT 1 FROM {schema}.books WHERE id = ?", (book_id,)).fetchone():
+            _set_moving(conn, "VALUES (?)", (book_id,))
+            with _keep_counters(conn, schema):
+                _copy_books(conn, schema, "main")
+                _delete_books(conn, schema)
+            note_write()
+            return True
+    return False
+
+def list_archives() -> List[dict]:
+    # registered archive files with their size on disk and how many books they hold
     with get_conn() as c:
-        cur = c.execute(sql, vals)
-        return cur.lastrowid
+        by_path = {os.path.realpath(r[2]): r[1] for r in c.execute("PRAGMA database_list") if r[2]}
+        folder = os.path.dirname(os.path.abspath(DB_PATH))
+        out = []
+        for path, first, last, when in c.execute(
+                "SELECT path, first_year, last_year, archived_at FROM archive_file ORDER BY last_year, path"):
+            full = os.path.join(folder, path)
+            schema = by_path.get(os.path.realpath(full))
+            books = c.execute(f"SELECT count(*) FROM {schema}.books").fetchone()[0] if schema else None
+            out.append({"path": path, "first_year": first, "last_year": last, "archived_at": when, "books": books,
+                        "bytes": os.path.getsize(full) if os.path.exists(full) else None})
+        return out
+
+# -----------------------------
+# Export / Import (JSON with schema_version)
+# -----------------------------
+EXPORT_TABLES = (
+    "author", "size", "category", "genre", "subgenre", "source", "discovery", "icon", "vibe",
+    "months_later", "reread", "settings_options", "settings", "books", "book_vibes",
+)
+
+def recount_usage(conn: sqlite3.Connection) -> None:
+    # author / vibe usage counters from scratch (after bulk loads); last_used is the reading date
+    # of the latest book, the same value the db_setup.USAGE_TRIGGERS keep moving forward
+    conn.execute("""
+        UPDATE author SET
+          use_count = (SELECT count(*) FROM books b WHERE b.author = author.id),
+          last_used = (SELECT max(coalesce(b.date_finish, b.date_start)) FROM books b WHERE b.author = author.id);
+    """)
+    conn.execute("""
+        UPDATE vibe SET
+          use_count = (SELECT count(*) FROM book_vibes bv WHERE bv.vibe_id = vibe.id),
+          last_used = (SELECT max(coalesce(b.date_finish, b.date_start)) FROM book_vibes bv
+                       JOIN books b ON b.id = bv.book_id WHERE bv.vibe_id = vibe.id);
+    """)
+
+def _export_sql(table: str) -> str:
+    # books go out with their book_text columns merged back in, so the file format doesn't
+    # depend on where the text is stored
+    if table == "books":
+        return (f"SELECT b.*, {', '.join('t.' + k for k in TEXT_COLUMNS)} FROM all_books b "
+                "LEFT JOIN all_book_text t ON t.book_id = b.id ORDER BY b.id")
+    if table == "book_vibes":
+        return "SELECT * FROM all_book_vibes ORDER BY book_id, vibe_id"
+    return f"SELECT * FROM {table} ORDER BY rowid"
+
+def _export_row(cols: List[str], row) -> dict:
+    d = dict(zip(cols, row))
+    for k in TEXT_COLUMNS:
+        if isinstance(d.get(k), bytes):
+            d[k] = unpack_text(d[k])
+    return d
+
+def export_data() -> dict:
+    with get_conn() as c:
+        out = {"schema_version": c.execute("PRAGMA user_version").fetchone()[0], "tables": {}}
+        for t in EXPORT_TABLES:
+            cur = c.execute(_export_sql(t))
+            cur.row_factory = plain
+            cols = [d[0] for d in cur.description]
+            out["tables"][t] = [_export_row(cols, r) for r in cur]
+    return out
+
+def write_export(fp: IO[str], batch: int = 500) -> int:
+    # Same JSON as export_data(), written table by table and row by row from one read snapshot,
+    # so a large journal never sits in memory. -> number of books written
+    books = 0
+    with get_conn() as c:
+        c.execute("BEGIN")
+        try:
+            fp.write('{"schema_version": %d, "tables": {' % c.execute("PRAGMA user_version").fetchone()[0])
+            for i, t in enumerate(EXPORT_TABLES):
+                cur = c.execute(_export_sql(t))
+                cur.row_factory = plain
+                cols = [d[0] for d in cur.description]
+                fp.write(f'{"," if i else ""}\n {json.dumps(t)}: [')
+                n = 0
+                while True:
+                    rows = cur.fetchmany(batch)
+                    if not rows:
+                        break
+                    for row in rows:
+                        fp.write(("," if n else "") + "\n  " + json.dumps(_export_row(cols, row), ensure_ascii=False))
+                        n += 1
+                fp.write("\n ]" if n else "]")
+                if t == "books":
+                    books = n
+            fp.write("\n}}\n")
+        finally:
+            c.rollback()
+    return books
+
+def import_data(payload: dict) -> int:
+    # Replaces the journal with the payload. Older schema versions: rows are loaded by the
+    # columns both sides know, then the missing migration steps backfill the rest.
+    from db_setup import MIGRATIONS
+    version = int(payload.get("schema_version", 0))
+    if version > len(MIGRATIONS):
+        raise ValueError(f"file schema_version {version} is newer than this app ({len(MIGRATIONS)})")
+    tables = payload.get("tables") or {}
+    with write_lock(), get_conn() as c:
+        c.execute("PRAGMA foreign_keys = OFF;")
+        try:
+            c.execute("DELETE FROM book_text")
+            if c.execute("SELECT 1 FROM sqlite_master WHERE name = 'archive_file'").fetchone():
+                c.execute("DELETE FROM archive_file")   # the export already holds the archived books
+            for t in reversed(EXPORT_TABLES):
+                c.execute(f"DELETE FROM {t}")
+            for t in EXPORT_TABLES:
+                rows = tables.get(t) or []
+                if not rows:
+                    continue
+                known = {r[1] for r in c.execute(f"PRAGMA table_info({t})")}
+                cols = [k for k in rows[0] if k in known]
+                c.executemany(f"INSERT INTO {t} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)})",
+                              [tuple(r.get(k) for k in cols) for r in rows])
+            c.executemany(f"INSERT INTO book_text (book_id, {', '.join(TEXT_COLUMNS)}) "
+                          f"VALUES (?{', ?' * len(TEXT_COLUMNS)})",
+                          [(r["id"], *(pack_text(r.get(k)) for k in TEXT_COLUMNS))
+                           for r in tables.get("books") or () if any(r.get(k) is not None for k in TEXT_COLUMNS)])
+            for step in MIGRATIONS[version:]:
+                step(c)
+            recount_usage(c)
+            rebuild_rollups(c)
+            bad = c.execute("PRAGMA foreign_key_check").fetchall()
+            if bad:
+                raise ValueError(f"import breaks {len(bad)} foreign key(s), first in table {bad[0][0]}")
+            c.commit()
+        except Exception:
+            c.rollback()
+            raise
+        finally:
+            c.execute("PRAGMA foreign_keys = ON;")
+            note_write()
+    return len(tables.get("books") or [])
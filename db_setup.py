@@ -1,15 +1,375 @@
 # db_setup.py
-import sqlite3
+import contextlib, re, sqlite3
+from db_access import title_key, recount_usage, rebuild_rollups, pack_text, write_lock, ARCHIVED_TABLES, TEXT_COLUMNS
 
 def execmany(cur, sql, rows):
     cur.executemany(sql, [(r,) if not isinstance(r, tuple) else r for r in rows])
 
+# -----------------------------
+# Migrations: each step runs once, PRAGMA user_version counts the applied ones.
+# Append new steps at the end, never reorder.
+# -----------------------------
+def m001_title_key(conn):
+    # normalized title for rereads / duplicate detection
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(books);")]
+    if "title_key" not in cols:
+        conn.execute("ALTER TABLE books ADD COLUMN title_key TEXT;")
+    rows = conn.execute("SELECT id, name FROM books;").fetchall()
+    conn.executemany("UPDATE books SET title_key = ? WHERE id = ?;",
+                     [(title_key(name), bid) for bid, name in rows])
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_title_key ON books(title_key);")
+
+def m002_nocase_names(conn):
+    # "j.r.r. tolkien" and "J.R.R. Tolkien" are one author; same for vibes.
+    # Old rows could hold the author name instead of its id - turn those into ids first.
+    conn.execute("""
+        INSERT OR IGNORE INTO author(author_name)
+        SELECT DISTINCT trim(author) FROM books WHERE typeof(author) = 'text' AND trim(author) <> '';
+    """)
+    conn.execute("""
+        UPDATE books SET author = (SELECT min(a.id) FROM author a WHERE a.author_name = trim(books.author) COLLATE NOCASE)
+        WHERE typeof(author) = 'text';
+    """)
+
+    # merge case-duplicates into one survivor (prefilled vibes win, then the oldest row)
+    dup_authors = conn.execute("""
+        SELECT id, (SELECT k.id FROM author k WHERE k.author_name = a.author_name COLLATE NOCASE
+                    ORDER BY k.id LIMIT 1) AS keep
+        FROM author a WHERE keep <> id;
+    """).fetchall()
+    for dup, keep in dup_authors:
+        conn.execute("UPDATE books SET author = ? WHERE author = ?;", (keep, dup))
+        conn.execute("DELETE FROM author WHERE id = ?;", (dup,))
+
+    dup_vibes = conn.execute("""
+        SELECT id, (SELECT k.id FROM vibe k WHERE k.vibe_name = v.vibe_name COLLATE NOCASE
+                    ORDER BY k.prefilled DESC, k.id LIMIT 1) AS keep
+        FROM vibe v WHERE keep <> id;
+    """).fetchall()
+    for dup, keep in dup_vibes:
+        conn.execute("INSERT OR IGNORE INTO book_vibes(book_id, vibe_id) SELECT book_id, ? FROM book_vibes WHERE vibe_id = ?;", (keep, dup))
+        conn.execute("DELETE FROM book_vibes WHERE vibe_id = ?;", (dup,))
+        conn.execute("DELETE FROM vibe WHERE id = ?;", (dup,))
+
+    # lookups by name become a single seek: WHERE author_name = ? COLLATE NOCASE
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_author_name_nocase ON author(author_name COLLATE NOCASE);")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_vibe_name_nocase ON vibe(vibe_name COLLATE NOCASE);")
+
+# last_used is the reading date (date_finish, else date_start) of the latest book using the
+# author / vibe, as db_access.recount_usage computes it; the triggers move it forward as books
+# are saved, and leave it where it is when a book is deleted until the next recount.
+def _later(column, day):
+    return f"{column} = CASE WHEN {day} > ifnull({column}, '') THEN {day} ELSE {column} END"
+
+_BOOK_DAY = "coalesce(NEW.date_finish, NEW.date_start)"
+_LINKED_DAY = "(SELECT coalesce(date_finish, date_start) FROM books WHERE id = NEW.book_id)"
+
+USAGE_TRIGGERS = {
+    "trg_author_usage_after_insert": f"""
+    AFTER INSERT ON books
+    WHEN NEW.author IS NOT NULL
+    BEGIN
+      UPDATE author SET use_count = use_count + 1, {_later("last_used", _BOOK_DAY)} WHERE id = NEW.author;
+    END""",
+    "trg_author_usage_after_update": f"""
+    AFTER UPDATE OF author ON books
+    WHEN NEW.author IS NOT OLD.author
+    BEGIN
+      UPDATE author SET use_count = use_count - 1 WHERE id = OLD.author;
+      UPDATE author SET use_count = use_count + 1, {_later("last_used", _BOOK_DAY)} WHERE id = NEW.author;
+    END""",
+    "trg_author_usage_after_delete": """
+    AFTER DELETE ON books
+    WHEN OLD.author IS NOT NULL
+    BEGIN
+      UPDATE author SET use_count = use_count - 1 WHERE id = OLD.author;
+    END""",
+    "trg_usage_after_dates": f"""
+    AFTER UPDATE OF date_start, date_finish ON books
+    BEGIN
+      UPDATE author SET {_later("last_used", _BOOK_DAY)} WHERE id = NEW.author;
+      UPDATE vibe SET {_later("last_used", _BOOK_DAY)}
+      WHERE id IN (SELECT vibe_id FROM book_vibes WHERE book_id = NEW.id);
+    END""",
+    "trg_vibe_usage_after_insert": f"""
+    AFTER INSERT ON book_vibes
+    BEGIN
+      UPDATE vibe SET use_count = use_count + 1, {_later("last_used", _LINKED_DAY)} WHERE id = NEW.vibe_id;
+    END""",
+    "trg_vibe_usage_after_update": f"""
+    AFTER UPDATE OF vibe_id ON book_vibes
+    WHEN NEW.vibe_id IS NOT OLD.vibe_id
+    BEGIN
+      UPDATE vibe SET use_count = use_count - 1 WHERE id = OLD.vibe_id;
+      UPDATE vibe SET use_count = use_count + 1, {_later("last_used", _LINKED_DAY)} WHERE id = NEW.vibe_id;
+    END""",
+    "trg_vibe_usage_after_delete": """
+    AFTER DELETE ON book_vibes
+    BEGIN
+      UPDATE vibe SET use_count = use_count - 1 WHERE id = OLD.vibe_id;
+    END""",
+}
+
+def _usage_triggers(conn):
+    for name, body in USAGE_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name}{body};")
+
+def m003_usage_counters(conn):
+    # author / vibe usage for suggestion ranking, kept current by triggers (USAGE_TRIGGERS)
+    for table in ("author", "vibe"):
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table});")]
+        if "use_count" not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN use_count INTEGER NOT NULL DEFAULT 0;")
+        if "last_used" not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN last_used DATE;")
+
+    recount_usage(conn)
+    _usage_triggers(conn)
+
+def m004_wal(conn):
+    # WAL: readers (api_server, scripts) keep reading while the app writes. Persistent per file.
+    # (re-run inside an import transaction the file is already WAL, and the pragma can't run there)
+    if not conn.in_transaction:
+        conn.execute("PRAGMA journal_mode = WAL;")
+
+def m005_page_indexes(conn):
+    # author name copied onto books so "order by author" needs no join; triggers keep it current
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(books);")]
+    if "author_sort" not in cols:
+        conn.execute("ALTER TABLE books ADD COLUMN author_sort TEXT;")
+    conn.execute("UPDATE books SET author_sort = (SELECT author_name FROM author WHERE id = books.author);")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_books_author_sort_after_insert
+    AFTER INSERT ON books
+    WHEN NEW.author IS NOT NULL
+    BEGIN
+      UPDATE books SET author_sort = (SELECT author_name FROM author WHERE id = NEW.author) WHERE id = NEW.id;
+    END;
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_books_author_sort_after_update
+    AFTER UPDATE OF author ON books
+    WHEN NEW.author IS NOT OLD.author
+    BEGIN
+      UPDATE books SET author_sort = (SELECT author_name FROM author WHERE id = NEW.author) WHERE id = NEW.id;
+    END;
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_author_rename_sort
+    AFTER UPDATE OF author_name ON author
+    BEGIN
+      UPDATE books SET author_sort = NEW.author_name WHERE author = NEW.id;
+    END;
+    """)
+
+    # one covering index per "Order by" option: (sort key, id, list columns).
+    # Key expressions must match db_access.BOOK_ORDERS.
+    shown = "name, author_sort, date_start, date_finish, rating, dnf, icon, remember_check_due_at"
+    for order, key in (("date_finish", "ifnull(date_finish, '')"), ("date_start", "ifnull(date_start, '')"),
+                       ("rating", "ifnull(rating, -1)"), ("name", "name"), ("author", "ifnull(author_sort, '')")):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_books_page_{order} ON books({key}, id, {shown});")
+
+def m006_cold_text(conn):
+    # long free text moves out of books into a 1:1 side table: list scans, filters and stats
+    # stop dragging overflow pages of notes along. Big values are zlib-packed (db_access.pack_text).
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS book_text (
+        book_id INTEGER PRIMARY KEY REFERENCES books(id) ON DELETE CASCADE,
+        {', '.join(TEXT_COLUMNS)}
+    );
+    """)
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(books);")]
+    moving = [k for k in TEXT_COLUMNS if k in cols]
+    if not moving:
+        return
+    rows = conn.execute(f"SELECT id, {', '.join(moving)} FROM books "
+                        f"WHERE {' OR '.join(k + ' IS NOT NULL' for k in moving)};").fetchall()
+    conn.executemany(f"INSERT OR REPLACE INTO book_text (book_id, {', '.join(moving)}) VALUES (?{', ?' * len(moving)});",
+                     [(r[0], *(pack_text(v) for v in r[1:])) for r in rows])
+    for k in moving:
+        conn.execute(f"ALTER TABLE books DROP COLUMN {k};")
+
+def _rollup_delta(row, sign):
+    # reading_month change for one books row (NEW/OLD); DNF books count but add no pages
+    return f"""
+      INSERT INTO reading_month (year, month, books, dnf, rated, rating_sum, pages)
+      VALUES (CAST(substr({row}.date_finish, 1, 4) AS INTEGER), CAST(substr({row}.date_finish, 6, 2) AS INTEGER),
+              {sign}1, {sign}({row}.dnf = 1), {sign}(ifnull({row}.rating, 0) > 0), {sign}ifnull({row}.rating, 0),
+              {sign}CASE WHEN {row}.dnf = 1 THEN 0 ELSE ifnull((SELECT est_pages FROM size WHERE id = {row}.size), 0) END)
+      ON CONFLICT (year, month) DO UPDATE SET
+        books = books + excluded.books, dnf = dnf + excluded.dnf, rated = rated + excluded.rated,
+        rating_sum = rating_sum + excluded.rating_sum, pages = pages + excluded.pages;"""
+
+def m007_monthly_rollup(conn):
+    # per-month reading numbers for the pace charts, kept current by triggers, so any date
+    # range is one primary-key range scan instead of a strftime GROUP BY over books
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(size);")]
+    if "est_pages" not in cols:
+        conn.execute("ALTER TABLE size ADD COLUMN est_pages INTEGER;")
+    for sid, name in conn.execute("SELECT id, size_name FROM size;").fetchall():
+        # "Novel — 200-450 pages" -> 325, "Epic — 450+ pages" -> 600
+        span, plus = re.search(r"(\d+)\s*-\s*(\d+)", name), re.search(r"(\d+)\s*\+", name)
+        pages = (int(span[1]) + int(span[2])) // 2 if span else int(plus[1]) * 4 // 3 if plus else None
+        conn.execute("UPDATE size SET est_pages = ? WHERE id = ?;", (pages, sid))
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS reading_month (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        books INTEGER NOT NULL DEFAULT 0,        -- with date_finish in the month, DNF included
+        dnf INTEGER NOT NULL DEFAULT 0,
+        rated INTEGER NOT NULL DEFAULT 0,        -- rating > 0
+        rating_sum INTEGER NOT NULL DEFAULT 0,
+        pages INTEGER NOT NULL DEFAULT 0,        -- estimated from size.est_pages, finished books only
+        PRIMARY KEY (year, month)
+    ) WITHOUT ROWID;
+    """)
+    rebuild_rollups(conn)
+
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_after_insert
+    AFTER INSERT ON books
+    WHEN NEW.date_finish IS NOT NULL
+    BEGIN{_rollup_delta("NEW", "+")}
+    END;
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_after_delete
+    AFTER DELETE ON books
+    WHEN OLD.date_finish IS NOT NULL
+    BEGIN{_rollup_delta("OLD", "-")}
+    END;
+    """)
+    # an update moves the row's contribution: out of the old month, into the new one
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_after_update_old
+    AFTER UPDATE OF date_finish, rating, dnf, size ON books
+    WHEN OLD.date_finish IS NOT NULL AND (NEW.date_finish IS NOT OLD.date_finish OR NEW.rating IS NOT OLD.rating
+                                          OR NEW.dnf IS NOT OLD.dnf OR NEW.size IS NOT OLD.size)
+    BEGIN{_rollup_delta("OLD", "-")}
+    END;
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_after_update_new
+    AFTER UPDATE OF date_finish, rating, dnf, size ON books
+    WHEN NEW.date_finish IS NOT NULL AND (NEW.date_finish IS NOT OLD.date_finish OR NEW.rating IS NOT OLD.rating
+                                          OR NEW.dnf IS NOT OLD.dnf OR NEW.size IS NOT OLD.size)
+    BEGIN{_rollup_delta("NEW", "+")}
+    END;
+    """)
+
+def m008_archive_registry(conn):
+    # archive files made by db_access.archive_books; paths are relative to the journal's folder
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS archive_file (
+        path TEXT PRIMARY KEY,
+        first_year INTEGER,
+        last_year INTEGER,
+        archived_at TEXT
+    );
+    """)
+
+def _book_changed(book_id):
+    return f"""
+      INSERT INTO book_change (book_id, seq) VALUES ({book_id}, (SELECT ifnull(max(seq), 0) + 1 FROM book_change))
+      ON CONFLICT (book_id) DO UPDATE SET seq = excluded.seq;"""
+
+def m009_book_changes(conn):
+    # change feed for in-memory views of the journal (similar.py): every insert, delete or
+    # feature edit of a book bumps its seq, so a reader re-reads only the books past its last seq
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS book_change (
+        book_id INTEGER PRIMARY KEY,
+        seq INTEGER NOT NULL
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_book_change_seq ON book_change(seq);")
+    for name, event, row in (
+            ("trg_book_change_after_insert", "INSERT ON books", "NEW.id"),
+            ("trg_book_change_after_update",
+             "UPDATE OF name, genre, subgenre, rating, reread, months_later, dnf ON books", "NEW.id"),
+            ("trg_book_change_after_delete", "DELETE ON books", "OLD.id"),
+            ("trg_book_change_vibe_insert", "INSERT ON book_vibes", "NEW.book_id"),
+            ("trg_book_change_vibe_delete", "DELETE ON book_vibes", "OLD.book_id")):
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {name}
+        AFTER {event}
+        BEGIN{_book_changed(row)}
+        END;
+        """)
+
+def m010_maintenance(conn):
+    # runs of maintenance.run(), and incremental vacuum so freed pages can be handed back
+    # without a full VACUUM. Switching auto_vacuum on an existing file needs one VACUUM;
+    # re-run inside an import transaction it can't happen and the mode stays as it was.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS maintenance_log (
+        id INTEGER PRIMARY KEY,
+        started_at TEXT NOT NULL,
+        finished_at TEXT NOT NULL,
+        reason TEXT,
+        seconds REAL,
+        db_bytes_before INTEGER,
+        db_bytes_after INTEGER,
+        wal_bytes_before INTEGER,
+        wal_bytes_after INTEGER,
+        change_seq INTEGER,
+        steps TEXT               -- JSON: step -> {ms, result}
+    );
+    """)
+    if not conn.in_transaction and conn.execute("PRAGMA auto_vacuum;").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        conn.execute("VACUUM;")
+
+def m011_all_views(conn):
+    # all_* over the live tables alone, for connections with no archive attached; when there are
+    # archives, db_access.attach_archives shadows them with TEMP views that add the archive arms
+    for table in ARCHIVED_TABLES:
+        conn.execute(f"CREATE VIEW IF NOT EXISTS main.all_{table} AS SELECT * FROM {table};")
+
+def m012_usage_reading_dates(conn):
+    # the first usage triggers set last_used to the day of the save, recount_usage to the reading
+    # date; both use the reading date now
+    for name in USAGE_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name};")
+    _usage_triggers(conn)
+    recount_usage(conn)
+
+MIGRATIONS = [
+    m001_title_key,
+    m002_nocase_names,
+    m003_usage_counters,
+    m004_wal,
+    m005_page_indexes,
+    m006_cold_text,
+    m007_monthly_rollup,
+    m008_archive_registry,
+    m009_book_changes,
+    m010_maintenance,
+    m011_all_views,
+    m012_usage_reading_dates,
+]
+
+def migrate(conn):
+    if conn.execute("PRAGMA user_version;").fetchone()[0] >= len(MIGRATIONS):
+        return
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    # two processes starting on an old file: the second waits, then finds nothing left to do
+    with write_lock(path) if path else contextlib.nullcontext():
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        for n, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            with conn:
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {n};")
+
 def main():
     conn = sqlite3.connect("journal.db")
     cur = conn.cursor()
 
     # Be strict, be proud
     cur.execute("PRAGMA foreign_keys = ON;")
+    # before the first table, so m010_maintenance finds it set and a new file skips its VACUUM
+    cur.execute("PRAGMA auto_vacuum = INCREMENTAL;")
 
     # -----------------------------
     # Lookup / reference tables
@@ -134,6 +494,7 @@ def main():
         id INTEGER PRIMARY KEY,
         dnf INTEGER NOT NULL DEFAULT 0,                 -- boolean 0/1
         name TEXT NOT NULL,
+        title_key TEXT,                                 -- title_key(name), see m001_title_key
         author INTEGER,                                 -- FK author.id
         size INTEGER,                                   -- FK size.id
         category INTEGER,                               -- FK category.id
@@ -141,21 +502,15 @@ def main():
         subgenre INTEGER,                               -- FK subgenre.id
         source INTEGER,                                 -- FK source.id
         discovery INTEGER,                              -- FK discovery.id
-        discovery_text TEXT,
         icon INTEGER,                                   -- FK icon.id
-        expectations TEXT,
-        expectations_failed TEXT,
         date_start DATE,
         date_finish DATE,
         rating INTEGER,
-        crush_list TEXT,
         months_later INTEGER,                           -- FK months_later.id
         reread INTEGER,                                 -- FK reread.id
-        line TEXT,
-        reminded TEXT,
         phys_copy INTEGER NOT NULL DEFAULT 0,           -- boolean 0/1
-        notes TEXT,
         remember_check_due_at DATE,                     -- computed by trigger when date_finish set
+        -- long free text (notes, crush list, ...) lives in book_text, created by m006_cold_text
         FOREIGN KEY(author) REFERENCES author(id) ON DELETE SET NULL ON UPDATE CASCADE,
         FOREIGN KEY(size) REFERENCES size(id) ON DELETE SET NULL ON UPDATE CASCADE,
         FOREIGN KEY(category) REFERENCES category(id) ON DELETE SET NULL ON UPDATE CASCADE,
@@ -346,9 +701,12 @@ def main():
     # Commit all that beauty
     conn.commit()
 
+    # Bring the schema up to date (new columns, indexes, backfills)
+    migrate(conn)
+
     # Smoke test insert (optional; comment out if you’re picky)
     cur.execute("INSERT OR IGNORE INTO author(author_name) VALUES (?)", ("J.R.R. Tolkien",))
-    cur.execute("SELECT id FROM author WHERE author_name = ?", ("J.R.R. Tolkien",))
+    cur.execute("SELECT id FROM author WHERE author_name = ? COLLATE NOCASE", ("J.R.R. Tolkien",))
     tolkien = cur.fetchone()[0]
     cur.execute("SELECT id FROM size WHERE size_name=?", ("Novel — 200-450 pages",))
     size_id = cur.fetchone()[0]
@@ -368,10 +726,11 @@ def main():
     rr_id = cur.fetchone()[0]
 
     cur.execute("""
-        INSERT INTO books (dnf, name, author, size, category, genre, subgenre, source, discovery,
+        INSERT INTO books (dnf, name, title_key, author, size, category, genre, subgenre, source, discovery,
                            date_start, date_finish, rating, months_later, reread, phys_copy)
-        VALUES (0, ?, ?, ?, ?, ?, ?, ?, ?, date('2025-01-01'), date('2025-02-01'), 10, ?, ?, 1)
-    """, ("The Lord of the Rings", tolkien, size_id, cat_id, genre_id, subgenre_id, source_id, disc_id, ml_id, rr_id))
+        VALUES (0, ?, ?, ?, ?, ?, ?, ?, ?, ?, date('2025-01-01'), date('2025-02-01'), 10, ?, ?, 1)
+    """, ("The Lord of the Rings", title_key("The Lord of the Rings"), tolkien, size_id, cat_id, genre_id,
+          subgenre_id, source_id, disc_id, ml_id, rr_id))
     conn.commit()
 
     print("journal.db created and prefilled. Go raise some hell.")
@@ -0,0 +1,161 @@
+# maintenance.py
+# Housekeeping for the journal file, in time-boxed steps so it can run while the UI is idle
+# (app.IdleMaintenance), at shutdown, or from cron (python -m cli maintain):
+#   analyze      ANALYZE with analysis_limit (samples each index, no full scans), then PRAGMA optimize
+#   vacuum       PRAGMA incremental_vacuum in chunks until the free list is empty
+#                (auto_vacuum = INCREMENTAL since db_setup.m010_maintenance)
+#   checkpoint   WAL checkpoint; TRUNCATE when it completes, so the -wal file shrinks back
+#   quick_check  PRAGMA quick_check
+# Each step gets its own budget, enforced by a progress handler that interrupts the statement,
+# and SQLite's busy timeout is cut to what is left of it (the handler can't interrupt that wait).
+# Every run is recorded in maintenance_log with file sizes before/after and per-step timings.
+# Steps that write take the journal's write lock (db_access.write_lock) within their budget.
+import contextlib, json, os, sqlite3, sys, threading, time
+from typing import IO, Dict, Optional, Sequence
+
+import db_access
+
+STEPS = ("analyze", "vacuum", "checkpoint", "quick_check")
+BUDGETS = {"analyze": 0.5, "vacuum": 1.0, "checkpoint": 0.5, "quick_check": 2.0}   # seconds
+SHUTDOWN_STEPS = ("analyze", "vacuum", "checkpoint")
+SHUTDOWN_BUDGETS = {"analyze": 0.2, "vacuum": 0.3, "checkpoint": 0.3}
+WRITE_STEPS = ("analyze", "vacuum")   # ANALYZE and PRAGMA optimize write sqlite_stat1
+
+ANALYSIS_LIMIT = 1000     # rows sampled per index by ANALYZE
+VACUUM_CHUNK = 256        # pages released per incremental_vacuum transaction
+PROGRESS_OPS = 1000       # VM instructions between budget checks
+LOG_WAIT = 1.0            # seconds the maintenance_log insert queues for the write lock
+
+# when a run is due (see due())
+DUE_AFTER_CHANGES = 500   # books inserted/edited/deleted since the last run (book_change seq)
+DUE_FREE_SHARE = 0.10     # free pages / all pages
+DUE_WAL_BYTES = 16 << 20
+DUE_AFTER_DAYS = 7
+
+def _sizes(path: str) -> Dict[str, int]:
+    wal = path + "-wal"
+    return {"db": os.path.getsize(path), "wal": os.path.getsize(wal) if os.path.exists(wal) else 0}
+
+def _analyze(conn: sqlite3.Connection, deadline: float) -> dict:
+    first = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is None
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT};")
+    conn.execute("ANALYZE main;")
+    conn.execute("PRAGMA optimize;")
+    return {"first": first}
+
+def _vacuum(conn: sqlite3.Connection, deadline: float) -> dict:
+    free = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+    if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] != 2:
+        return {"skipped": "auto_vacuum is not INCREMENTAL", "free_pages": free}
+    freed = 0
+    while free and time.perf_counter() < deadline:
+        conn.execute(f"PRAGMA incremental_vacuum({VACUUM_CHUNK});").fetchall()   # frees a page per step
+        now = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+        freed, free = freed + free - now, now
+    return {"freed_pages": freed, "free_pages": free}
+
+def _wait_at_most(conn: sqlite3.Connection, deadline: float):
+    conn.execute(f"PRAGMA busy_timeout = {max(0, int((deadline - time.perf_counter()) * 1000))};")
+
+def _checkpoint(conn: sqlite3.Connection, deadline: float) -> dict:
+    if conn.execute("PRAGMA journal_mode;").fetchone()[0] != "wal":
+        return {"skipped": "not in WAL mode"}
+    busy, frames, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE);").fetchone()
+    if not busy and frames == done:
+        # everything is in the db file; TRUNCATE waits (up to the budget) for readers to let go
+        _wait_at_most(conn, deadline)
+        busy, frames, done = conn.execute("PRAGMA wal_checkpoint(TRUNCATE);").fetchone()
+    return {"busy": bool(busy), "wal_frames": frames, "checkpointed": done}
+
+def _quick_check(conn: sqlite3.Connection, deadline: float) -> dict:
+    rows = [r[0] for r in conn.execute("PRAGMA quick_check(10);")]
+    return {"ok": rows == ["ok"], **({} if rows == ["ok"] else {"errors": rows})}
+
+STEP_FUNCS = {"analyze": _analyze, "vacuum": _vacuum, "checkpoint": _checkpoint, "quick_check": _quick_check}
+
+@contextlib.contextmanager
+def _budget(conn: sqlite3.Connection, deadline: float, cancel: Optional[threading.Event]):
+    # a non-zero return from the progress handler interrupts the running statement
+    conn.set_progress_handler(lambda: time.perf_counter() > deadline or (cancel is not None and cancel.is_set()),
+                              PROGRESS_OPS)
+    try:
+        yield
+    finally:
+        conn.set_progress_handler(None, 0)
+
+def due(path: Optional[str] = None) -> Optional[str]:
+    # -> why a run is due now, or None
+    path = path or db_access.DB_PATH
+    with contextlib.closing(sqlite3.connect(path, timeout=db_access.BUSY_TIMEOUT)) as conn:
+        last = conn.execute("SELECT julianday('now') - julianday(finished_at), change_seq FROM maintenance_log "
+                            "ORDER BY id DESC LIMIT 1").fetchone()
+        if last is None:
+            return "never run"
+        seq = conn.execute("SELECT ifnull(max(seq), 0) FROM book_change").fetchone()[0]
+        if seq - (last[1] or 0) >= DUE_AFTER_CHANGES:
+            return f"{seq - (last[1] or 0)} book changes"
+        pages = conn.execute("PRAGMA page_count;").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+        if pages and free / pages >= DUE_FREE_SHARE:
+            return f"{free} free pages of {pages}"
+    wal = _sizes(path)["wal"]
+    if wal >= DUE_WAL_BYTES:
+        return f"WAL at {wal / 1e6:.1f} MB"
+    if last[0] >= DUE_AFTER_DAYS:
+        return f"last run {last[0]:.0f} days ago"
+    return None
+
+def run(path: Optional[str] = None, steps: Sequence[str] = STEPS, budgets: Optional[Dict[str, float]] = None,
+        reason: str = "manual", cancel: Optional[threading.Event] = None, log: Optional[IO[str]] = sys.stderr) -> dict:
+    path = path or db_access.DB_PATH
+    budgets = {**BUDGETS, **(budgets or {})}
+    t0 = time.perf_counter()
+    before = _sizes(path)
+    report = {"reason": reason, "steps": {}}
+    with contextlib.closing(sqlite3.connect(path, timeout=db_access.BUSY_TIMEOUT)) as conn:
+        started = conn.execute("SELECT datetime('now')").fetchone()[0]
+        for step in steps:
+            if cancel is not None and cancel.is_set():
+                report["steps"][step] = {"skipped": "cancelled"}
+                continue
+            s0 = time.perf_counter()
+            lock = (db_access.write_lock(path, budgets[step], notify=False) if step in WRITE_STEPS
+                    else contextlib.nullcontext())
+            try:
+                with lock, _budget(conn, s0 + budgets[step], cancel):
+                    _wait_at_most(conn, s0 + budgets[step])
+                    result = STEP_FUNCS[step](conn, s0 + budgets[step])
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if isinstance(e, db_access.JournalBusy) or db_access._busy(e):
+                    result = {"stopped": "busy"}   # another process is writing; next time
+                elif "interrupted" in str(e):
+                    result = {"stopped": "cancelled" if cancel is not None and cancel.is_set() else "budget"}
+                else:
+                    result = {"stopped": str(e)}
+            result["ms"] = round((time.perf_counter() - s0) * 1000, 1)
+            report["steps"][step] = result
+        after = _sizes(path)
+        report.update(db_bytes=[before["db"], after["db"]], wal_bytes=[before["wal"], after["wal"]],
+                      seconds=round(time.perf_counter() - t0, 3))
+        conn.execute(f"PRAGMA busy_timeout = {int(db_access.BUSY_TIMEOUT * 1000)};")
+        seq = conn.execute("SELECT ifnull(max(seq), 0) FROM book_change").fetchone()[0]
+        try:
+            with db_access.write_lock(path, LOG_WAIT, notify=False), conn:
+                conn.execute("""
+                    INSERT INTO maintenance_log (started_at, finished_at, reason, seconds, db_bytes_before, db_bytes_after,
+                                                 wal_bytes_before, wal_bytes_after, change_seq, steps)
+                    VALUES (?, datetime('now'), ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (started, reason, report["seconds"], before["db"], after["db"], before["wal"], after["wal"], seq,
+                      json.dumps(report["steps"])))
+        except db_access.JournalBusy:
+            report["logged"] = False   # due() still sees the previous run, so the next idle time retries
+    if log:
+        steps_txt = ", ".join(f"{k} {v['ms']}ms" + (f" ({v.get('stopped') or v.get('skipped')})"
+                                                    if v.get("stopped") or v.get("skipped") else "")
+                              for k, v in report["steps"].items() if "ms" in v)
+        print(f"maintenance ({reason}): db {before['db'] / 1e6:.2f} -> {after['db'] / 1e6:.2f} MB, "
+              f"wal {before['wal'] / 1e6:.2f} -> {after['wal'] / 1e6:.2f} MB in {report['seconds']}s - {steps_txt}",
+              file=log)
+    return report
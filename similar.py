@@ -0,0 +1,253 @@
+# similar.py
+# "Read next": books like this one, and the vibes I rate highest.
+# A sparse book x feature matrix (vibes, genre, subgenre, rating band, reread, months_later, DNF)
+# is loaded once per journal and kept in memory as posting sets, one per feature. Before each
+# answer only the books listed in book_change since the last one are re-read
+# (db_setup.m009_book_changes), so saves from the app, the CLI or another process are patched in.
+# NumPy does the scoring when it is installed; the pure-Python path gives the same answers.
+import array, collections, heapq, math, threading
+from typing import List, Optional, Tuple
+
+import db_access
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# feature kind -> weight before idf
+WEIGHTS = {"vibe": 1.0, "genre": 1.0, "subgenre": 1.2, "rating": 0.5, "reread": 0.4, "months_later": 0.4, "dnf": 0.4}
+REBUILD_SHARE = 0.2   # more changed books than this share of the journal: reload instead of patching
+VIBE_PRIOR = 3        # "vibes I rate highest": this many pseudo-books at the journal's mean rating
+CHUNK = 500
+
+BOOK_SQL = "SELECT id, name, genre, subgenre, rating, reread, months_later, dnf FROM all_books"
+VIBE_SQL = "SELECT book_id, vibe_id FROM all_book_vibes"
+
+def rating_band(rating) -> Optional[int]:
+    # 1-4, 5-7, 8-10; unrated books have no band
+    if not rating:
+        return None
+    return 0 if rating <= 4 else 1 if rating <= 7 else 2
+
+def book_features(row, vibes) -> List[Tuple[str,int]]:
+    _, _, genre, subgenre, rating, reread, months_later, dnf = row
+    keys = [("vibe", v) for v in vibes]
+    for kind, value in (("genre", genre), ("subgenre", subgenre), ("rating", rating_band(rating)),
+                        ("reread", reread), ("months_later", months_later), ("dnf", 1 if dnf else None)):
+        if value is not None:
+            keys.append((kind, value))
+    return keys
+
+class Similarity:
+    """Book x feature matrix of one journal; cosine similarity over idf-weighted features."""
+    def __init__(self, path: Optional[str] = None, use_numpy: bool = True):
+        self.path = path or db_access.DB_PATH
+        self.np = np if use_numpy else None
+        self.conn = None
+        self.lock = threading.Lock()
+        self.seq = None   # last book_change seq applied; None until the first load
+        self._clear()
+
+    def _clear(self):
+        self.ids = []                     # row -> book id (None once the book is gone)
+        self.rows = {}                    # book id -> row
+        self.names = []
+        self.ratings = array.array("d")   # row -> rating, nan when unrated
+        self.feats = []                   # row -> tuple of columns
+        self.cols = {}                    # (kind, id) -> column
+        self.kinds = []                   # column -> kind
+        self.postings = []                # column -> set of rows
+        self.idf = array.array("d")       # column -> idf, fixed between full loads
+        self.norms = array.array("d")     # row -> length of the weighted feature vector
+        self.arrays = {}                  # column -> numpy array of its rows, rebuilt on change
+
+    # ---------- loading ----------
+    def _column(self, key) -> int:
+        c = self.cols.get(key)
+        if c is None:
+            c = self.cols[key] = len(self.kinds)
+            self.kinds.append(key[0])
+            self.postings.append(set())
+            self.idf.append(math.log(1 + max(1, len(self.rows))))   # new feature: as rare as it gets
+        return c
+
+    def _weight(self, c) -> float:
+        return WEIGHTS[self.kinds[c]] * self.idf[c]
+
+    def _norm(self, feats) -> float:
+        return math.sqrt(sum(self._weight(c) ** 2 for c in feats))
+
+    def _unlink(self, r):
+        for c in self.feats[r]:
+            self.postings[c].discard(r)
+            self.arrays.pop(c, None)
+
+    def _set_book(self, row, vibes, norms=True):
+        book_id, name, rating = row[0], row[1], row[4]
+        r = self.rows.get(book_id)
+        if r is None:
+            r = self.rows[book_id] = len(self.ids)
+            self.ids.append(book_id); self.names.append(name); self.feats.append(())
+            self.ratings.append(math.nan); self.norms.append(0.0)
+        else:
+            self._unlink(r)
+        feats = tuple(sorted({self._column(k) for k in book_features(row, vibes)}))
+        for c in feats:
+            self.postings[c].add(r)
+            self.arrays.pop(c, None)
+        self.names[r], self.feats[r] = name, feats
+        self.ratings[r] = rating if rating else math.nan
+        if norms:
+            self.norms[r] = self._norm(feats)
+
+    def _drop_book(self, book_id):
+        r = self.rows.pop(book_id, None)
+        if r is not None:
+            self._unlink(r)
+            self.ids[r], self.feats[r], self.ratings[r], self.norms[r] = None, (), math.nan, 0.0
+
+    def _load_all(self):
+        self._clear()
+        vibes = collections.defaultdict(list)
+        for book_id, vibe_id in self.conn.execute(VIBE_SQL):
+            vibes[book_id].append(vibe_id)
+        for row in self.conn.execute(BOOK_SQL + " ORDER BY id"):
+            self._set_book(row, vibes.get(row[0], ()), norms=False)
+        n = len(self.rows)
+        self.idf = array.array("d", (math.log(1 + n / max(1, len(p))) for p in self.postings))
+        self.norms = array.array("d", (self._norm(f) for f in self.feats))
+
+    def _load_some(self, book_ids):
+        for i in range(0, len(book_ids), CHUNK):
+            part = book_ids[i:i + CHUNK]
+            marks = ", ".join("?" for _ in part)
+            vibes = collections.defaultdict(list)
+            for book_id, vibe_id in self.conn.execute(f"{VIBE_SQL} WHERE book_id IN ({marks})", part):
+                vibes[book_id].append(vibe_id)
+            found = set()
+            for row in self.conn.execute(f"{BOOK_SQL} WHERE id IN ({marks})", part):
+                self._set_book(row, vibes.get(row[0], ()))
+                found.add(row[0])
+            for book_id in part:
+                if book_id not in found:
+                    self._drop_book(book_id)
+
+    def sync(self) -> int:
+        # catches up with book_change; -> number of books re-read (all of them on a full load)
+        if self.conn is None:
+            self.conn = db_access.open_readonly(self.path)
+        db_access.attach_archives(self.conn, readonly=True)
+        self.conn.execute("BEGIN")   # one snapshot for the seq and the rows it covers
+        try:
+            top = self.conn.execute("SELECT ifnull(max(seq), 0) FROM book_change").fetchone()[0]
+            if self.seq is not None and top == self.seq:
+                return 0
+            changed = None
+            if self.seq is not None:
+                changed = [r[0] for r in self.conn.execute("SELECT book_id FROM book_change WHERE seq > ?", (self.seq,))]
+                if len(changed) > REBUILD_SHARE * len(self.rows):
+                    changed = None
+            if changed is None:
+                self._load_all()
+            else:
+                self._load_some(changed)
+            self.seq = top
+            return len(self.rows) if changed is None else len(changed)
+        finally:
+            self.conn.rollback()
+
+    # ---------- answers ----------
+    def like(self, book_id: int, n: int = 10) -> List[Tuple[int,str,float]]:
+        # -> [(book id, name, similarity 0..1)] best first, the book itself left out
+        with self.lock:
+            self.sync()
+            r = self.rows.get(book_id)
+            if r is None:
+                raise ValueError(f"no book {book_id}")
+            if not self.norms[r]:
+                return []
+            weights = [(c, self._weight(c) ** 2) for c in self.feats[r]]
+            top = self._top_np(r, weights, n) if self.np else self._top_py(r, weights, n)
+            return [(self.ids[i], self.names[i], s) for i, s in top]
+
+    def _top_py(self, r, weights, n):
+        scores = collections.defaultdict(float)
+        for c, w in weights:
+            for i in self.postings[c]:
+                scores[i] += w
+        scores.pop(r, None)
+        nr = self.norms[r]
+        best = heapq.nsmallest(n, ((-round(s / (self.norms[i] * nr), 9), i) for i, s in scores.items()))
+        return [(i, -s) for s, i in best]
+
+    def _rows(self, c):
+        a = self.arrays.get(c)
+        if a is None:
+            a = self.arrays[c] = self.np.fromiter(self.postings[c], dtype=self.np.intp, count=len(self.postings[c]))
+        return a
+
+    def _top_np(self, r, weights, n):
+        np = self.np
+        scores = np.zeros(len(self.ids))
+        for c, w in weights:
+            scores[self._rows(c)] += w
+        scores[r] = 0
+        cand = np.flatnonzero(scores)
+        if not len(cand) or n <= 0:
+            return []
+        norms = np.frombuffer(self.norms, dtype=np.float64).copy()   # a live view would pin the array's size
+        sims = np.round(scores[cand] / (norms[cand] * self.norms[r]), 9)
+        k = min(n, len(cand))
+        kth = np.partition(sims, len(sims) - k)[len(sims) - k]
+        pick = np.flatnonzero(sims >= kth)   # ties at the cut included, then ordered by row like _top_py
+        order = pick[np.lexsort((cand[pick], -sims[pick]))][:n]
+        return [(int(cand[i]), float(sims[i])) for i in order]
+
+    def top_vibes(self, n: int = 5) -> List[Tuple[str,float,int]]:
+        # -> [(vibe, score, rated books)]: mean rating of the vibe's rated books, pulled towards
+        # the journal's mean by VIBE_PRIOR so a vibe on one 10/10 book doesn't win outright
+        with self.lock:
+            self.sync()
+            vibe_cols = [(key[1], c) for key, c in self.cols.items() if key[0] == "vibe" and self.postings[c]]
+            if self.np:
+                ratings = self.np.frombuffer(self.ratings, dtype=self.np.float64).copy()
+                rated = ratings[~self.np.isnan(ratings)]
+                sums = []
+                for vibe_id, c in vibe_cols:
+                    x = ratings[self._rows(c)]
+                    x = x[~self.np.isnan(x)]
+                    sums.append((vibe_id, float(x.sum()), len(x)))
+                mean = float(rated.mean()) if len(rated) else 0.0
+            else:
+                rated = [x for x in self.ratings if not math.isnan(x)]
+                sums = []
+                for vibe_id, c in vibe_cols:
+                    x = [self.ratings[i] for i in self.postings[c] if not math.isnan(self.ratings[i])]
+                    sums.append((vibe_id, math.fsum(x), len(x)))
+                mean = math.fsum(rated) / len(rated) if rated else 0.0
+            scored = [(round((s + VIBE_PRIOR * mean) / (k + VIBE_PRIOR), 2), k, vibe_id) for vibe_id, s, k in sums if k]
+            best = heapq.nlargest(n, scored, key=lambda t: (t[0], t[1], -t[2]))
+            names = dict(self.conn.execute("SELECT id, vibe_name FROM vibe"))
+            return [(names.get(vibe_id, str(vibe_id)), score, k) for score, k, vibe_id in best]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+_engines = {}   # journal path -> Similarity
+_engines_lock = threading.Lock()
+
+def engine(path: Optional[str] = None) -> Similarity:
+    path = path or db_access.DB_PATH
+    with _engines_lock:
+        if path not in _engines:
+            _engines[path] = Similarity(path)
+        return _engines[path]
+
+def books_like(book_id: int, n: int = 10) -> List[Tuple[int,str,float]]:
+    return engine().like(book_id, n)
+
+def top_rated_vibes(n: int = 5) -> List[Tuple[str,float,int]]:
+    return engine().top_vibes(n)
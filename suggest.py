@@ -0,0 +1,114 @@
+# suggest.py
+# "Three best suited" authors / vibes as the user types.
+# Names, usage counters and last-used dates are loaded once into memory (they are kept
+# current by triggers, see db_setup.m003_usage_counters); each keystroke only ranks that list.
+import datetime, heapq, math
+from typing import Iterable, List, Optional
+
+from db_access import get_conn
+
+# match quality tiers; usage can lift a weaker match over a rarely used stronger one
+PREFIX, WORD_START, SUBSTRING, TYPO = 6.0, 4.5, 3.0, 1.5
+USAGE_WEIGHT = 1.5          # * log(1 + use_count)
+RECENCY_HALF_LIFE = 180     # days; bonus in 0..1
+
+# table -> name column
+SOURCES = {
+    "author": "author_name",
+    "vibe": "vibe_name",
+}
+
+def _within_one_edit(a: str, b: str) -> bool:
+    # a single insert, delete or substitution (or transposition) turns a into b
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+def match_quality(query: str, name: str, words: List[str]) -> float:
+    # query and name are lower-cased; 0 means no match
+    if name.startswith(query):
+        return PREFIX
+    if any(w.startswith(query) for w in words):
+        return WORD_START
+    if query in name:
+        return SUBSTRING
+    if len(query) >= 3:
+        n = len(query)
+        for w in [name] + words:
+            # compare against a prefix of the same length (+-1 for a dropped/extra letter)
+            if any(_within_one_edit(query, w[:k]) for k in (n - 1, n, n + 1) if k > 0):
+                return TYPO
+    return 0.0
+
+class Suggester:
+    """Ranks names from author/vibe by match quality, usage frequency and recency."""
+    def __init__(self, table: str, limit: int = 3):
+        self.table = table
+        self.column = SOURCES[table]
+        self.limit = limit
+        self.conn = None
+        self.version = None
+        self.entries = []   # (display, lower, words, base_score)
+
+    def _stale(self) -> bool:
+        # PRAGMA data_version changes whenever another connection commits
+        if self.conn is None:
+            self.conn = get_conn()
+        v = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if v != self.version:
+            self.version = v
+            return True
+        return False
+
+    def reload(self):
+        today = datetime.date.today()
+        rows = self.conn.execute(
+            f"SELECT {self.column}, use_count, last_used FROM {self.table}"
+        ).fetchall()
+        entries = []
+        for name, count, last_used in rows:
+            recency = 0.0
+            if last_used:
+                try:
+                    age = (today - datetime.date.fromisoformat(last_used[:10])).days
+                    recency = 0.5 ** (max(age, 0) / RECENCY_HALF_LIFE)
+                except ValueError:
+                    pass
+            low = name.lower()
+            entries.append((name, low, low.split(), USAGE_WEIGHT * math.log1p(count or 0) + recency))
+        self.entries = entries
+
+    def suggest(self, text: str, exclude: Iterable[str] = (), limit: Optional[int] = None) -> List[str]:
+        query = " ".join(text.lower().split())
+        if not query:
+            return []
+        if self._stale():
+            self.reload()
+        skip = {e.lower() for e in exclude}
+        scored = []
+        for name, low, words, base in self.entries:
+            if low in skip:
+                continue
+            q = match_quality(query, low, words)
+            if q:
+                scored.append((q + base, name))
+        best = heapq.nsmallest(limit or self.limit, scored, key=lambda s: (-s[0], s[1].lower()))
+        return [name for _, name in best]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
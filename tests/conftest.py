@@ -0,0 +1,39 @@
+# tests/conftest.py
+# Every test gets its own migrated copy of the repo's journal.db in tmp_path, and db_access (plus
+# any module with its own DB_PATH) points at it; the query cache starts empty.
+#   def test_x(journal): books = add_books({"name": "Dune", "author": "Frank Herbert"})
+import os, shutil, sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db_access
+from db_setup import migrate
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    # -> path of the copy
+    path = str(tmp_path / "journal.db")
+    shutil.copy(os.path.join(ROOT, "journal.db"), path)
+    monkeypatch.setattr(db_access, "DB_PATH", path)
+    monkeypatch.setattr(db_access, "QUERY_CACHE", db_access.QueryCache())
+    conn = db_access.connect()
+    try:
+        with conn:
+            migrate(conn)
+    finally:
+        conn.close()
+    return path
+
+def add_books(*records):
+    # db_access.add_book records (lookups by name), one transaction -> ids
+    return db_access.run_write(lambda c: [db_access.add_book(r, c) for r in records])
+
+def column(sql, params=()):
+    conn = db_access.connect()
+    try:
+        return [r[0] for r in conn.execute(sql, params)]
+    finally:
+        conn.close()
@@ -0,0 +1,87 @@
+# tests/test_api_server.py
+# The real server on an ephemeral port, spoken to over a raw socket.
+import asyncio, json
+from urllib.parse import quote
+
+import api_server, db_access
+from conftest import add_books
+
+async def read_response(reader, head=False):
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        k, _, v = line.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+    body = b"" if head else await reader.readexactly(int(headers["content-length"]))
+    return status, headers, json.loads(body) if body else None
+
+def exchange(path, *requests):
+    # sends the raw requests on one connection -> [(status, headers, body)], one per response read
+    async def go():
+        pool = api_server.ReadPool(path, 2)
+        srv = await asyncio.start_server(api_server.Server(pool, quiet=True).handle, "127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection(*srv.sockets[0].getsockname()[:2])
+            out = []
+            for raw in requests:
+                writer.write(raw)
+                await writer.drain()
+                out.append(await read_response(reader, raw.startswith(b"HEAD ")))
+                if out[-1][1]["connection"] == "close":
+                    break
+            writer.write_eof()
+            await reader.read()   # the server's end of the connection, so its handler has finished
+            writer.close()
+            return out
+        finally:
+            srv.close()
+            pool.close()
+    return asyncio.run(go())
+
+def get(path, target):
+    return exchange(path, f"GET {target} HTTP/1.1\r\nHost: x\r\n\r\n".encode())[0]
+
+def test_books_search_and_lookups(journal):
+    book_id, = add_books({"name": "Annihilation", "author": "Jeff VanderMeer", "rating": 8,
+                          "date_finish": "2024-05-01", "notes": "the tower"})
+    status, _, books = get(journal, "/books?text=annihil")
+    assert status == 200 and [b["id"] for b in books] == [book_id]
+    assert get(journal, f"/books/{book_id}")[2]["notes"] == "the tower"
+    assert get(journal, "/books/999999")[0] == 404
+    assert [b["id"] for b in get(journal, "/search?q=annih&session=t")[2]] == [book_id]
+    assert get(journal, "/search")[0] == 400
+    assert "vibes" in get(journal, "/lookups")[2]
+    assert {"id": 1, "name": "Fiction"} in get(journal, "/lookups/categories")[2]
+    assert get(journal, "/lookups/nope")[0] == 404
+    assert get(journal, "/books?order=nope")[0] == 400
+    assert get(journal, "/books?rating_min=x")[0] == 400
+    assert get(journal, "/nowhere")[0] == 404
+
+def test_pages_follow_next(journal):
+    add_books(*({"name": f"Book {i:02d}", "date_finish": f"2020-01-{i + 1:02d}"} for i in range(12)))
+    seen, after = [], ""
+    while True:
+        status, _, page = get(journal, f"/books/page?limit=5&order=date_finish{after}")
+        assert status == 200
+        seen += [b["id"] for b in page["books"]]
+        if not page["next"]:
+            break
+        after = "&after=" + quote(json.dumps(page["next"]))
+    assert seen == [b.id for b in db_access.query_books(None, "date_finish", "desc")]
+    assert get(journal, "/books/page?after=nonsense")[0] == 400
+    assert get(journal, "/books/page?after=" + quote("[1, 2]"))[0] == 400
+
+def test_keep_alive_and_methods(journal):
+    body = b'{"ignored": true}'
+    responses = exchange(journal,
+                         b"POST /books HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body),
+                         b"HEAD /stats HTTP/1.1\r\n\r\n",
+                         b"GET /stats HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert [(s, h["connection"]) for s, h, _ in responses] == [(405, "keep-alive"), (200, "keep-alive"), (200, "close")]
+    assert "pies" in responses[2][2]
+
+def test_oversized_request_line_is_a_400(journal):
+    status, headers, body = exchange(journal, b"GET /" + b"a" * 70_000 + b" HTTP/1.1\r\n\r\n")[0]
+    assert (status, headers["connection"]) == (400, "close")
+    status, _, body = exchange(journal, b"GET /" + b"a" * 9000 + b" HTTP/1.1\r\n\r\n")[0]
+    assert status == 400 and "too long" in body["error"]
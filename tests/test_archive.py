@@ -0,0 +1,61 @@
+# tests/test_archive.py
+# Archiving moves rows to another file; every read must answer as before.
+import os
+
+import pytest
+
+import db_access
+from conftest import add_books, column
+
+@pytest.fixture
+def history(journal):
+    ids = add_books(*({"name": f"Old {i}" if i < 20 else f"New {i}", "author": f"Author {i % 3}",
+                       "date_finish": f"{2015 + i // 4}-0{i % 9 + 1}-01", "rating": i % 10 + 1,
+                       "vibes": "Dark" if i % 2 else "Cozy", "notes": f"note {i}" * (i + 1)} for i in range(30)))
+    return ids
+
+def views():
+    # what the app, the cli and the API read
+    export = db_access.export_data()["tables"]
+    return {
+        "books": [tuple(b) for b in db_access.query_books(None, "date_finish", "asc")],
+        "page": db_access.list_books("rating", "desc", None, 12)[0],
+        "details": [db_access.get_book(b.id) for b in db_access.query_books({"text": "old 1"})],
+        "stats": db_access.statistics(),
+        "pace": db_access.reading_pace("year"),
+        "dupes": db_access.find_duplicates("Old 3"),
+        "export": {t: sorted(rows, key=lambda r: sorted((k, str(v)) for k, v in r.items())) for t, rows in export.items()},
+    }
+
+def test_reads_are_unchanged(history, journal):
+    before = views()
+    n, path = db_access.archive_books("2018")
+    assert n > 0 and os.path.exists(os.path.join(os.path.dirname(journal), path))
+    assert column("SELECT count(*) FROM main.books WHERE date_finish < '2018'") == [0]
+    assert views() == before
+
+def test_readonly_connections_see_archives(history, journal):
+    before = [b.id for b in db_access.query_books(None, "name", "asc")]
+    db_access.archive_books("2018")
+    conn = db_access.open_readonly(journal)
+    try:
+        with db_access.bound_connection(conn):
+            assert [b.id for b in db_access.query_books(None, "name", "asc")] == before
+    finally:
+        conn.close()
+
+def test_editing_an_archived_book_brings_it_back(history):
+    db_access.archive_books("2018")
+    old = history[0]
+    assert column("SELECT count(*) FROM main.books WHERE id = ?", (old,)) == [0]
+    db_access.update_book(old, {"rating": 10})
+    assert column("SELECT count(*) FROM main.books WHERE id = ?", (old,)) == [1]
+    book = db_access.get_book(old)
+    assert (book["rating"], book["notes"], book["vibes"]) == (10, "note 0", "Cozy")
+    assert column("SELECT count(*) FROM all_books WHERE id = ?", (old,)) == [1]
+
+def test_new_ids_never_collide(history):
+    db_access.archive_books("2030")   # everything but the newest book
+    new, = add_books({"name": "After the archive"})
+    assert new == max(history) + 1
+    assert column("SELECT count(*) FROM all_books WHERE id = ?", (new,)) == [1]
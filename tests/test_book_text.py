@@ -0,0 +1,47 @@
+# tests/test_book_text.py
+import os
+
+import pytest
+
+import db_access
+from conftest import add_books, column
+
+LONG = "It was a bright cold day in April, and the clocks were striking thirteen. " * 20
+
+@pytest.mark.parametrize("text", [None, "", "short", "ünïcødé ✓ " * 100, LONG, os.urandom(600).hex()])
+def test_round_trip(text):
+    assert db_access.unpack_text(db_access.pack_text(text)) == text
+
+def test_long_repetitive_text_is_packed():
+    packed = db_access.pack_text(LONG)
+    assert isinstance(packed, bytes) and len(packed) < len(LONG.encode())
+    assert db_access.pack_text("short") == "short"
+
+def test_compression_off(monkeypatch):
+    monkeypatch.setattr(db_access, "TEXT_COMPRESS_MIN", None)
+    assert db_access.pack_text(LONG) == LONG
+
+def test_books_table_has_no_text_columns(journal):
+    cols = set(column("SELECT name FROM pragma_table_info('books')"))
+    assert not cols & set(db_access.TEXT_COLUMNS)
+
+def test_text_lives_in_book_text(journal):
+    plain, noted = add_books({"name": "No Notes"}, {"name": "Noted", "notes": LONG, "line": "a line"})
+    assert column("SELECT count(*) FROM book_text WHERE book_id = ?", (plain,)) == [0]
+    assert column("SELECT typeof(notes) FROM book_text WHERE book_id = ?", (noted,)) == ["blob"]
+    book = db_access.get_book(noted)
+    assert (book["notes"], book["line"]) == (LONG, "a line")
+    assert db_access.get_book(plain)["notes"] is None
+
+def test_update_writes_only_given_text(journal):
+    book_id, = add_books({"name": "Edited", "notes": LONG, "line": "keep me"})
+    db_access.update_book(book_id, {"notes": "shorter now"})
+    book = db_access.get_book(book_id)
+    assert (book["notes"], book["line"]) == ("shorter now", "keep me")
+    db_access.update_book(book_id, {"name": "Renamed"})   # no text keys: book_text untouched
+    assert db_access.get_book(book_id)["notes"] == "shorter now"
+
+def test_export_unpacks(journal):
+    book_id, = add_books({"name": "Exported", "notes": LONG})
+    books = db_access.export_data()["tables"]["books"]
+    assert next(b for b in books if b["id"] == book_id)["notes"] == LONG
@@ -0,0 +1,56 @@
+# tests/test_cli.py
+import json, os, subprocess, sys
+
+import pytest
+
+import cli
+from conftest import ROOT
+
+def run(capsys, journal, *argv):
+    cli.main(["--db", journal, *argv])
+    return capsys.readouterr()
+
+def query(capsys, journal, *argv):
+    return [json.loads(line) for line in run(capsys, journal, "query", "--json", *argv).out.splitlines()]
+
+def test_add_then_query(journal, capsys):
+    out = run(capsys, journal, "add", "the left hand of darkness", "--author", "ursula k. le guin",
+              "--category", "Fiction", "--genre", "science fiction", "--date-finish", "2024-06-01",
+              "--rating", "9", "--vibes", "tense, hopeful", "--notes", "winter")
+    book_id = int(out.out)
+    rows = query(capsys, journal, "--text", "left hand")
+    assert [(r["id"], r["name"], r["author_name"], r["rating"]) for r in rows] == \
+        [(book_id, "The Left Hand Of Darkness", "Ursula K. Le Guin", 9)]
+    assert query(capsys, journal, "--vibe", "Hopeful", "--finished-from", "2024-01-01")[0]["id"] == book_id
+    assert book_id not in {r["id"] for r in query(capsys, journal, "--genre", "fantasy")}
+
+def test_batch_add_is_all_or_nothing(journal, capsys, monkeypatch):
+    before = query(capsys, journal)
+    lines = [{"name": "Good"}, {"name": "Bad", "size": "no such size"}]
+    monkeypatch.setattr(sys, "stdin", iter(json.dumps(r) + "\n" for r in lines))
+    with pytest.raises(SystemExit, match="record 2"):
+        run(capsys, journal, "add", "--batch")
+    assert query(capsys, journal) == before
+
+def test_export_import_round_trip(journal, capsys, tmp_path):
+    run(capsys, journal, "add", "Middlemarch", "--notes", "x" * 2000, "--vibes", "Slow-burn")
+    first, second = tmp_path / "a.json", tmp_path / "b.json"
+    run(capsys, journal, "export", str(first))
+    run(capsys, journal, "import", str(first))
+    run(capsys, journal, "export", str(second))
+    assert json.loads(first.read_text("utf-8")) == json.loads(second.read_text("utf-8"))
+    assert any(b["notes"] == "x" * 2000 for b in json.loads(first.read_text("utf-8"))["tables"]["books"])
+
+def test_missing_journal_is_an_error_not_a_new_file(tmp_path, capsys):
+    path = str(tmp_path / "typo.db")
+    with pytest.raises(SystemExit, match="no journal at"):
+        cli.main(["--db", path, "query"])
+    assert not os.path.exists(path)
+
+def test_closed_stdout_exits_quietly(journal):
+    with subprocess.Popen([sys.executable, "-m", "cli", "--db", journal, "query"], cwd=ROOT,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE) as p:
+        p.stdout.close()   # the reader is gone before the first row
+        err = p.stderr.read().decode()
+    assert p.returncode == 1
+    assert "Traceback" not in err
@@ -0,0 +1,81 @@
+# tests/test_csv_import.py
+import csv
+
+import pytest
+
+import csv_import, db_access
+from conftest import column
+
+HEADER = ["Title", "Author", "My Rating", "Number of Pages", "Date Read", "Date Started", "Bookshelves",
+          "Exclusive Shelf", "My Review"]
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(HEADER)
+        w.writerows(rows)
+    return str(path)
+
+ROWS = [
+    # Title, Author, My Rating, Number of Pages, Date Read, Date Started, Bookshelves, Exclusive Shelf, My Review
+    ["Dune", "frank herbert", "5", "612", "2024/03/01", "", "sci-fi, space opera", "read", "spice"],
+    ["dune!", "Frank Herbert", "4", "", "2024-03-01", "", "", "read", ""],           # same book, same day
+    ["Dune", "Frank Herbert", "4", "", "2025-01-10", "", "", "read", "again"],       # a reread
+    ["Hyperion", "Dan Simmons", "", "", "", "", "", "to-read", ""],                  # skipped
+    ["", "Nobody", "3", "", "2024-01-01", "", "", "read", ""],                       # no title
+    ["Solaris", "Stanisław Lem", "7", "", "2024-01-01", "", "", "read", ""],          # rating out of 0..5
+    ["Ubik", "Philip K. Dick", "3", "", "2024-02-30", "", "", "read", ""],           # no such day
+    ["Kindred", "Octavia Butler", "4", "", "2024-01-01", "2024-02-01", "", "read", ""],  # finished before started
+    ["The Dispossessed", "Ursula K. Le Guin", "0", "300", "Mar 05, 2023", "", "dnf", "read", ""],
+]
+
+def test_dedupe_rejects_and_skips(journal, tmp_path):
+    rejects = tmp_path / "rejects.csv"
+    report = csv_import.import_csv(write_csv(tmp_path / "in.csv", ROWS), reject_path=str(rejects), log=None)
+    assert (report["rows"], report["inserted"], report["duplicates"], report["rejected"], report["skipped"]) == \
+        (9, 3, 1, 4, 1)
+    with open(rejects, newline="", encoding="utf-8") as f:
+        errors = {r["Title"]: r["error"] for r in csv.DictReader(f)}
+    assert errors == {"": "missing title", "Solaris": "rating '7' outside 0..5", "Ubik": "bad date '2024-02-30'",
+                      "Kindred": "Date started can't be later than Date finished"}
+
+    dune = db_access.query_books({"text": "dune"}, "date_finish", "asc")
+    assert [(b.name, b.author_name, b.date_finish, b.rating) for b in dune] == \
+        [("Dune", "Frank Herbert", "2024-03-01", 10), ("Dune", "Frank Herbert", "2025-01-10", 8)]
+    first = db_access.get_book(dune[0].id)
+    assert first["notes"] == "spice"
+    assert first["size"] == column("SELECT id FROM size WHERE size_name LIKE 'Epic%'")[0]
+    assert first["subgenre"] == column("SELECT id FROM subgenre WHERE subgenre_name = 'Space opera'")[0]
+    dispossessed = db_access.query_books({"text": "dispossessed"})[0]
+    assert (dispossessed.date_finish, dispossessed.rating, dispossessed.dnf) == ("2023-03-05", None, 1)
+
+def test_second_import_finds_only_duplicates(journal, tmp_path):
+    path = write_csv(tmp_path / "in.csv", ROWS)
+    csv_import.import_csv(path, log=None)
+    books = column("SELECT count(*) FROM books")
+    report = csv_import.import_csv(path, log=None)
+    assert (report["inserted"], report["duplicates"]) == (0, 4)
+    assert column("SELECT count(*) FROM books") == books
+
+def test_dry_run_writes_nothing(journal, tmp_path):
+    before = column("SELECT count(*) FROM books") + column("SELECT count(*) FROM author")
+    report = csv_import.import_csv(write_csv(tmp_path / "in.csv", ROWS), dry_run=True, log=None)
+    assert report["inserted"] == 0
+    assert column("SELECT count(*) FROM books") + column("SELECT count(*) FROM author") == before
+
+def test_process_pool_gives_the_same_result(journal, tmp_path, monkeypatch):
+    rows = [[f"Book {i}", f"Author {i % 7}", str(i % 6), "", f"2020-01-{i % 28 + 1:02d}", "", "", "read", "n" * i]
+            for i in range(50)]
+    path = write_csv(tmp_path / "in.csv", rows)
+    monkeypatch.setattr(csv_import, "CHUNK", 10)
+    report = csv_import.import_csv(path, workers=2, log=None)
+    assert report["inserted"] == 50
+    ids = column("SELECT id FROM books WHERE name LIKE 'Book %' ORDER BY id")
+    assert ids == list(range(ids[0], ids[0] + 50))
+    assert [db_access.get_book(i)["notes"] for i in ids] == ["n" * i or None for i in range(50)]
+
+def test_mapping():
+    m = csv_import.parse_mapping(["Finished=date_finish", "My Review="])
+    assert m["Finished"] == "date_finish" and "My Review" not in m
+    with pytest.raises(ValueError, match="unknown field"):
+        csv_import.parse_mapping(["Finished=finished"])
@@ -0,0 +1,87 @@
+# tests/test_edit_book.py
+# "Edit book" on the Add form, offscreen: only dirty fields reach update_book.
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+
+import db_access
+from conftest import add_books
+
+@pytest.fixture(scope="module")
+def qapp():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+@pytest.fixture
+def page(qapp, journal, monkeypatch):
+    import app
+    monkeypatch.setattr(app, "DB_PATH", journal)
+    monkeypatch.setattr(app, "QUERY_CACHE", db_access.QUERY_CACHE)
+    p = app.AddBookPage()
+    yield p
+    p.close()
+
+@pytest.fixture
+def book(journal):
+    book_id, = add_books({"name": "The Fifth Season", "author": "N. K. Jemisin", "category": "Fiction",
+                          "genre": "fantasy", "date_start": "2024-01-02", "date_finish": "2024-02-03",
+                          "rating": 6, "vibes": "Dark, Epic", "notes": "stone eaters"})
+    # a date_finish trigger run would overwrite this
+    db_access.run_write(lambda c: c.execute("UPDATE books SET remember_check_due_at = '2000-01-01' WHERE id = ?",
+                                            (book_id,)))
+    return book_id
+
+def updates(monkeypatch):
+    import app
+    calls = []
+    real = app.update_book
+    monkeypatch.setattr(app, "update_book", lambda book_id, data, conn: (calls.append(dict(data)),
+                                                                       real(book_id, data, conn)))
+    return calls
+
+def test_loaded_form_is_clean(page, book):
+    assert page.load_book(book)
+    assert page.dirty_fields(page.form_values()) == {}
+
+def test_only_the_changed_field_is_written(page, book, monkeypatch):
+    calls = updates(monkeypatch)
+    saved = []
+    page.saved.connect(saved.append)
+    page.load_book(book)
+    page.dots.set_value(9)
+    page.save_book()
+    assert calls == [{"rating": 9}]
+    assert saved == [book] and page.book_id is None
+    stored = db_access.get_book(book)
+    assert (stored["rating"], stored["date_finish"], stored["notes"]) == (9, "2024-02-03", "stone eaters")
+    assert stored["remember_check_due_at"] == "2000-01-01"
+
+def vibe_links(book_id):
+    # vibe name -> rowid of its book_vibes link
+    conn = db_access.connect()
+    try:
+        return dict(conn.execute("SELECT v.vibe_name, bv.rowid FROM book_vibes bv JOIN vibe v ON v.id = bv.vibe_id "
+                                 "WHERE bv.book_id = ?", (book_id,)).fetchall())
+    finally:
+        conn.close()
+
+def test_vibes_change_only_links(page, book, monkeypatch):
+    calls = updates(monkeypatch)
+    before = vibe_links(book)
+    page.load_book(book)
+    page.edVibes.setText("Epic, Cozy")
+    page.save_book()
+    assert calls == [{}]
+    after = vibe_links(book)
+    assert sorted(after) == ["Cozy", "Epic"]
+    assert after["Epic"] == before["Epic"]   # the kept link is the same row, not deleted and inserted again
+
+def test_no_changes_writes_nothing(page, book, monkeypatch):
+    calls = updates(monkeypatch)
+    page.load_book(book)
+    version = db_access.QUERY_CACHE.marker()
+    page.save_book()
+    assert calls == [] and db_access.QUERY_CACHE.marker() == version
+    assert page.book_id == book   # still editing
@@ -0,0 +1,67 @@
+# tests/test_list_books.py
+import itertools
+
+import pytest
+
+import db_access
+from conftest import add_books
+
+@pytest.fixture
+def shelf(journal):
+    # ties on every key (same dates, ratings, names and authors) and NULLs
+    add_books(*({"name": f"Book {i % 9}", "author": f"Author {i % 4}" if i % 5 else None,
+                 "date_start": f"2023-0{i % 3 + 1}-01" if i % 4 else None,
+                 "date_finish": f"2024-0{i % 6 + 1}-15" if i % 7 else None,
+                 "rating": i % 11 if i % 3 else None, "dnf": int(i % 8 == 0)} for i in range(60)))
+    return journal
+
+def offset_pages(order, direction, size, filters=None):
+    where, params = db_access.book_filter_sql(filters)
+    sql = "SELECT b.id FROM all_books b" + where + db_access.book_order_sql(order, direction) + " LIMIT ? OFFSET ?"
+    conn = db_access.connect()
+    try:
+        for start in itertools.count(0, size):
+            page = [r[0] for r in conn.execute(sql, (*params, size, start))]
+            if not page:
+                return
+            yield page
+    finally:
+        conn.close()
+
+def keyset_pages(order, direction, size, filters=None):
+    after = None
+    while True:
+        rows, after = db_access.list_books(order, direction, after, size, filters)
+        if rows:
+            yield [r.id for r in rows]
+        if after is None:
+            return
+
+@pytest.mark.parametrize("order", sorted(db_access.BOOK_ORDERS))
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+@pytest.mark.parametrize("size", [1, 7, 50])
+def test_keyset_pages_equal_offset_pages(shelf, order, direction, size):
+    assert list(keyset_pages(order, direction, size)) == list(offset_pages(order, direction, size))
+
+def test_with_filters(shelf):
+    filters = {"dnf": 0, "rating_min": 3, "text": "book"}
+    assert list(keyset_pages("rating", "desc", 4, filters)) == list(offset_pages("rating", "desc", 4, filters))
+
+def as_dict(b):
+    return {k: b[k] for k in b.keys()}
+
+def test_rows_are_what_the_list_shows(shelf):
+    rows, _ = db_access.list_books("name", "asc", None, 5)
+    full = {b.id: b for b in db_access.query_books(None, "name", "asc")}
+    assert [as_dict(r) for r in rows] == [as_dict(full[r.id]) for r in rows]
+
+@pytest.mark.parametrize("cursor", [[1, 2], ("2024-01-01",), "x", ("2024-01-01", "3"), (5, 3)])
+def test_bad_cursors(shelf, cursor):
+    with pytest.raises(ValueError, match="cursor"):
+        db_access.list_books("date_finish", "desc", cursor, 5)
+
+def test_rating_cursor_is_an_int(shelf):
+    _, after = db_access.list_books("rating", "desc", None, 5)
+    assert type(after[0]) is int
+    with pytest.raises(ValueError, match="cursor"):
+        db_access.list_books("rating", "desc", (str(after[0]), after[1]), 5)
@@ -0,0 +1,35 @@
+# tests/test_nocase_names.py
+import sqlite3
+
+import pytest
+
+import db_access
+from conftest import add_books, column
+
+def test_upsert_author_ignores_case(journal):
+    first = db_access.upsert_author("Ursula K. Le Guin")
+    assert db_access.upsert_author("ursula k. le guin") == first
+    assert db_access.upsert_author("  URSULA K. LE GUIN ") == first
+    assert column("SELECT count(*) FROM author WHERE author_name = 'ursula k. le guin' COLLATE NOCASE") == [1]
+    assert db_access.upsert_author("   ") is None
+
+def test_upsert_vibe_ignores_case_and_is_not_prefilled(journal):
+    cozy = column("SELECT id FROM vibe WHERE vibe_name = 'Cozy'")[0]
+    assert db_access.upsert_vibe("cozy") == cozy
+    new = db_access.upsert_vibe("Bittersweet")
+    assert db_access.upsert_vibe("BITTERSWEET") == new
+    assert column("SELECT prefilled FROM vibe WHERE id = ?", (new,)) == [0]
+
+def test_index_rejects_case_duplicates(journal):
+    db_access.upsert_author("Octavia E. Butler")
+    with pytest.raises(sqlite3.IntegrityError):
+        db_access.run_write(lambda c: c.execute("INSERT INTO author(author_name) VALUES ('OCTAVIA E. BUTLER')"))
+
+def test_migration_turns_author_names_into_ids(journal):
+    # the repo's journal has a book whose author column holds "J.R.R. Tolkien" as text
+    assert column("SELECT count(*) FROM books WHERE typeof(author) = 'text'") == [0]
+    assert column("SELECT count(*) FROM author WHERE author_name = 'j.r.r. tolkien' COLLATE NOCASE") == [1]
+
+def test_books_by_differently_cased_authors_share_one_row(journal):
+    a, b = add_books({"name": "Kindred", "author": "octavia butler"}, {"name": "Dawn", "author": "Octavia Butler"})
+    assert len(set(column("SELECT author FROM books WHERE id IN (?, ?)", (a, b)))) == 1
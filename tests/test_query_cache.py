@@ -0,0 +1,60 @@
+# tests/test_query_cache.py
+import dataclasses, os, sqlite3
+
+import pytest
+
+import db_access
+from conftest import add_books
+
+def authors():
+    return [a.name for a in db_access.list_authors()]
+
+def test_repeated_reads_hit(journal):
+    cache = db_access.QUERY_CACHE
+    first = authors()
+    assert authors() == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_own_writes_invalidate(journal):
+    assert "Becky Chambers" not in authors()
+    db_access.upsert_author("Becky Chambers")   # note_write() on our own write path
+    assert "Becky Chambers" in authors()
+    assert db_access.QUERY_CACHE.invalidations == 1
+
+def test_other_connections_invalidate(journal):
+    authors()
+    other = sqlite3.connect(journal)   # no note_write: only PRAGMA data_version can tell
+    with other:
+        other.execute("INSERT INTO author(author_name) VALUES ('Martha Wells')")
+    other.close()
+    assert "Martha Wells" in authors()
+
+def test_switching_journals_invalidates(journal, tmp_path, monkeypatch):
+    add_books({"name": "Only Here"})
+    other = str(tmp_path / "other.db")
+    conn = sqlite3.connect(journal)
+    conn.execute("VACUUM INTO ?", (other,))
+    conn.close()
+    conn = sqlite3.connect(other)
+    with conn:
+        conn.execute("DELETE FROM books WHERE name = 'Only Here'")
+    conn.close()
+    assert len(db_access.query_books({"text": "only here"})) == 1
+    monkeypatch.setattr(db_access, "DB_PATH", other)
+    assert db_access.QUERY_CACHE.marker()[0] == other
+    assert db_access.query_books({"text": "only here"}) == []
+
+def test_cached_rows_cannot_be_changed(journal):
+    add_books({"name": "Frozen"})
+    rows = db_access.query_books({"text": "frozen"})
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        rows[0].name = "Thawed"
+    rows.clear()   # the caller's list, not the cached one
+    assert [b.name for b in db_access.query_books({"text": "frozen"})] == ["Frozen"]
+
+def test_marker_never_creates_a_journal(journal, tmp_path, monkeypatch):
+    missing = str(tmp_path / "missing.db")
+    monkeypatch.setattr(db_access, "DB_PATH", missing)
+    with pytest.raises(sqlite3.OperationalError):
+        db_access.QUERY_CACHE.marker()
+    assert not os.path.exists(missing)
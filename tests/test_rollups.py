@@ -0,0 +1,46 @@
+# tests/test_rollups.py
+import db_access
+from conftest import add_books
+
+def rollup(conn):
+    return conn.execute("SELECT year, month, books, dnf, rated, rating_sum, pages FROM reading_month "
+                        "WHERE books <> 0 ORDER BY year, month").fetchall()
+
+def rebuilt():
+    # -> (reading_month as the triggers left it, as rebuild_rollups computes it)
+    conn = db_access.connect()
+    try:
+        live = rollup(conn)
+        db_access.rebuild_rollups(conn)
+        return live, rollup(conn)
+    finally:
+        conn.rollback()
+        conn.close()
+
+def test_triggers_match_rebuild(journal):
+    ids = add_books(*({"name": f"Book {i}", "date_finish": f"202{i % 3}-{i % 12 + 1:02d}-10" if i % 5 else None,
+                       "rating": i % 11 or None, "dnf": int(i % 6 == 0),
+                       "size": "Novel — 200-450 pages" if i % 2 else "Epic — 450+ pages"} for i in range(40)))
+    live, fresh = rebuilt()
+    assert live == fresh
+
+    def edit(c):
+        db_access.update_book(ids[1], {"date_finish": "2019-07-01"}, c)     # moves to another month
+        db_access.update_book(ids[2], {"date_finish": None}, c)             # leaves the rollup
+        db_access.update_book(ids[5], {"date_finish": "2022-01-01"}, c)     # joins it
+        db_access.update_book(ids[3], {"dnf": 1, "rating": None}, c)
+        db_access.update_book(ids[7], {"size": db_access.lookup_id(c, "size", "Novella — 80-200 pages")}, c)
+        c.execute("DELETE FROM books WHERE id IN (?, ?)", (ids[8], ids[9]))
+    db_access.run_write(edit)
+    live, fresh = rebuilt()
+    assert live == fresh
+
+def test_pace_sums_the_rollup(journal):
+    add_books({"name": "A", "date_finish": "2021-01-05", "rating": 8},
+              {"name": "B", "date_finish": "2021-02-05", "rating": 4},
+              {"name": "C", "date_finish": "2021-02-20", "dnf": 1},
+              {"name": "D", "date_finish": "2021-04-01"})
+    q1 = next(r for r in db_access.reading_pace("quarter", "2021", "2021") if r.period == "2021-Q1")
+    assert (q1.finished, q1.dnf, q1.dnf_rate, q1.avg_rating) == (2, 1, 0.333, 6.0)
+    months = [r.period for r in db_access.reading_pace("month", "2021-01", "2021-03")]
+    assert months == ["2021-01", "2021-02"]
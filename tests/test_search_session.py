@@ -0,0 +1,48 @@
+# tests/test_search_session.py
+import pytest
+
+import db_access
+from conftest import add_books
+
+NAMES = ["The Hobbit", "Hob Nobbing", "A Shobbit Tale", "Émile", "émigré", "100% Proof", "snake_case", "Hyperion",
+         "HOBBIT Redux", "Hobgoblins"]
+
+@pytest.fixture
+def shelf(journal):
+    return add_books(*({"name": n, "author": a} for n, a in zip(NAMES, ["Tolkien", "Hobbes", None, "Zola", "Émile Zola",
+                                                                      "Max Hobart", None, "Dan Simmons", None, None])))
+
+def expected(text, filters=None):
+    return {b.id for b in db_access.query_books(dict(filters or {}, text=text))}
+
+def typed(session, keys, filters=None):
+    # every intermediate text must match query_books for the same text
+    for text in keys:
+        got = [b.id for b in session.search(text)]
+        assert len(got) == len(set(got)), text
+        assert set(got) == expected(text, filters), text
+
+def test_typing_deleting_and_editing(shelf):
+    s = db_access.SearchSession()
+    typed(s, ["h", "ho", "hob", "hobb", "hobbi", "hobbit", "hobbi", "hob", "hobg", "hob", "hyp", "É", "é", "Émi",
+              "%", "_", "snake_", "  hob  "])
+    assert s.narrowed > s.fresh
+
+def test_filters_are_kept(shelf):
+    filters = {"dnf": 0, "text": "ignored"}
+    s = db_access.SearchSession(filters)
+    typed(s, ["h", "ho", "hob"], {"dnf": 0})
+
+def test_best_matches_first(shelf):
+    # title starts with it, a title word does, the title contains it, an author word starts with it;
+    # the repo's journal has a Hobbit of its own
+    names = [b.name for b in db_access.SearchSession().search("hob")]
+    assert names == ["Hob Nobbing", "HOBBIT Redux", "Hobgoblins", "The Hobbit", "The Hobbit", "A Shobbit Tale",
+                     "100% Proof"]
+
+def test_a_commit_refetches(shelf):
+    s = db_access.SearchSession()
+    typed(s, ["ho", "hob"])
+    new, = add_books({"name": "Hobson's Choice"})
+    assert new in {b.id for b in s.search("hobs")}
+    typed(s, ["hob", "ho"])
@@ -0,0 +1,56 @@
+# tests/test_similar.py
+import pytest
+
+import db_access, similar
+from conftest import add_books
+
+VIBES = ["Dark", "Cozy", "Epic", "Witty", "Tense", "Hopeful"]
+GENRES = ["fantasy", "science fiction", "mystery", "horror"]
+
+def record(i):
+    return {"name": f"Book {i}", "category": "Fiction", "genre": GENRES[i % 4], "rating": (i * 7) % 11 or None,
+            "dnf": int(i % 9 == 0), "vibes": ", ".join(VIBES[j] for j in range(6) if (i >> j) & 1)}
+
+@pytest.fixture
+def library(journal):
+    return add_books(*(record(i) for i in range(80)))
+
+@pytest.fixture
+def engines(library, journal):
+    pytest.importorskip("numpy")
+    fast, slow = similar.Similarity(journal), similar.Similarity(journal, use_numpy=False)
+    assert fast.np is not None and slow.np is None
+    yield fast, slow
+    fast.close(); slow.close()
+
+def same_answers(fast, slow, ids):
+    for book_id in ids:
+        for n in (1, 5, 200):
+            assert fast.like(book_id, n) == slow.like(book_id, n), (book_id, n)
+    assert fast.top_vibes(10) == slow.top_vibes(10)
+
+def test_numpy_and_python_agree(engines, library):
+    same_answers(*engines, library)
+
+def test_they_agree_after_patching(engines, library):
+    fast, slow = engines
+    same_answers(fast, slow, library[:3])   # both loaded
+    new, = add_books({"name": "Newcomer", "category": "Fiction", "genre": "horror", "rating": 9,
+                      "vibes": "Dark, Eerie"})
+    db_access.update_book(library[5], {"rating": 2})
+    db_access.run_write(lambda c: c.execute("DELETE FROM books WHERE id = ?", (library[6],)))
+    assert fast.sync() == slow.sync() == 3   # patched, not reloaded
+    same_answers(fast, slow, library[:5] + [new])
+    assert library[6] not in {i for i, _, _ in slow.like(new, 200)}
+    with pytest.raises(ValueError):
+        slow.like(library[6])
+
+def test_pure_python_ranks_by_shared_features(library, journal):
+    slow = similar.Similarity(journal, use_numpy=False)
+    try:
+        twin, = add_books(dict(record(63), name="Twin"))
+        best = slow.like(library[63], 3)
+        assert best[0][:2] == (twin, "Twin") and best[0][2] == pytest.approx(1.0)
+        assert [s for _, _, s in best] == sorted((s for _, _, s in best), reverse=True)
+    finally:
+        slow.close()
@@ -0,0 +1,82 @@
+# tests/test_suggest.py
+import pytest
+
+import db_access
+from conftest import add_books
+from suggest import PREFIX, SUBSTRING, TYPO, WORD_START, Suggester, match_quality
+
+def quality(query, name):
+    return match_quality(query, name.lower(), name.lower().split())
+
+def test_match_tiers():
+    assert quality("ter", "Terry Pratchett") == PREFIX
+    assert quality("pra", "Terry Pratchett") == WORD_START
+    assert quality("atch", "Terry Pratchett") == SUBSTRING
+    assert quality("prat", "Terry Pratchett") == WORD_START
+    assert quality("pratc", "Terry Prachett") == TYPO     # one dropped letter
+    assert quality("rtp", "Terry Pratchett") == 0.0
+    assert PREFIX > WORD_START > SUBSTRING > TYPO > 0
+
+@pytest.fixture
+def authors(journal):
+    s = Suggester("author", limit=3)
+    yield s
+    s.close()
+
+def test_usage_lifts_an_equal_match(journal, authors):
+    add_books({"name": "A", "author": "Anne Leckie"}, {"name": "B", "author": "Ann Leckie"},
+              {"name": "C", "author": "Ann Leckie"}, {"name": "D", "author": "Ann Leckie"})
+    assert authors.suggest("leck")[:2] == ["Ann Leckie", "Anne Leckie"]
+
+def test_better_match_wins_at_equal_usage(journal, authors):
+    add_books({"name": "A", "author": "Mary Robinette Kowal", "date_finish": "2024-01-01"},
+              {"name": "B", "author": "Robin Hobb", "date_finish": "2024-01-01"})
+    assert authors.suggest("robin")[:2] == ["Robin Hobb", "Mary Robinette Kowal"]
+
+def test_exclude_limit_and_new_names(journal, authors):
+    add_books(*({"name": f"B{i}", "author": f"Writer {i}"} for i in range(5)))
+    assert len(authors.suggest("writer")) == 3
+    assert len(authors.suggest("writer", limit=5)) == 5
+    assert "Writer 0" not in authors.suggest("writer", exclude=["writer 0"], limit=5)
+    assert authors.suggest("zelazny") == []
+    add_books({"name": "Lord of Light", "author": "Roger Zelazny"})   # another connection's commit
+    assert authors.suggest("zelazny") == ["Roger Zelazny"]
+    assert authors.suggest("   ") == []
+
+def usage(conn):
+    return {(t, i): (n, d) for t in ("author", "vibe")
+            for i, n, d in conn.execute(f"SELECT id, use_count, last_used FROM {t}")}
+
+def recounted():
+    conn = db_access.connect()
+    try:
+        live = usage(conn)
+        db_access.recount_usage(conn)
+        return live, usage(conn)
+    finally:
+        conn.rollback()
+        conn.close()
+
+def test_triggers_match_recount_while_books_are_added(journal):
+    add_books({"name": "A", "author": "Ann Leckie", "date_finish": "2023-05-01", "vibes": "Dark, Epic"},
+              {"name": "B", "author": "ann leckie", "date_start": "2024-02-01", "vibes": "Epic"},
+              {"name": "C", "author": "Iain Banks", "vibes": "Witty"})
+    live, fresh = recounted()
+    assert live == fresh
+
+def test_triggers_keep_counts_exact_and_dates_never_behind(journal):
+    # moving a book away leaves last_used where it was until the next recount; counts are exact
+    a, b, c = add_books({"name": "A", "author": "Ann Leckie", "date_finish": "2023-05-01", "vibes": "Dark, Epic"},
+                        {"name": "B", "author": "Ann Leckie", "date_start": "2024-02-01", "vibes": "Epic"},
+                        {"name": "C", "author": "Iain Banks", "vibes": "Witty"})
+    def edit(conn):
+        db_access.update_book(a, {"author": db_access.upsert_author("Iain Banks", conn)}, conn)
+        db_access.update_book(b, {"date_finish": "2024-03-01"}, conn)
+        db_access.set_book_vibes(b, "Cozy", conn)
+        conn.execute("DELETE FROM books WHERE id = ?", (c,))
+    db_access.run_write(edit)
+    live, fresh = recounted()
+    assert {k: n for k, (n, _) in live.items()} == {k: n for k, (n, _) in fresh.items()}
+    assert all((live[k][1] or "") >= (d or "") for k, (_, d) in fresh.items())
+    epic = ("vibe", db_access.upsert_vibe("Epic"))
+    assert (live[epic][1], fresh[epic][1]) == ("2024-03-01", "2023-05-01")
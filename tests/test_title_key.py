@@ -0,0 +1,40 @@
+# tests/test_title_key.py
+import db_access
+from conftest import add_books, column
+
+def test_title_key_folds_case_punctuation_and_spaces():
+    key = db_access.title_key("The Hobbit")
+    assert key == "the hobbit"
+    assert db_access.title_key("  the  HOBBIT! ") == key
+    assert db_access.title_key("The_Hobbit...") == key
+    assert db_access.title_key("Ｔｈｅ Ｈｏｂｂｉｔ") == key   # NFKC: full-width letters
+    assert db_access.title_key(None) == ""
+
+def test_migration_backfills_every_book(journal):
+    names = column("SELECT name FROM books ORDER BY id")
+    assert names
+    assert column("SELECT title_key FROM books ORDER BY id") == [db_access.title_key(n) for n in names]
+
+def test_insert_and_update_keep_the_key(journal):
+    book_id, = add_books({"name": "a wizard of earthsea"})
+    assert column("SELECT title_key FROM books WHERE id = ?", (book_id,)) == ["a wizard of earthsea"]
+    db_access.update_book(book_id, {"name": "The Tombs of Atuan"})
+    assert column("SELECT title_key FROM books WHERE id = ?", (book_id,)) == ["the tombs of atuan"]
+
+def test_duplicates_and_rereads(journal):
+    first, second, other = add_books({"name": "Piranesi"}, {"name": "piranesi!"}, {"name": "Jonathan Strange"})
+    assert db_access.find_duplicates("PIRANESI") == [(first, "Piranesi"), (second, "Piranesi!")]
+    assert db_access.find_duplicates("Piranesi", exclude_id=first) == [(second, "Piranesi!")]
+    assert db_access.find_duplicates("Susanna Clarke") == []
+    rereads = [(i, k) for i, _, k in db_access.find_rereads() if k == "piranesi"]
+    assert rereads == [(first, "piranesi"), (second, "piranesi")]
+    assert other not in {i for i, _, _ in db_access.find_rereads()}
+
+def test_duplicate_probe_uses_the_index(journal):
+    conn = db_access.connect()
+    try:
+        plan = " ".join(r[-1] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id, name FROM main.books WHERE title_key = ?", ("x",)))
+    finally:
+        conn.close()
+    assert "idx_books_title_key" in plan